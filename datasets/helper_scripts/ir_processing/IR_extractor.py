@@ -7,8 +7,8 @@ Description:
 Functions:
 
 """
-import subprocess
 import os
+from llvm_tools import run_tool
 from function_extractor import extract_function_from_source
 from random_function_selector import random_function_selector
 
@@ -56,13 +56,7 @@ def generate_ir_output_command(original_compilation_command):
 
 def generate_ir_for_source_file(source_path, compilation_command):
     try:
-        LLVM_IR = subprocess.run(compilation_command,
-                                 cwd=source_path,
-                                 shell=False,
-                                 capture_output=True,
-                                 text=True,
-                                 check=False
-                                 )
+        LLVM_IR = run_tool(compilation_command, cwd=source_path, stage='ir_extract')
 
         return LLVM_IR
     except Exception as e:
@@ -71,12 +65,7 @@ def generate_ir_for_source_file(source_path, compilation_command):
 def generate_ir_for_function(source_ir, function_name):
     try:
         extract_command = ["llvm-extract", f"-func={function_name}", "--keep-const-init", "-S", "-", "-o", "-"]
-        LLVM_IR = subprocess.run(extract_command,
-                                 shell=False,
-                                 input=source_ir,
-                                 capture_output=True,
-                                 text=True,
-                                 check=False)
+        LLVM_IR = run_tool(extract_command, input=source_ir, stage='ir_extract')
         return LLVM_IR
     except Exception as e:
         print(f"Generate IR for a Function error: {e}")
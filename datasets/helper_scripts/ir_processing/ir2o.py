@@ -1,22 +1,14 @@
-import subprocess
-import tempfile
-import os
+from llvm_tools import ir_inputs, run_tool
 
 def ir_to_o(ir, compilation_command, output_file, src_directory):
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as temp_ir:
-        temp_ir.write(ir)
-        temp_ir.flush()
+    # clang picks the input language from the extension, so the IR goes
+    # through a named scratch file rather than a pipe.
+    with ir_inputs(ir, named=True) as (paths, _):
+        compilation_command = compilation_command.copy()
+        compilation_command[-1] = paths[0]
 
-    compilation_command = compilation_command.copy()
-    compilation_command[-1] = temp_ir.name
+        result = run_tool(compilation_command, cwd=src_directory, stage='ir2o')
 
-    result = subprocess.run(
-        compilation_command,
-        cwd=src_directory,
-        check=False
-    )
-
-    os.unlink(temp_ir.name)
     return result
 
 if __name__ == "__main__":
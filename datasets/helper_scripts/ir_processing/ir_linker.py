@@ -1,67 +1,44 @@
-import tempfile
-import subprocess
-import os
 from fix_linkage import restore_private_linkage
+from llvm_tools import ir_inputs, run_tool
 
 def ir_linker(source_ir, modified_function_ir, function_name):
 
-    source_file_path = None
-    func_file_path = None
-    output_file_path = None
-
     try:
-        with tempfile.NamedTemporaryFile(mode='w+', suffix='.ll', delete=False) as source_file, \
-            tempfile.NamedTemporaryFile(mode='w+', suffix='.ll', delete=False) as func_file, \
-            tempfile.NamedTemporaryFile(mode='r', suffix='.ll', delete=False) as output_file:
-
-            source_file.write(source_ir)
-            source_file.flush()
-            func_file.write(modified_function_ir)
-            func_file.flush()
-            source_file_path = source_file.name
-            func_file_path = func_file.name
-            output_file_path = output_file.name
-            output_file.close()
-
-            extract_command = [
-                "llvm-extract",
-                "--delete",
-                "--func=" + function_name,
-                source_file_path,
-                "-o",
-                source_file_path
-            ]
-            result = subprocess.run(extract_command)
-
-            if result.returncode != 0:
-                return None
-
+        extract_command = [
+            "llvm-extract",
+            "-S",
+            "--delete",
+            "--func=" + function_name,
+            "-",
+            "-o",
+            "-"
+        ]
+        result = run_tool(extract_command, input=source_ir, stage='ir_link')
+
+        if result.returncode != 0:
+            return None
+
+        # The remaining module comes in on stdin, the function as a memfd.
+        with ir_inputs(modified_function_ir) as (paths, fds):
             link_command = [
                 "llvm-link",
                 "-S",
                 "--override",
-                source_file_path,
-                func_file_path,
+                "-",
+                paths[0],
                 "-o",
-                output_file_path]
-            result = subprocess.run(link_command)
-
-            if result.returncode != 0:
-                return None
+                "-"]
+            result = run_tool(link_command, input=result.stdout, pass_fds=fds, stage='ir_link')
 
-            with open(output_file_path, 'r') as f:
-                merged_ir = f.read()
+        if result.returncode != 0:
+            return None
 
-            merged_ir = restore_private_linkage(source_ir, merged_ir)
+        merged_ir = restore_private_linkage(source_ir, result.stdout)
 
-            return merged_ir
+        return merged_ir
 
     except Exception as e:
         return None
-    finally:
-        for path in [source_file_path, func_file_path, output_file_path]:
-            if path and os.path.exists(path):
-                os.remove(path)
 
 if __name__ == "__main__":
     pass
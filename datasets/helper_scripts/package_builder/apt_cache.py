@@ -0,0 +1,272 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from build_history import run_command
+
+# Shared apt state for the build workers. The host keeps one set of package
+# lists, refreshed by a single apt-get update per epoch and mounted read-only
+# into every worker, and one directory of downloaded .debs that workers seed
+# their installs from and publish new downloads to. Workers also record the
+# .debs each package's build-dep needs (its closure), so a later build of
+# the package can be prefetched before it starts.
+APT_CACHE_DIR = ".apt_cache"
+CONTAINER_LISTS = "/var/lib/apt/lists"
+CONTAINER_SHARED = "/var/cache/apt-shared"
+PRIVATE_ARCHIVES = "/tmp/apt-archives"
+EPOCH_SECONDS = 6 * 3600
+UPDATE_TIMEOUT = 600
+# The current lists and the ones before them, which jobs started before the
+# last refresh may still be reading.
+KEEP_SNAPSHOTS = 2
+DOWNLOAD_TIMEOUT = 300
+
+def parse_print_uris(output):
+    # apt-get --print-uris lines: 'URI' filename size SHA256:hash
+    debs = []
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) < 3 or not parts[0].startswith("'"):
+            continue
+        debs.append({
+            "uri": parts[0].strip("'"),
+            "file": parts[1],
+            "size": int(parts[2]),
+            "hash": parts[3] if len(parts) > 3 else "",
+        })
+    return debs
+
+def closure_path(shared, package_name):
+    return os.path.join(shared, "closures", f"{package_name}.json")
+
+def _publish(path, write):
+    # Readers never see a partial file: write next to it, then rename.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+def _valid(path, deb):
+    if os.path.getsize(path) != deb["size"]:
+        return False
+    if not deb["hash"].startswith("SHA256:"):
+        return True
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest() == deb["hash"][len("SHA256:"):]
+
+# Worker side
+
+def shared_lists():
+    return bool(os.environ.get("APT_SHARED_LISTS"))
+
+def seed_archives(shared, debs, archives):
+    # Links (or copies, across mounts) the cached .debs of a closure into
+    # apt's archive directory, where apt takes them as already downloaded.
+    os.makedirs(os.path.join(archives, "partial"), exist_ok=True)
+    seeded = 0
+    for deb in debs:
+        source = os.path.join(shared, deb["file"])
+        target = os.path.join(archives, deb["file"])
+        if os.path.exists(target) or not os.path.exists(source) or os.path.getsize(source) != deb["size"]:
+            continue
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+        seeded += 1
+    return seeded
+
+def publish_archives(archives, shared):
+    published = 0
+    for filename in os.listdir(archives):
+        target = os.path.join(shared, filename)
+        if filename.endswith(".deb") and not os.path.exists(target):
+            _publish(target, lambda tmp_path: shutil.copyfile(os.path.join(archives, filename), tmp_path))
+            published += 1
+    return published
+
+def install_build_deps(package_name, cwd, timeout):
+    # apt-get build-dep, installing from the shared cache where it has the
+    # .debs; without a shared cache, a plain build-dep.
+    shared = os.environ.get("APT_SHARED_CACHE")
+    if not shared:
+        return run_command(["sudo", "apt-get", "build-dep", package_name, "-y"],
+                           cwd=cwd, shell=False, timeout=timeout, capture_output=True, check=False)
+
+    uris = run_command(["apt-get", "build-dep", "--print-uris", "-qq", "-y", package_name],
+                       cwd=cwd, shell=False, timeout=timeout, capture_output=True, text=True, check=False)
+    debs = parse_print_uris(uris.stdout)
+    os.makedirs(os.path.dirname(closure_path(shared, package_name)), exist_ok=True)
+    _publish(closure_path(shared, package_name), lambda tmp_path: _write_json(tmp_path, debs))
+
+    shutil.rmtree(PRIVATE_ARCHIVES, ignore_errors=True)
+    seed_archives(shared, debs, PRIVATE_ARCHIVES)
+    try:
+        return run_command(["sudo", "apt-get", "-o", f"Dir::Cache::Archives={PRIVATE_ARCHIVES}/",
+                            "build-dep", package_name, "-y"],
+                           cwd=cwd, shell=False, timeout=timeout, capture_output=True, check=False)
+    finally:
+        publish_archives(PRIVATE_ARCHIVES, shared)
+        shutil.rmtree(PRIVATE_ARCHIVES, ignore_errors=True)
+
+# Host side
+
+class AptCache:
+    # lists is a symlink to the current snapshot under snapshots/. A refresh
+    # updates a copy of it and swaps the link, so a worker keeps the
+    # snapshot it was started with and never sees lists half rewritten.
+
+    def __init__(self, root, image, update_command=None, epoch_seconds=EPOCH_SECONDS):
+        self.root = os.path.abspath(root)
+        self.lists = os.path.join(self.root, "lists")
+        self.snapshots = os.path.join(self.root, "snapshots")
+        self.archives = os.path.join(self.root, "archives")
+        os.makedirs(self.snapshots, exist_ok=True)
+        os.makedirs(os.path.join(self.archives, "closures"), exist_ok=True)
+        # {lists} is the snapshot being updated.
+        self.update_command = update_command or [
+            "docker", "run", "--rm",
+            "-v", f"{{lists}}:{CONTAINER_LISTS}",
+            image,
+            "apt-get", "update"
+        ]
+        self.epoch_seconds = epoch_seconds
+        self.updates = 0
+        self.fetched = 0
+        self._lock = threading.Lock()
+        self._refresher = None
+        with self._host_lock():
+            if not os.path.islink(self.lists):
+                # First use, or a cache from before snapshots, whose lists
+                # become the first snapshot.
+                first = os.path.join(self.snapshots, "lists-0")
+                if os.path.isdir(self.lists):
+                    os.rename(self.lists, first)
+                os.makedirs(first, exist_ok=True)
+                self._swap(first)
+
+    @contextmanager
+    def _host_lock(self):
+        with open(os.path.join(self.root, "lock"), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _stamp(self):
+        return os.path.join(self.lists, ".epoch")
+
+    def snapshot(self):
+        return os.path.realpath(self.lists)
+
+    def _swap(self, snapshot):
+        # rename() over the old link is atomic.
+        link = f"{self.lists}.{os.getpid()}.tmp"
+        os.symlink(os.path.relpath(snapshot, self.root), link)
+        os.replace(link, self.lists)
+        names = sorted(os.listdir(self.snapshots), key=lambda name: int(name.rsplit("-", 1)[1]))
+        for name in names[:-KEEP_SNAPSHOTS]:
+            shutil.rmtree(os.path.join(self.snapshots, name), ignore_errors=True)
+
+    def fresh(self):
+        try:
+            return time.time() - os.path.getmtime(self._stamp()) < self.epoch_seconds
+        except OSError:
+            return False
+
+    def refresh(self):
+        # One apt-get update per epoch, however many threads or builders on
+        # this host ask for it at once.
+        if self.fresh():
+            return False
+        with self._lock, self._host_lock():
+            if self.fresh():
+                return False
+            # From a copy of the current lists, so apt only fetches what changed.
+            snapshot = os.path.join(self.snapshots, f"lists-{time.time_ns()}")
+            shutil.copytree(self.snapshot(), snapshot, symlinks=True)
+            command = [arg.replace("{lists}", snapshot) for arg in self.update_command]
+            try:
+                result = subprocess.run(command, capture_output=True, text=True,
+                                        timeout=UPDATE_TIMEOUT, check=False)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print(f"apt-get update for the shared cache failed: {e}")
+                shutil.rmtree(snapshot, ignore_errors=True)
+                return False
+            if result.returncode != 0:
+                print(f"apt-get update for the shared cache failed: {result.stderr}")
+                shutil.rmtree(snapshot, ignore_errors=True)
+                return False
+            with open(os.path.join(snapshot, ".epoch"), 'w'):
+                pass
+            self._swap(snapshot)
+            self.updates += 1
+            return True
+
+    def refresh_in_background(self):
+        # For the dispatch loop, which must not wait on apt-get update: the
+        # update runs on a thread, at most one at a time. Returns the thread,
+        # or None when the lists are fresh or an update is already running.
+        if self.fresh() or (self._refresher is not None and self._refresher.is_alive()):
+            return None
+        self._refresher = threading.Thread(target=self.refresh, daemon=True)
+        self._refresher.start()
+        return self._refresher
+
+    def volumes(self):
+        # Workers only get the shared lists while they are fresh; otherwise
+        # they update their own.
+        volumes = [f"{self.archives}:{CONTAINER_SHARED}"]
+        if self.fresh():
+            volumes.append(f"{self.snapshot()}:{CONTAINER_LISTS}:ro")
+        return volumes
+
+    def environment(self):
+        environment = {"APT_SHARED_CACHE": CONTAINER_SHARED}
+        if self.fresh():
+            environment["APT_SHARED_LISTS"] = "1"
+        return environment
+
+    def closure(self, package_name):
+        try:
+            with open(closure_path(self.archives, package_name), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def fetch(self, deb):
+        path = os.path.join(self.archives, deb["file"])
+        if os.path.exists(path) and os.path.getsize(path) == deb["size"]:
+            return False
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with urllib.request.urlopen(deb["uri"], timeout=DOWNLOAD_TIMEOUT) as response, open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(response, f)
+            if not _valid(tmp_path, deb):
+                raise ValueError("size or checksum mismatch")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Prefetch of {deb['file']} failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        with self._lock:
+            self.fetched += 1
+        return True
+
+    def prefetch(self, package_names):
+        # Downloads the recorded closures of packages ahead of their builds,
+        # in the order they will be built.
+        for package_name in package_names:
+            for deb in self.closure(package_name):
+                self.fetch(deb)
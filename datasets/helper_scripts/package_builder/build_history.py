@@ -0,0 +1,263 @@
+import argparse
+import os
+import re
+import resource
+import sqlite3
+import subprocess
+import threading
+import time
+from contextlib import closing, contextmanager
+
+# Per-phase timings of package builds. The worker times its phases inside
+# the container and returns them with its result; the host stores one row
+# per build and one per phase in a SQLite database next to the output.
+HISTORY_DB = ".build_history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    package TEXT NOT NULL,
+    version TEXT NOT NULL,
+    started REAL NOT NULL,
+    wall_seconds REAL NOT NULL,
+    cores INTEGER NOT NULL,
+    work INTEGER NOT NULL DEFAULT 0,
+    success INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS builds_package ON builds (package, started);
+CREATE TABLE IF NOT EXISTS phases (
+    build_id INTEGER NOT NULL REFERENCES builds (id),
+    phase TEXT NOT NULL,
+    wall_seconds REAL NOT NULL,
+    cpu_seconds REAL NOT NULL,
+    max_rss_bytes INTEGER,
+    returncode INTEGER
+);
+CREATE INDEX IF NOT EXISTS phases_build ON phases (build_id);
+"""
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+# Records of the phases running in this process. Commands run through
+# run_command add their peak RSS to each.
+_active_phases = []
+_active_lock = threading.Lock()
+
+def _add_peak(rss_bytes):
+    with _active_lock:
+        for record in _active_phases:
+            record["max_rss_bytes"] = max(record["max_rss_bytes"] or 0, rss_bytes)
+
+def _wait4(pid, timeout=None):
+    # (exit status, rusage) of the child, or None when it is still running
+    # at the timeout.
+    if timeout is None:
+        _, status, usage = os.wait4(pid, 0)
+        return status, usage
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        reaped, status, usage = os.wait4(pid, os.WNOHANG)
+        if reaped:
+            return status, usage
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+
+def run_command(command, input=None, timeout=None, capture_output=False, text=False, check=False, **kwargs):
+    # subprocess.run for the commands of a timed phase. The child is reaped
+    # with os.wait4, so its ru_maxrss is the peak of that command and of the
+    # processes it waited for, such as a build's compilers. The
+    # RUSAGE_CHILDREN ru_maxrss is instead a high-water mark of every child
+    # so far.
+    pipe = subprocess.PIPE if capture_output else None
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE if input is not None else None, stdout=pipe,
+                            stderr=pipe, text=text, **kwargs)
+    output = {"stdout": None, "stderr": None}
+
+    def feed():
+        try:
+            proc.stdin.write(input)
+            proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def drain(name, stream):
+        output[name] = stream.read()
+        stream.close()
+
+    threads = []
+    if capture_output:
+        threads += [threading.Thread(target=drain, args=("stdout", proc.stdout), daemon=True),
+                    threading.Thread(target=drain, args=("stderr", proc.stderr), daemon=True)]
+    if input is not None:
+        threads.append(threading.Thread(target=feed, daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        waited = _wait4(proc.pid, timeout)
+        timed_out = waited is None
+        if timed_out:
+            proc.kill()
+            waited = _wait4(proc.pid)
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    status, usage = waited
+    # Reaped here, so Popen must not wait for the pid again.
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    _add_peak(usage.ru_maxrss * 1024)
+
+    if timed_out:
+        # Like subprocess.run, no waiting for output that grandchildren of the
+        # killed command may still hold open.
+        raise subprocess.TimeoutExpired(command, timeout)
+    for thread in threads:
+        thread.join()
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command, output["stdout"], output["stderr"])
+    return subprocess.CompletedProcess(command, proc.returncode, output["stdout"], output["stderr"])
+
+@contextmanager
+def timed_phase(phases, name):
+    # Appends the phase's timings to phases; the caller sets 'returncode'
+    # on the yielded record when the phase has one. max_rss_bytes is the
+    # largest peak of the phase's run_command children, None when it ran
+    # none.
+    record = {"phase": name, "returncode": None, "max_rss_bytes": None}
+    wall_start, cpu_start = time.monotonic(), _cpu_seconds()
+    with _active_lock:
+        _active_phases.append(record)
+    try:
+        yield record
+    finally:
+        with _active_lock:
+            _active_phases[:] = [active for active in _active_phases if active is not record]
+        record["wall_seconds"] = time.monotonic() - wall_start
+        record["cpu_seconds"] = _cpu_seconds() - cpu_start
+        phases.append(record)
+
+def package_version(sub_dir_path):
+    # The version in the first debian/changelog entry, e.g. "zlib (1:1.3.dfsg-3) unstable".
+    try:
+        with open(os.path.join(sub_dir_path, "debian", "changelog"), 'r', errors='replace') as f:
+            match = re.match(r"\S+ \(([^)]+)\)", f.readline())
+            return match.group(1) if match else "unknown"
+    except OSError:
+        return "unknown"
+
+class BuildHistory:
+    # A connection per call, so builder threads and concurrent builders can
+    # share the database.
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def record_build(self, package, version, wall_seconds, cores, success, phases=(), work=0, started=None):
+        started = time.time() - wall_seconds if started is None else started
+        with closing(self._connect()) as conn, conn:
+            build_id = conn.execute(
+                "INSERT INTO builds (package, version, started, wall_seconds, cores, work, success) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (package, version, started, wall_seconds, cores, work, int(bool(success)))).lastrowid
+            conn.executemany(
+                "INSERT INTO phases (build_id, phase, wall_seconds, cpu_seconds, max_rss_bytes, returncode) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(build_id, p["phase"], p["wall_seconds"], p["cpu_seconds"], p.get("max_rss_bytes"),
+                  p.get("returncode")) for p in phases])
+        return build_id
+
+    def durations(self):
+        # The latest build of every package, in the shape the scheduler's
+        # cost model takes.
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT package, wall_seconds, cores, work FROM builds AS b "
+                "WHERE id = (SELECT id FROM builds WHERE package = b.package ORDER BY started DESC, id DESC LIMIT 1)"
+            ).fetchall()
+        return {package: {"seconds": seconds, "cores": cores, "work": work}
+                for package, seconds, cores, work in rows}
+
+    def slowest(self, limit=20, phase=None):
+        # (package, version, phase, wall seconds, cpu seconds, max rss) of the
+        # slowest builds, or of the slowest runs of one phase.
+        with closing(self._connect()) as conn:
+            if phase is None:
+                return conn.execute(
+                    "SELECT b.package, b.version, NULL, b.wall_seconds, SUM(p.cpu_seconds), MAX(p.max_rss_bytes) "
+                    "FROM builds AS b LEFT JOIN phases AS p ON p.build_id = b.id "
+                    "GROUP BY b.id ORDER BY b.wall_seconds DESC LIMIT ?", (limit,)).fetchall()
+            return conn.execute(
+                "SELECT b.package, b.version, p.phase, p.wall_seconds, p.cpu_seconds, p.max_rss_bytes "
+                "FROM phases AS p JOIN builds AS b ON p.build_id = b.id "
+                "WHERE p.phase = ? ORDER BY p.wall_seconds DESC LIMIT ?", (phase, limit)).fetchall()
+
+    def phase_totals(self):
+        # (phase, runs, total wall, mean wall, total cpu, max rss) over all builds.
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT phase, COUNT(*), SUM(wall_seconds), AVG(wall_seconds), SUM(cpu_seconds), MAX(max_rss_bytes) "
+                "FROM phases GROUP BY phase ORDER BY SUM(wall_seconds) DESC").fetchall()
+
+    def package_builds(self, package):
+        # (build id, version, started, wall seconds, cores, success, phases) of one package.
+        with closing(self._connect()) as conn:
+            builds = conn.execute(
+                "SELECT id, version, started, wall_seconds, cores, success FROM builds "
+                "WHERE package = ? ORDER BY started", (package,)).fetchall()
+            return [build + (conn.execute(
+                "SELECT phase, wall_seconds, cpu_seconds, max_rss_bytes, returncode FROM phases "
+                "WHERE build_id = ? ORDER BY rowid", (build[0],)).fetchall(),) for build in builds]
+
+def _mib(rss):
+    return f"{rss / (1024 * 1024):.0f} MiB" if rss is not None else "-"
+
+def main(args):
+    history = BuildHistory(args.database)
+    if args.command == 'slowest':
+        for package, version, phase, wall, cpu, rss in history.slowest(args.limit, args.phase):
+            label = f"{package} {version}" + (f" [{phase}]" if phase else "")
+            print(f"{wall:10.1f}s wall {cpu or 0:10.1f}s cpu {_mib(rss):>10}  {label}")
+    elif args.command == 'phases':
+        for phase, runs, total, mean, cpu, rss in history.phase_totals():
+            print(f"{phase:24} {runs:6} runs {total / 3600:8.2f}h wall (mean {mean:8.1f}s) "
+                  f"{cpu / 3600:8.2f}h cpu  peak {_mib(rss)}")
+    else:
+        for build_id, version, started, wall, cores, success, phases in history.package_builds(args.package):
+            print(f"{args.package} {version} at {time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}: "
+                  f"{wall:.1f}s on {cores} cores, {'ok' if success else 'failed'}")
+            for phase, phase_wall, cpu, rss, returncode in phases:
+                print(f"  {phase:24} {phase_wall:10.1f}s wall {cpu:10.1f}s cpu {_mib(rss):>10}  rc={returncode}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the build history of the package builder")
+    parser.add_argument('database', type=str, help=f'History database (<output_dir>/{HISTORY_DB})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    slowest = commands.add_parser('slowest', help='Slowest builds, or slowest runs of one phase')
+    slowest.add_argument('--phase', type=str, default=None)
+    slowest.add_argument('--limit', type=int, default=20)
+
+    commands.add_parser('phases', help='Time spent per phase over all builds')
+
+    package = commands.add_parser('package', help='Every recorded build of a package, phase by phase')
+    package.add_argument('package', type=str)
+
+    args = parser.parse_args()
+
+    main(args)
@@ -1,6 +1,7 @@
 import sys
 import json
 import os
+import subprocess
 import traceback
 import debugpy
 from process_package import process_package
@@ -10,24 +11,14 @@ class Package:
         self.path = path
         self.name = name
 
-if __name__ == "__main__":
-    # debugpy.listen(("0.0.0.0", 5678))
-    # debugpy.wait_for_client()
-    # debugpy.breakpoint()
-
+def run_job(package_dir, sub_dir):
     try:
-        package_dir = sys.argv[1]
-        sub_dir = sys.argv[2]
-
         package_name = os.path.basename(package_dir.rstrip('/'))
 
         package = Package(package_dir, package_name)
         package_subdir = Package(sub_dir, package_name)
 
-        result = process_package(package, package_subdir)
-
-        json.dump(result, sys.stdout)
-        sys.stdout.flush()
+        return process_package(package, package_subdir), False
 
     except Exception as e:
         print(f"Exception occurred: {str(e)}", file=sys.stderr)
@@ -55,7 +46,78 @@ if __name__ == "__main__":
             "",           # test_stdout_for_modified_package
             "",           # test_stderr_for_modified_package
             0,            # test_passed
-            []            # compilation_data
+            [],           # compilation_data
+            []            # phases
         )
-        json.dump(error_result, sys.stdout)
+        return error_result, True
+
+def container_dirty():
+    # Half-installed or broken packages would leak into the next build.
+    try:
+        audit = subprocess.run(["dpkg", "--audit"], capture_output=True, text=True, check=False)
+        return bool(audit.stdout.strip())
+    except OSError:
+        return False
+
+def package_selections():
+    # {package: state} from dpkg --get-selections, or None without dpkg.
+    try:
+        selections = subprocess.run(["dpkg", "--get-selections"], capture_output=True, text=True, check=False)
+    except OSError:
+        return None
+    if selections.returncode != 0:
+        return None
+    return dict(line.split(None, 1) for line in selections.stdout.splitlines() if len(line.split()) == 2)
+
+def restore_packages(baseline):
+    # Purges the packages a job installed, such as its build-deps. True when
+    # the selections match baseline again; a package the job removed cannot
+    # be put back, and leaves the worker dirty.
+    if baseline is None:
+        return True
+    current = package_selections()
+    if current is None:
+        return False
+    installed = sorted(set(current) - set(baseline))
+    if installed:
+        subprocess.run(["sudo", "apt-get", "purge", "-y", "-q"] + installed,
+                       capture_output=True,
+                       env={**os.environ, "DEBIAN_FRONTEND": "noninteractive"},
+                       check=False)
+        current = package_selections()
+    # Unlike removed packages, purged ones drop out of the selections.
+    return current == baseline
+
+def serve():
+    # Jobs from the worker pool, one JSON line each on stdin; one JSON line
+    # back per job. Everything else printed, by this process or the builds it
+    # runs, goes to stderr so it cannot corrupt the protocol.
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    # The packages of a fresh container; every job must leave it that way.
+    baseline = package_selections()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        os.environ["DEB_BUILD_OPTIONS"] = f"parallel={job['cores']}"
+        result, failed = run_job(job["package_dir"], job["sub_dir"])
+        dirty = failed or not restore_packages(baseline) or container_dirty()
+        json.dump({"result": result, "dirty": dirty}, protocol)
+        protocol.write("\n")
+        protocol.flush()
+
+if __name__ == "__main__":
+    # debugpy.listen(("0.0.0.0", 5678))
+    # debugpy.wait_for_client()
+    # debugpy.breakpoint()
+
+    if sys.argv[1:] == ["--serve"]:
+        serve()
+    else:
+        result, _ = run_job(sys.argv[1], sys.argv[2])
+
+        json.dump(result, sys.stdout)
         sys.stdout.flush()
@@ -2,44 +2,47 @@ import sys
 import subprocess
 import os
 import multiprocessing
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import time
 import orjson
 from tqdm import tqdm
 import debugpy
-
-def load_checkpoint(output_dir):
-    checkpoint_file = os.path.join(output_dir, ".checkpoint.txt")
-
-    if os.path.exists(checkpoint_file):
-        try:
-            with open(checkpoint_file, 'r') as f:
-                return set(line.strip() for line in f if line.strip())
-        except Exception as e:
-            print(f"Error loading checkpoint: {e}")
-            return set()
-    return set()
-
-def append_to_checkpoint(output_dir, package_name):
-    checkpoint_file = os.path.join(output_dir, ".checkpoint.txt")
-    try:
-        with open(checkpoint_file, 'a') as f:
-            f.write(f"{package_name}\n")
-    except Exception as e:
-        print(f"Error appending to checkpoint: {e}")
-
-def is_package_completed(package_name, output_dir):
+from build_history import BuildHistory, HISTORY_DB, package_version
+from worker_pool import DockerRuntime, WorkerError, WorkerPool, WORKER_IMAGE
+from apt_cache import AptCache, APT_CACHE_DIR
+from manifest import Manifest, MANIFEST_DB, source_fingerprint, toolchain_version
+from scheduler import (
+    source_work,
+    seconds_per_byte,
+    estimate_cost,
+    plan,
+    take_slice,
+)
+
+def completed_source_files(package_name, output_dir):
+    # The number of source files in a complete output, or None. Parses the
+    # whole output; only outputs from before the manifest need it.
     output_file = os.path.join(output_dir, f"{package_name}.json")
     if not os.path.exists(output_file):
-        return False
+        return None
 
     try:
         with open(output_file, 'rb') as f:
             data = orjson.loads(f.read())
-            return "name" in data and "source_files" in data
+            if "name" in data and "source_files" in data:
+                return len(data["source_files"])
+            return None
     except:
-        return False
+        return None
+
+def record_build(history, package_name, sub_dir_path, cpu_set, started, success, phases=(), work=0):
+    if history is not None:
+        history.record_build(package_name, package_version(sub_dir_path), time.monotonic() - started,
+                             len(cpu_set.split(',')), success, phases, work)
 
-def process_package(package_dir, sub_dir, output_dir, processed_packages, cpu_set):
+def process_package(package_dir, sub_dir, output_dir, cpu_set, pool, history=None, work=0, manifest=None,
+                    fingerprint=None):
 
     # debugpy.breakpoint()
 
@@ -47,43 +50,31 @@ def process_package(package_dir, sub_dir, output_dir, processed_packages, cpu_se
     sub_dir_path = os.path.abspath(sub_dir.path)
 
     package_name = os.path.basename(package_path)
-    sub_dir_name = os.path.basename(sub_dir_path)
-
-    if package_name in processed_packages or is_package_completed(package_name, output_dir):
-        print(f"Skipping already processed package: {package_name}")
-        return True, package_name
-
-    docker_cmd = [
-        "docker", "run", "--rm",
-        "--cpuset-cpus", cpu_set,
-        "-v", f"{package_path}:/worker/{package_name}",
-        "-v", f"{sub_dir_path}:/worker/{sub_dir_name}",
-        # "-p", "5678:5678",
-        "-w", "/worker",
-        "debian-builder",
-        "python3", "build_worker.py", f"/worker/{package_name}", f"/worker/{sub_dir_name}"
-    ]
 
     print(f"Processing Package: {package_name}")
 
+    started = time.monotonic()
     try:
-        result = subprocess.run(
-            docker_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=3600
-        )
-    except subprocess.TimeoutExpired:
-        print(f"Package {package_name} timed out after 3600 seconds")
+        fields = pool.run(package_path, sub_dir_path, cpu_set)
+    except subprocess.TimeoutExpired as e:
+        print(f"Package {package_name} timed out after {e.timeout} seconds")
+        record_build(history, package_name, sub_dir_path, cpu_set, started, False, work=work)
+        return False, package_name
+    except WorkerError as e:
+        print(f"Worker failed on package {package_name}: {e}")
+        record_build(history, package_name, sub_dir_path, cpu_set, started, False, work=work)
         return False, package_name
 
+    phases = []
     try:
+        # Phase timings follow the result; workers built before them omit them.
+        if isinstance(fields, list) and len(fields) > 22:
+            phases = fields[22]
         (build_system, dh_auto_config, dh_auto_build, dh_auto_test, build_stderr, build_returncode,
         test_stdout, test_stderr, test_returncode, test_detected, testing_framework,
         test_stdout_diff, test_stderr_diff, package_viable_for_test_dataset,
         rebuild_stderr, rebuild_returncode, modified_rebuild_stderr, modified_rebuild_returncode,
-        test_stdout_for_modified_package, test_stderr_for_modified_package, test_passed ,compilation_data) = orjson.loads(result.stdout)
+        test_stdout_for_modified_package, test_stderr_for_modified_package, test_passed ,compilation_data) = fields[:22]
 
 
         package_data = {
@@ -140,31 +131,51 @@ def process_package(package_dir, sub_dir, output_dir, processed_packages, cpu_se
         with open(output_file, 'wb') as f:
             f.write(orjson.dumps(package_data, option=orjson.OPT_INDENT_2))
 
+        # The fingerprint of the sources as the scan found them, before the
+        # build wrote into the tree.
+        if manifest is not None:
+            manifest.record(package_name, fingerprint, output_file, len(package_data["source_files"]))
+        record_build(history, package_name, sub_dir_path, cpu_set, started, True, phases, work)
         return True, package_name
-    except orjson.JSONDecodeError as e:
-        print(f"JSON decode error for {package_name}: {e}")
-        print(f"Raw output: {result.stdout!r}")
-        return False, package_name
     except Exception as e:
         print(f"Exception in package: {package_name}: {e}")
+        record_build(history, package_name, sub_dir_path, cpu_set, started, False, phases, work)
         return False, package_name
 
-def traverse_dir(root, output_dir, batch_size=None):
+def traverse_dir(root, output_dir, batch_size=None, apt_cache_dir=None):
 
-    processed_packages = load_checkpoint(output_dir)
-    print(f"Loaded {len(processed_packages)} processed packages from checkpoint.")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_DB), toolchain_version(WORKER_IMAGE))
+    print(f"Loaded {len(manifest)} built packages from the manifest.")
 
+    # Only packages whose sources, toolchain or pipeline version changed
+    # since their last build are processed again.
     packages = []
+    adopted = 0
     dirs = [d for d in os.scandir(root) if d.is_dir()]
 
     for dir in dirs:
         for sub_dir in os.scandir(dir.path):
             if sub_dir.is_dir():
                 package_name = os.path.basename(dir.path)
-                if package_name not in processed_packages and not is_package_completed(package_name, output_dir):
-                    packages.append((dir, sub_dir))
+                fingerprint = source_fingerprint(dir.path, sub_dir.path)
+                if manifest.up_to_date(package_name, fingerprint):
+                    break
+                source_files = None
+                if manifest.entry(package_name) is None:
+                    source_files = completed_source_files(package_name, output_dir)
+                if source_files is not None:
+                    # Built before there was a manifest.
+                    manifest.record(package_name, fingerprint, os.path.join(output_dir, f"{package_name}.json"),
+                                    source_files)
+                    adopted += 1
+                else:
+                    packages.append((dir, sub_dir, fingerprint))
                 break
 
+    if adopted:
+        print(f"Added {adopted} previously built packages to the manifest.")
+
     if batch_size is not None:
         packages = packages[:batch_size]
         print(f"Batch size limit: {batch_size}. Processing {len(packages)} packages.")
@@ -182,48 +193,76 @@ def traverse_dir(root, output_dir, batch_size=None):
     available_cpus = total_cpus - reserved_cpus
     max_workers = available_cpus // cores_per_worker
 
-    cpu_assignments = [
-        f"{i},{i+1}"
-        for i in range(0, max_workers * cores_per_worker, cores_per_worker)
-    ]
+    # Longest expected build first, on a slice wide enough to keep it off
+    # the tail of the run; small packages pack onto the remaining cores.
+    history = BuildHistory(os.path.join(output_dir, HISTORY_DB))
+    durations = history.durations()
+    rate = seconds_per_byte(durations, cores_per_worker)
+    work, costs = [], []
+    for dir, sub_dir, _ in packages:
+        package_name = os.path.basename(dir.path)
+        package_work = durations[package_name]["work"] if package_name in durations else source_work(sub_dir.path)
+        work.append(package_work)
+        costs.append(estimate_cost(package_name, package_work, durations, rate, cores_per_worker))
+    queue = plan(costs, max_workers * cores_per_worker, cores_per_worker)
+    free_cpus = list(range(max_workers * cores_per_worker))
 
     print(f"Total CPUs: {total_cpus}")
     print(f"Reserved: {reserved_cpus}")
-    print(f"Using {max_workers} workers with {cores_per_worker} cores each.")
-    print(f"CPU Assignments: {cpu_assignments}")
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-
-        futures = []
-        for i, (dir, sub_dir) in enumerate(packages):
-            cpu_set = cpu_assignments[i % len(cpu_assignments)]
-            future = executor.submit(
-                process_package,
-                dir,
-                sub_dir,
-                output_dir,
-                processed_packages,
-                cpu_set
-            )
-            futures.append(future)
-
-        results = []
-        for future in tqdm(
-            as_completed(futures),
-            total=len(packages),
-            desc="Processing packages"
-        ):
-            success, package_name = future.result()
-            results.append(success)
-
-            if success:
-                processed_packages.add(package_name)
-                append_to_checkpoint(output_dir, package_name)
+    print(f"Using up to {max_workers} workers on slices of {cores_per_worker} or more cores.")
+    print(f"Expected build time: {sum(costs) / 3600:.1f} hours on {cores_per_worker}-core slices.")
+
+    # One apt-get update and one .deb cache for all workers; the recorded
+    # dependency closures of queued packages download while others build.
+    apt_cache = AptCache(apt_cache_dir or os.path.join(output_dir, APT_CACHE_DIR), WORKER_IMAGE)
+    apt_cache.refresh()
+    threading.Thread(
+        target=apt_cache.prefetch,
+        args=([os.path.basename(packages[i][0].path) for i, _ in queue],),
+        daemon=True
+    ).start()
+    # Evaluated at each worker start, so workers started after a refresh get
+    # the new lists; idle workers on the old ones are recycled.
+    runtime = DockerRuntime(root, volumes=apt_cache.volumes, environment=apt_cache.environment)
+
+    with WorkerPool(runtime) as pool, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            tqdm(total=len(packages), desc="Processing packages") as progress:
+
+        running = {}
+        while queue or running:
+            apt_cache.refresh_in_background()
+            while queue and len(free_cpus) >= cores_per_worker:
+                i, width = queue.pop(0)
+                dir, sub_dir, fingerprint = packages[i]
+                cpus = take_slice(free_cpus, width, cores_per_worker)
+                future = executor.submit(
+                    process_package,
+                    dir,
+                    sub_dir,
+                    output_dir,
+                    ",".join(map(str, cpus)),
+                    pool,
+                    history,
+                    work[i],
+                    manifest,
+                    fingerprint
+                )
+                running[future] = cpus
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                free_cpus.extend(running.pop(future))
+                future.result()
+                progress.update(1)
+
+    print(f"Started {pool.started} build workers, recycled {pool.recycled}.")
+    print(f"apt-get updates: {apt_cache.updates}, prefetched .debs: {apt_cache.fetched}.")
 
 def main():
 
     if len(sys.argv) < 3:
-        print("Usage: python script.py <root_directory> <output_directory> [--batch-size N] [--force-reprocess]")
+        print("Usage: python script.py <root_directory> <output_directory> [--batch-size N] [--force-reprocess] [--apt-cache DIR]")
         sys.exit(1)
     root_dir = sys.argv[1]
     output_dir = sys.argv[2]
@@ -234,13 +273,17 @@ def main():
         batch_index = sys.argv.index("--batch-size") + 1
         batch_size = int(sys.argv[batch_index])
 
+    apt_cache_dir = None
+    if "--apt-cache" in sys.argv:
+        apt_cache_dir = sys.argv[sys.argv.index("--apt-cache") + 1]
+
     if force_reprocess:
-        checkpoint_file = os.path.join(output_dir, ".checkpoint.txt")
-        if os.path.exists(checkpoint_file):
-            os.remove(checkpoint_file)
-        print("Force reprocess enabled. Checkpoint cleared.")
+        for name in (MANIFEST_DB, MANIFEST_DB + "-wal", MANIFEST_DB + "-shm"):
+            if os.path.exists(os.path.join(output_dir, name)):
+                os.remove(os.path.join(output_dir, name))
+        print("Force reprocess enabled. Manifest cleared.")
 
-    traverse_dir(root_dir, output_dir, batch_size)
+    traverse_dir(root_dir, output_dir, batch_size, apt_cache_dir)
 
 if __name__ == "__main__":
     # debugpy.listen(("0.0.0.0", 5690))
@@ -0,0 +1,114 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import subprocess
+import time
+from contextlib import closing
+
+# Which packages are built, and from what. A package is up to date when the
+# manifest has it at the current pipeline version, from the same sources
+# and toolchain, and its output is still there; checking that is one row
+# lookup instead of parsing the output JSON.
+MANIFEST_DB = ".manifest.sqlite"
+# Bump whenever the worker's output changes, to rebuild every package.
+PIPELINE_VERSION = "1"
+# Packaging inputs of an unpacked source. Builds add files under debian/
+# and the pipeline edits debian/rules, but none of these change.
+PACKAGING_FILES = ("changelog", "control")
+PACKAGING_DIRS = ("source", "patches")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    package TEXT PRIMARY KEY,
+    source_fingerprint TEXT NOT NULL,
+    toolchain TEXT NOT NULL,
+    pipeline_version TEXT NOT NULL,
+    output_file TEXT NOT NULL,
+    output_bytes INTEGER NOT NULL,
+    source_files INTEGER NOT NULL,
+    completed REAL NOT NULL
+);
+"""
+
+def _hash_file(digest, path):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+def source_fingerprint(package_path, sub_dir_path):
+    # Taken before the build and compared on every scan, so it reads only
+    # small files that builds leave alone. The .dsc files next to the
+    # extracted source checksum every tarball it was unpacked from. Without
+    # them, the changelog (the version), control and the patch series stand
+    # for the sources; edit the tree without a new version or patch and the
+    # package needs --force-reprocess.
+    digest = hashlib.sha256()
+    dsc_files = sorted(glob.glob(os.path.join(glob.escape(package_path), "*.dsc")))
+    if dsc_files:
+        for path in dsc_files:
+            digest.update(os.path.basename(path).encode() + b"\0")
+            _hash_file(digest, path)
+        return "dsc:" + digest.hexdigest()
+
+    debian = os.path.join(sub_dir_path, "debian")
+    paths = [os.path.join(debian, name) for name in PACKAGING_FILES]
+    for name in PACKAGING_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(debian, name)):
+            dirnames.sort()
+            paths += [os.path.join(dirpath, filename) for filename in sorted(filenames)]
+    for path in paths:
+        if os.path.isfile(path) and not os.path.islink(path):
+            digest.update(os.path.relpath(path, debian).encode() + b"\0")
+            _hash_file(digest, path)
+    return "debian:" + digest.hexdigest()
+
+def toolchain_version(image):
+    # The builder image id: compilers, LLVM and debhelper all come from it.
+    try:
+        result = subprocess.run(["docker", "image", "inspect", "--format", "{{.Id}}", image],
+                                capture_output=True, text=True, check=False)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+class Manifest:
+    # toolchain None means unknown: entries are then not compared on it.
+
+    def __init__(self, path, toolchain=None, pipeline_version=PIPELINE_VERSION):
+        self.path = path
+        self.toolchain = toolchain
+        self.pipeline_version = pipeline_version
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def entry(self, package):
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM packages WHERE package = ?", (package,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def up_to_date(self, package, fingerprint):
+        entry = self.entry(package)
+        return (entry is not None
+                and entry["pipeline_version"] == self.pipeline_version
+                and entry["source_fingerprint"] == fingerprint
+                and (self.toolchain is None or entry["toolchain"] == self.toolchain)
+                and os.path.exists(entry["output_file"]))
+
+    def record(self, package, fingerprint, output_file, source_files):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO packages (package, source_fingerprint, toolchain, pipeline_version, "
+                "output_file, output_bytes, source_files, completed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (package, fingerprint, self.toolchain or "", self.pipeline_version, os.path.abspath(output_file),
+                 os.path.getsize(output_file), source_files, time.time()))
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM packages").fetchone()[0]
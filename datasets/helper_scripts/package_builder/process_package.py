@@ -14,6 +14,8 @@ from IR_extractor import generate_ir_output_command
 from ir2o import ir_to_o
 from nop_injection import ir_injection
 from ir_linker import ir_linker
+from build_history import run_command, timed_phase
+from apt_cache import install_build_deps, shared_lists
 import debugpy
 
 #TODO: Remove Magic Numbers
@@ -48,24 +50,24 @@ def build_package(package, no_preclean=None):
 
         if no_preclean:
         # Bear also used to capture compilation flags
-            result = subprocess.run(["dpkg-buildpackage", "-b", "-uc", "-us", "-nc"],
-                                    cwd=package.path,
-                                    capture_output=True,
-                                    text=True,
-                                    shell=False,
-                                    timeout=BUILD_TIMEOUT,
-                                    check=False
-                                    )
+            result = run_command(["dpkg-buildpackage", "-b", "-uc", "-us", "-nc"],
+                                 cwd=package.path,
+                                 capture_output=True,
+                                 text=True,
+                                 shell=False,
+                                 timeout=BUILD_TIMEOUT,
+                                 check=False
+                                 )
 
         else:
-            result = subprocess.run(["bear", "--", "dpkg-buildpackage", "-b", "-uc", "-us"],
-                                    cwd=package.path,
-                                    capture_output=True,
-                                    text=True,
-                                    shell=False,
-                                    timeout=BUILD_TIMEOUT,
-                                    check=False
-                                    )
+            result = run_command(["bear", "--", "dpkg-buildpackage", "-b", "-uc", "-us"],
+                                 cwd=package.path,
+                                 capture_output=True,
+                                 text=True,
+                                 shell=False,
+                                 timeout=BUILD_TIMEOUT,
+                                 check=False
+                                 )
 
         return result.stderr, result.returncode
     except subprocess.TimeoutExpired:
@@ -348,6 +350,7 @@ def process_package(package, package_subdir):
     test_stderr_for_modified_package = ""
     test_passed = 0
     compilation_data = []
+    phases = []
 
     try:
         dh_auto_config = run_dh_command("dh_auto_configure", package_subdir)
@@ -357,37 +360,42 @@ def process_package(package, package_subdir):
             build_system = detect_build_system(dh_auto_build)
 
             try:
-                subprocess.run(["sudo", "apt-get", "update"],
-                            shell=False,
-                            capture_output=True,
-                            check=False)
-
-                subprocess.run(["sudo", "apt-get", "build-dep", package.name, "-y"],
-                            cwd=package_subdir.path,
-                            shell=False,
-                            timeout=BUILDDEP_TIMEOUT,
-                            capture_output=True,
-                            check=False)
+                # Workers on the shared apt cache get lists updated once per epoch by the host.
+                if not shared_lists():
+                    with timed_phase(phases, "apt_update"):
+                        run_command(["sudo", "apt-get", "update"],
+                                    shell=False,
+                                    capture_output=True,
+                                    check=False)
+
+                with timed_phase(phases, "build_dep") as record:
+                    builddep = install_build_deps(package.name, package_subdir.path, BUILDDEP_TIMEOUT)
+                    record["returncode"] = builddep.returncode
             except Exception as e:
                 print(f"Build-dep failed: {e}", file=sys.stderr)
 
-            build_stderr, build_returncode = build_package(package_subdir)
+            with timed_phase(phases, "build") as record:
+                build_stderr, build_returncode = build_package(package_subdir)
+                record["returncode"] = build_returncode
 
             if build_returncode == 0:
                 dh_auto_test = run_dh_command("dh_auto_test", package_subdir)
 
                 if dh_auto_test != "":
-                    (test_stdout, test_stderr, test_returncode, test_detected,
-                    testing_framework, stdout_diff, stderr_diff,
-                    package_viable_for_test_dataset) = test_package(package.name,
-                                                                    dh_auto_test,
-                                                                    build_system,
-                                                                    package_subdir)
+                    with timed_phase(phases, "test") as record:
+                        (test_stdout, test_stderr, test_returncode, test_detected,
+                        testing_framework, stdout_diff, stderr_diff,
+                        package_viable_for_test_dataset) = test_package(package.name,
+                                                                        dh_auto_test,
+                                                                        build_system,
+                                                                        package_subdir)
+                        record["returncode"] = test_returncode
 
                 compilation_data = extract_compilation_commands(package_subdir.path)
 
                 if compilation_data:
-                    compilation_data = ir_processing_for_package(compilation_data)
+                    with timed_phase(phases, "ir_processing"):
+                        compilation_data = ir_processing_for_package(compilation_data)
 
                     trigger_relinking = 0
 
@@ -399,23 +407,26 @@ def process_package(package, package_subdir):
 
                     if trigger_relinking:
                         override_dh_dwz(package_subdir.path)
-                        rebuild_stderr, rebuild_returncode = build_package(package_subdir,
-                                                                    no_preclean=True)
+                        with timed_phase(phases, "rebuild") as record:
+                            rebuild_stderr, rebuild_returncode = build_package(package_subdir,
+                                                                        no_preclean=True)
+                            record["returncode"] = rebuild_returncode
 
                         if rebuild_returncode == 0:
-                            with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-                                futures = {executor.submit(process_modified_source_file, source_file): i
-                                        for i, source_file in enumerate(compilation_data)}
+                            with timed_phase(phases, "modified_ir_processing"):
+                                with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
+                                    futures = {executor.submit(process_modified_source_file, source_file): i
+                                            for i, source_file in enumerate(compilation_data)}
 
-                                results = [None] * len(compilation_data)
-                                for future in as_completed(futures):
-                                    idx = futures[future]
-                                    try:
-                                        results[idx] = future.result()
-                                    except Exception as e:
-                                        results[idx] = compilation_data[idx]
+                                    results = [None] * len(compilation_data)
+                                    for future in as_completed(futures):
+                                        idx = futures[future]
+                                        try:
+                                            results[idx] = future.result()
+                                        except Exception as e:
+                                            results[idx] = compilation_data[idx]
 
-                                compilation_data = results
+                                    compilation_data = results
 
                             trigger_relinking = 0
                             for source_file in compilation_data:
@@ -423,57 +434,65 @@ def process_package(package, package_subdir):
                                     trigger_relinking = 1
                                     break
                             if trigger_relinking:
-                                modified_rebuild_stderr, modified_rebuild_returncode = build_package(package_subdir,
-                                                                                                no_preclean=True)
+                                with timed_phase(phases, "modified_rebuild") as record:
+                                    modified_rebuild_stderr, modified_rebuild_returncode = build_package(package_subdir,
+                                                                                                    no_preclean=True)
+                                    record["returncode"] = modified_rebuild_returncode
 
                                 dh_auto_test_command = dh_auto_test
                                 if '\trm ' in dh_auto_test_command:
                                     dh_auto_test_command = dh_auto_test_command.split('\trm ')[0].strip()
                                 if modified_rebuild_returncode == 0 and package_viable_for_test_dataset:
-                                    test_stdout_for_modified_package, test_stderr_for_modified_package, test_passed = handle_test_rerun_and_diff(
-                                        test_stdout,
-                                        test_stderr,
-                                        dh_auto_test_command,
-                                        package_subdir,
-                                        package.name,
-                                        test_returncode
-                                    )
+                                    with timed_phase(phases, "test_rerun"):
+                                        test_stdout_for_modified_package, test_stderr_for_modified_package, test_passed = handle_test_rerun_and_diff(
+                                            test_stdout,
+                                            test_stderr,
+                                            dh_auto_test_command,
+                                            package_subdir,
+                                            package.name,
+                                            test_returncode
+                                        )
         else:
             build_system = detect_build_system(dh_auto_config)
 
             try:
-                subprocess.run(["sudo", "apt-get", "update"],
-                            shell=False,
-                            capture_output=True,
-                            check=False)
-
-                subprocess.run(["sudo", "apt-get", "build-dep", package.name, "-y"],
-                            cwd=package_subdir.path,
-                            shell=False,
-                            timeout=BUILDDEP_TIMEOUT,
-                            capture_output=True,
-                            check=False)
+                # Workers on the shared apt cache get lists updated once per epoch by the host.
+                if not shared_lists():
+                    with timed_phase(phases, "apt_update"):
+                        run_command(["sudo", "apt-get", "update"],
+                                    shell=False,
+                                    capture_output=True,
+                                    check=False)
+
+                with timed_phase(phases, "build_dep") as record:
+                    builddep = install_build_deps(package.name, package_subdir.path, BUILDDEP_TIMEOUT)
+                    record["returncode"] = builddep.returncode
             except Exception as e:
                 print(f"Build-dep failed: {e}", file=sys.stderr)
 
-            build_stderr, build_returncode = build_package(package_subdir)
+            with timed_phase(phases, "build") as record:
+                build_stderr, build_returncode = build_package(package_subdir)
+                record["returncode"] = build_returncode
 
             if build_returncode == 0:
                 dh_auto_build = run_dh_command("dh_auto_build", package_subdir)
                 dh_auto_test = run_dh_command("dh_auto_test", package_subdir)
 
                 if dh_auto_test != "":
-                    (test_stdout, test_stderr, test_returncode, test_detected,
-                    testing_framework, stdout_diff, stderr_diff,
-                    package_viable_for_test_dataset) = test_package(package.name,
-                                                                    dh_auto_test,
-                                                                    build_system,
-                                                                    package_subdir)
+                    with timed_phase(phases, "test") as record:
+                        (test_stdout, test_stderr, test_returncode, test_detected,
+                        testing_framework, stdout_diff, stderr_diff,
+                        package_viable_for_test_dataset) = test_package(package.name,
+                                                                        dh_auto_test,
+                                                                        build_system,
+                                                                        package_subdir)
+                        record["returncode"] = test_returncode
 
                 compilation_data = extract_compilation_commands(package_subdir.path)
 
                 if compilation_data:
-                    compilation_data = ir_processing_for_package(compilation_data)
+                    with timed_phase(phases, "ir_processing"):
+                        compilation_data = ir_processing_for_package(compilation_data)
 
                     trigger_relinking = 0
 
@@ -485,23 +504,26 @@ def process_package(package, package_subdir):
 
                     if trigger_relinking:
                         override_dh_dwz(package_subdir.path)
-                        rebuild_stderr, rebuild_returncode = build_package(package_subdir,
-                                                                    no_preclean=True)
+                        with timed_phase(phases, "rebuild") as record:
+                            rebuild_stderr, rebuild_returncode = build_package(package_subdir,
+                                                                        no_preclean=True)
+                            record["returncode"] = rebuild_returncode
 
                         if rebuild_returncode == 0:
-                            with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-                                futures = {executor.submit(process_modified_source_file, source_file): i
-                                        for i, source_file in enumerate(compilation_data)}
+                            with timed_phase(phases, "modified_ir_processing"):
+                                with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
+                                    futures = {executor.submit(process_modified_source_file, source_file): i
+                                            for i, source_file in enumerate(compilation_data)}
 
-                                results = [None] * len(compilation_data)
-                                for future in as_completed(futures):
-                                    idx = futures[future]
-                                    try:
-                                        results[idx] = future.result()
-                                    except Exception as e:
-                                        results[idx] = compilation_data[idx]
+                                    results = [None] * len(compilation_data)
+                                    for future in as_completed(futures):
+                                        idx = futures[future]
+                                        try:
+                                            results[idx] = future.result()
+                                        except Exception as e:
+                                            results[idx] = compilation_data[idx]
 
-                                compilation_data = results
+                                    compilation_data = results
 
                             trigger_relinking = 0
                             for source_file in compilation_data:
@@ -509,21 +531,24 @@ def process_package(package, package_subdir):
                                     trigger_relinking = 1
                                     break
                             if trigger_relinking:
-                                modified_rebuild_stderr, modified_rebuild_returncode = build_package(package_subdir,
-                                                                                                no_preclean=True)
+                                with timed_phase(phases, "modified_rebuild") as record:
+                                    modified_rebuild_stderr, modified_rebuild_returncode = build_package(package_subdir,
+                                                                                                    no_preclean=True)
+                                    record["returncode"] = modified_rebuild_returncode
 
                                 dh_auto_test_command = dh_auto_test
                                 if '\trm ' in dh_auto_test_command:
                                     dh_auto_test_command = dh_auto_test_command.split('\trm ')[0].strip()
                                 if modified_rebuild_returncode == 0 and package_viable_for_test_dataset:
-                                    test_stdout_for_modified_package, test_stderr_for_modified_package, test_passed = handle_test_rerun_and_diff(
-                                        test_stdout,
-                                        test_stderr,
-                                        dh_auto_test_command,
-                                        package_subdir,
-                                        package.name,
-                                        test_returncode
-                                    )
+                                    with timed_phase(phases, "test_rerun"):
+                                        test_stdout_for_modified_package, test_stderr_for_modified_package, test_passed = handle_test_rerun_and_diff(
+                                            test_stdout,
+                                            test_stderr,
+                                            dh_auto_test_command,
+                                            package_subdir,
+                                            package.name,
+                                            test_returncode
+                                        )
 
 
     except Exception as e:
@@ -537,4 +562,4 @@ def process_package(package, package_subdir):
             testing_framework, stdout_diff, stderr_diff, package_viable_for_test_dataset,
             rebuild_stderr, rebuild_returncode, modified_rebuild_stderr,
             modified_rebuild_returncode, test_stdout_for_modified_package, test_stderr_for_modified_package,
-            test_passed, compilation_data)
+            test_passed, compilation_data, phases)
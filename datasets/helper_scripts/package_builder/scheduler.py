@@ -0,0 +1,89 @@
+import os
+import orjson
+
+# Cost model for a package build, in expected wall seconds on a base slice.
+# Past durations (BuildHistory.durations) are used when a package has been
+# built before; otherwise the cost is extrapolated from the amount of C/C++
+# it compiles, at a rate calibrated on the packages that have a recorded
+# duration.
+SOURCE_SUFFIXES = ('.c', '.cpp', '.cc', '.cxx', '.C')
+# A translation unit pulls in headers, so every compile command counts
+# for this many bytes of work on top of its source.
+BYTES_PER_COMMAND = 64 * 1024
+BASE_SECONDS = 60
+DEFAULT_SECONDS_PER_MB = 120
+# Share of a build that scales with the cores of its slice (Amdahl);
+# configure, tests and IR extraction of single files mostly do not.
+PARALLEL_FRACTION = 0.6
+MAX_SLICE_CORES = 16
+
+def count_compile_commands(sub_dir_path):
+    # compile_commands.json is left in the source tree by an earlier build.
+    path = os.path.join(sub_dir_path, "compile_commands.json")
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, 'rb') as f:
+            return sum(1 for cmd in orjson.loads(f.read()) if cmd.get('file', '').endswith(SOURCE_SUFFIXES))
+    except Exception:
+        return 0
+
+def source_work(sub_dir_path):
+    source_bytes = 0
+    for dirpath, _, filenames in os.walk(sub_dir_path):
+        for filename in filenames:
+            if filename.endswith(SOURCE_SUFFIXES):
+                try:
+                    source_bytes += os.lstat(os.path.join(dirpath, filename)).st_size
+                except OSError:
+                    pass
+    return source_bytes + count_compile_commands(sub_dir_path) * BYTES_PER_COMMAND
+
+def runtime(cost, cores, base_cores):
+    # Expected wall seconds on a slice of cores, for a cost on base_cores.
+    return cost * ((1 - PARALLEL_FRACTION) + PARALLEL_FRACTION * base_cores / cores)
+
+def base_cost(entry, base_cores):
+    # A recorded duration, scaled back to what it would take on base_cores.
+    return entry["seconds"] / runtime(1.0, entry["cores"], base_cores)
+
+def seconds_per_byte(history, base_cores):
+    seconds, work = 0.0, 0
+    for entry in history.values():
+        if entry.get("work"):
+            seconds += max(base_cost(entry, base_cores) - BASE_SECONDS, 0.0)
+            work += entry["work"]
+    if seconds and work:
+        return seconds / work
+    return DEFAULT_SECONDS_PER_MB / (1024 * 1024)
+
+def estimate_cost(package_name, work, history, rate, base_cores):
+    if package_name in history:
+        return base_cost(history[package_name], base_cores)
+    return BASE_SECONDS + work * rate
+
+def slice_width(cost, target, base_cores, max_cores):
+    # The narrowest slice (a power-of-two multiple of base_cores) on which a
+    # package is expected to finish within target, the makespan of a perfect
+    # packing; packages that cannot get the widest slice.
+    width = base_cores
+    while width < max_cores and runtime(cost, width, base_cores) > target:
+        width = min(width * 2, max_cores)
+    return width
+
+def plan(costs, available_cpus, base_cores, max_cores=MAX_SLICE_CORES):
+    # (index, width) of every package, longest expected first.
+    max_cores = max(base_cores, min(max_cores, available_cpus - available_cpus % base_cores))
+    target = sum(costs) * base_cores / max(available_cpus, base_cores)
+    order = sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+    return [(i, slice_width(costs[i], target, base_cores, max_cores)) for i in order]
+
+def take_slice(free_cpus, width, base_cores):
+    # Takes up to width of the free cores, lowest ids first so slices stay
+    # close together. A wide package that does not fit starts on what is
+    # left rather than holding the cores idle.
+    width = min(width, len(free_cpus) - len(free_cpus) % base_cores)
+    free_cpus.sort()
+    cpus = free_cpus[:width]
+    del free_cpus[:width]
+    return cpus
@@ -0,0 +1,213 @@
+import itertools
+import os
+import posixpath
+import subprocess
+import sys
+import threading
+import orjson
+
+# Long-lived build workers. A worker runs build_worker.py --serve, reads one
+# JSON job per line on stdin ({"package_dir", "sub_dir", "cores"}) and
+# answers each with one line, {"result": <process_package result>, "dirty": bool}.
+# Workers are recycled after max_jobs jobs, when they report a dirty
+# container (a failed job, or packages that differ from the fresh
+# container's), when they time out or die, and when the runtime would now
+# start them with other mounts or environment.
+WORKER_IMAGE = "debian-builder"
+CONTAINER_ROOT = "/packages"
+BUILD_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build_worker.py")
+JOB_TIMEOUT = 3600
+MAX_JOBS_PER_WORKER = 25
+STOP_TIMEOUT = 60
+
+class WorkerError(Exception):
+    pass
+
+class Worker:
+
+    def __init__(self, name, process, cpus):
+        self.name = name
+        self.process = process
+        self.cpus = cpus
+        self.jobs = 0
+        self.killed = False
+        self.options = None
+
+# A runtime starts, resizes and kills workers, maps host package paths to
+# the paths the worker sees, and tells whether a worker is stale.
+
+class DockerRuntime:
+    # One container per worker, with the package root mounted once; a new
+    # CPU slice is applied to the running container with docker update.
+    # volumes and environment may be callables, evaluated at each start, for
+    # mounts that change during a run.
+
+    def __init__(self, root, image=WORKER_IMAGE, volumes=(), environment=None):
+        self.root = os.path.abspath(root)
+        self.image = image
+        self.volumes = volumes
+        self.environment = environment or {}
+        self._ids = itertools.count()
+
+    def path(self, host_path):
+        return posixpath.join(CONTAINER_ROOT, os.path.relpath(os.path.abspath(host_path), self.root))
+
+    def options(self):
+        volumes = self.volumes() if callable(self.volumes) else self.volumes
+        environment = self.environment() if callable(self.environment) else self.environment
+        return list(volumes), dict(environment)
+
+    def start(self, cpus):
+        name = f"{self.image}-{os.getpid()}-{next(self._ids)}"
+        volumes, environment = self.options()
+        command = ["docker", "run", "-i", "--rm", "--name", name,
+                   "--cpuset-cpus", cpus,
+                   "-v", f"{self.root}:{CONTAINER_ROOT}"]
+        for volume in volumes:
+            command += ["-v", volume]
+        for key, value in environment.items():
+            command += ["-e", f"{key}={value}"]
+        command += ["-w", "/worker", self.image, "python3", "build_worker.py", "--serve"]
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+        worker = Worker(name, process, cpus)
+        worker.options = (volumes, environment)
+        return worker
+
+    def stale(self, worker):
+        return worker.options != self.options()
+
+    def resize(self, worker, cpus):
+        subprocess.run(["docker", "update", "--cpuset-cpus", cpus, worker.name],
+                       capture_output=True, check=False)
+
+    def kill(self, worker):
+        subprocess.run(["docker", "kill", worker.name], capture_output=True, check=False)
+        worker.process.kill()
+
+class LocalRuntime:
+    # Workers as plain local processes, pinned to their slice where the
+    # platform allows it. Stands in for docker in tests.
+
+    def __init__(self, command=None):
+        self.command = command or [sys.executable, BUILD_WORKER, "--serve"]
+        self._ids = itertools.count()
+
+    def path(self, host_path):
+        return os.path.abspath(host_path)
+
+    def start(self, cpus):
+        process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True)
+        worker = Worker(f"local-{next(self._ids)}", process, cpus)
+        self.resize(worker, cpus)
+        return worker
+
+    def stale(self, worker):
+        return False
+
+    def resize(self, worker, cpus):
+        try:
+            os.sched_setaffinity(worker.process.pid, {int(cpu) for cpu in cpus.split(',')})
+        except (AttributeError, OSError, ValueError):
+            pass
+
+    def kill(self, worker):
+        worker.process.kill()
+
+class WorkerPool:
+
+    def __init__(self, runtime, max_jobs=MAX_JOBS_PER_WORKER, timeout=JOB_TIMEOUT):
+        self.runtime = runtime
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.started = 0
+        self.recycled = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _acquire(self, cpus):
+        with self._lock:
+            worker = self._idle.pop() if self._idle else None
+        if worker is not None and (worker.process.poll() is not None or self.runtime.stale(worker)):
+            self._retire(worker)
+            worker = None
+        if worker is None:
+            with self._lock:
+                self.started += 1
+            return self.runtime.start(cpus)
+        if worker.cpus != cpus:
+            self.runtime.resize(worker, cpus)
+            worker.cpus = cpus
+        return worker
+
+    def _kill(self, worker):
+        worker.killed = True
+        self.runtime.kill(worker)
+
+    def _stop(self, worker):
+        try:
+            worker.process.stdin.close()
+            worker.process.wait(timeout=STOP_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            self._kill(worker)
+            worker.process.wait()
+
+    def _retire(self, worker):
+        with self._lock:
+            self.recycled += 1
+        self._stop(worker)
+
+    def run(self, package_path, sub_dir_path, cpus):
+        # The result tuple of process_package for one package, built on the
+        # given CPU slice.
+        worker = self._acquire(cpus)
+        job = {
+            "package_dir": self.runtime.path(package_path),
+            "sub_dir": self.runtime.path(sub_dir_path),
+            "cores": len(cpus.split(',')),
+        }
+        timer = threading.Timer(self.timeout, self._kill, (worker,))
+        timer.start()
+        try:
+            worker.process.stdin.write(orjson.dumps(job).decode() + "\n")
+            worker.process.stdin.flush()
+            line = worker.process.stdout.readline()
+        except OSError:
+            line = ""
+        finally:
+            timer.cancel()
+        worker.jobs += 1
+
+        try:
+            response = orjson.loads(line) if line else None
+        except orjson.JSONDecodeError:
+            response = None
+        if response is None or response.get("dirty") or worker.killed or worker.jobs >= self.max_jobs:
+            self._retire(worker)
+        else:
+            with self._lock:
+                self._idle.append(worker)
+
+        if response is None and worker.killed:
+            raise subprocess.TimeoutExpired(worker.name, self.timeout)
+        if response is None:
+            raise WorkerError(f"worker {worker.name} exited without a result")
+        return response["result"]
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._stop(worker)
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import llvmlite.binding as llvm
+from static_analysis.structural_analysis.llvm_ir_inprocess import opt_version, CANONICALIZATION_PASSES as INPROCESS_PASSES
+from static_analysis.structural_analysis.llvm_ir_canonicalization_and_normalization import CANONICALIZATION_PASSES
+
+CACHE_KINDS = ('canonicalize', 'functions', 'cfgs', 'alive2')
+
+def toolchain_fingerprint():
+    # Only the version line: the rest of `opt --version` names the host CPU,
+    # which would split the cache between otherwise identical machines.
+    match = re.search(r'LLVM version \S+', opt_version() or "")
+    return "|".join([
+        match.group(0) if match else "no-opt",
+        ",".join(CANONICALIZATION_PASSES),
+        "llvmlite-" + ".".join(str(v) for v in llvm.llvm_version_info),
+        ",".join(INPROCESS_PASSES),
+    ])
+
+def cache_key(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+class AnalysisCache:
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024, evict_every=64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.fingerprint = toolchain_fingerprint()
+        self.counters = {kind: {'hits': 0, 'misses': 0} for kind in CACHE_KINDS}
+        self._puts = 0
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Worker processes share the file; WAL lets readers proceed while one
+        # of them writes.
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def key(self, kind, llvm_ir, *extra):
+        return cache_key(kind, self.fingerprint, *extra, llvm_ir)
+
+    def get(self, kind, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters[kind]['misses'] += 1
+                return None
+            self.counters[kind]['hits'] += 1
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, kind, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        # The Alive2 scheduler shares one cache between its threads.
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, blob, len(blob), time.time())
+            )
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                self.evict()
+
+    def total_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        with self._lock:
+            return self._evict()
+
+    def _evict(self):
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        evicted = 0
+        freed = 0
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, size in rows:
+                if freed >= excess:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                freed += size
+                evicted += 1
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return evicted
+
+    def drain_counters(self):
+        with self._lock:
+            counters = self.counters
+            self.counters = {kind: {'hits': 0, 'misses': 0} for kind in CACHE_KINDS}
+        return counters
+
+    def close(self):
+        self.evict()
+        self._conn.close()
+
+def merge_cache_counters(total, counters):
+    for kind, counts in counters.items():
+        entry = total.setdefault(kind, {'hits': 0, 'misses': 0})
+        entry['hits'] += counts['hits']
+        entry['misses'] += counts['misses']
+
+def transient_failure(*messages):
+    # Timeouts and unexpected exceptions say nothing about the IR itself and
+    # must be retried on the next run rather than cached.
+    return any(m and ("timed out" in m or m.startswith("Error during")) for m in messages)
@@ -0,0 +1,345 @@
+import argparse
+import orjson
+import os
+import random
+import sys
+import time
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
+import runner
+from runtime_db import percentile
+from llvm_tools import ir_inputs
+from stages import DEFAULT_RULES
+from static_analysis.semantic_analysis.llvm_ir_alive2_scheduler import (
+    Alive2Scheduler, FIRST_PASS_TIMEOUT, ESCALATION_TIMEOUT
+)
+import static_analysis.structural_analysis.llvm_ir_canonicalization_and_normalization as canonicalization
+import static_analysis.structural_analysis.llvm_ir_analysis_context as analysis_context
+
+PLAYGROUND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'playground', 'LLVM IR Tasks')
+
+# Stages timed per sample, in pipeline order.
+STAGES = ('verify', 'canonicalize', 'functions', 'diff', 'cfg', 'alive2', 'compile', 'io')
+
+# (module, attribute, stage) of every function timed. The in-process engine
+# verifies while it canonicalizes, so that call counts as canonicalize.
+TIMED_CALLS = (
+    (canonicalization, 'verify_ir', 'verify'),
+    (canonicalization, 'canonicalize_and_normalize_ir', 'canonicalize'),
+    (canonicalization, 'verify_and_canonicalize_inprocess', 'canonicalize'),
+    (analysis_context, 'module_function_info', 'functions'),
+    (runner, 'compare_function_info', 'functions'),
+    (runner, 'diff_llvm_ir', 'diff'),
+    (analysis_context, 'module_cfgs', 'cfg'),
+    (runner, 'compare_function_cfgs', 'cfg'),
+    (runner, 'verify_with_alive2', 'alive2'),
+    (runner, 'compilation_check', 'compile'),
+    (runner, 'incremental_compilation_check', 'compile'),
+    (runner, 'io_test', 'io'),
+)
+
+MUTATIONS = ('identical', 'equivalent', 'changed')
+
+# Relative slowdown against the baseline that counts as a regression, and
+# the absolute difference below which timings are treated as noise.
+TOLERANCE = 0.2
+MIN_DELTA_SECONDS = 0.001
+
+def playground_pairs(root=PLAYGROUND):
+    # Every task directory pairs its original*.ll with each other .ll file.
+    items = []
+    for directory, _, files in sorted(os.walk(root)):
+        modules = sorted(f for f in files if f.endswith('.ll'))
+        originals = [f for f in modules if f.startswith('original')]
+        if not originals:
+            continue
+        with open(os.path.join(directory, originals[0])) as f:
+            ref_ir = f.read()
+        for name in modules:
+            if name == originals[0]:
+                continue
+            with open(os.path.join(directory, name)) as f:
+                tgt_ir = f.read()
+            task = os.path.relpath(os.path.join(directory, name), root)
+            items.append({'id': f"playground/{task}", 'src': "", 'ref_ir': ref_ir, 'tgt_ir': tgt_ir})
+    return items
+
+def synthetic_function(name, blocks, rng, swap_operands=False, changed=False):
+    # A chain of if/else diamonds merged by phis, about three blocks each.
+    lines = [f"define i32 @{name}(i32 %x) {{", "entry:"]
+    value = "%x"
+    diamonds = max(1, blocks // 3)
+    changed_at = rng.randrange(diamonds) if changed else None
+    for j in range(diamonds):
+        bound, step, factor = rng.randint(-50, 50), rng.randint(1, 9), rng.randint(2, 5)
+        if j == changed_at:
+            step += 1
+        then_value = f"i32 {step}, {value}" if swap_operands else f"i32 {value}, {step}"
+        lines += [
+            f"  %c{j} = icmp slt i32 {value}, {bound}",
+            f"  br i1 %c{j}, label %t{j}, label %e{j}",
+            f"t{j}:",
+            f"  %p{j} = add {then_value}",
+            f"  br label %m{j}",
+            f"e{j}:",
+            f"  %q{j} = mul i32 {value}, {factor}",
+            f"  br label %m{j}",
+            f"m{j}:",
+            f"  %r{j} = phi i32 [ %p{j}, %t{j} ], [ %q{j}, %e{j} ]",
+        ]
+        value = f"%r{j}"
+    lines += [f"  ret i32 {value}", "}"]
+    return "\n".join(lines) + "\n"
+
+def synthetic_module(functions, blocks, seed, mutation='identical'):
+    # main returns the low byte of the sum of all functions, so the I/O stage
+    # sees a difference in the exit code. The mutation touches one function.
+    mutated = random.Random(seed).randrange(functions)
+    parts, calls = [], ["define i32 @main() {", "entry:"]
+    total = "0"
+    for k in range(functions):
+        rng = random.Random(seed * 1000003 + k)
+        parts.append(synthetic_function(
+            f"f{k}", blocks, rng,
+            swap_operands=(mutation == 'equivalent' and k == mutated),
+            changed=(mutation == 'changed' and k == mutated)
+        ))
+        calls += [f"  %v{k} = call i32 @f{k}(i32 {k + 1})", f"  %s{k} = add i32 {total}, %v{k}"]
+        total = f"%s{k}"
+    calls += [f"  %low = and i32 {total}, 255", "  ret i32 %low", "}"]
+    return "\n".join(parts + ["\n".join(calls) + "\n"])
+
+def synthetic_pairs(samples, functions=4, blocks=12, seed=0, mutations=MUTATIONS):
+    items = []
+    for n in range(samples):
+        mutation = mutations[n % len(mutations)]
+        items.append({
+            'id': f"synthetic/{n}-{mutation}",
+            'src': "",
+            'ref_ir': synthetic_module(functions, blocks, seed + n),
+            'tgt_ir': synthetic_module(functions, blocks, seed + n, mutation),
+        })
+    return items
+
+def alive2_stub(src_ir, tgt_ir, *args, **kwargs):
+    # Hands both modules over as alive-tv would receive them, without solving.
+    with ir_inputs(src_ir, tgt_ir):
+        return False, "", "alive2 stub"
+
+@contextmanager
+def timed_stages(durations, alive2='stub'):
+    # Adds the time spent in each stage function to durations[stage] while
+    # active; the originals are restored on exit.
+    def timed(function, stage):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                durations[stage] = durations.get(stage, 0.0) + time.perf_counter() - start
+        return wrapper
+
+    with ExitStack() as stack:
+        for module, attribute, stage in TIMED_CALLS:
+            saved = getattr(module, attribute)
+            function = alive2_stub if stage == 'alive2' and alive2 == 'stub' else saved
+            setattr(module, attribute, timed(function, stage))
+            stack.callback(setattr, module, attribute, saved)
+        yield durations
+
+class TimedScheduler:
+    # Hands pairs to an Alive2Scheduler and times each from submission until
+    # its verdict is in; the pipeline overlaps that with compile and I/O.
+
+    def __init__(self, scheduler, durations):
+        self.scheduler = scheduler
+        self.durations = durations
+        self.escalation_timeout = scheduler.escalation_timeout
+
+    def submit(self, *args, **kwargs):
+        start = time.perf_counter()
+        timed = Future()
+
+        def resolve(future):
+            # Recorded before the pipeline can see the verdict.
+            self.durations['alive2'] = self.durations.get('alive2', 0.0) + time.perf_counter() - start
+            if future.exception() is not None:
+                timed.set_exception(future.exception())
+            else:
+                timed.set_result(future.result())
+
+        self.scheduler.submit(*args, **kwargs).add_done_callback(resolve)
+        return timed
+
+def run_benchmark(items, repeat=1, alive2='stub', alive2_workers=4, alive2_timeout=FIRST_PASS_TIMEOUT,
+                  alive2_escalation_timeout=ESCALATION_TIMEOUT, **batch_options):
+    # Runs the items one at a time through process_batch, so every stage
+    # duration belongs to exactly one sample. Short-circuit rules are off
+    # unless given, so that every stage is timed. Real Alive2 runs on a
+    # scheduler set up as the runner's is.
+    batch_options.setdefault('rules', frozenset())
+    scheduler = None
+    if alive2 == 'real':
+        scheduler = Alive2Scheduler(
+            max_workers=alive2_workers,
+            first_timeout=alive2_timeout,
+            escalation_timeout=alive2_escalation_timeout,
+            cache=runner.analysis_cache
+        )
+    samples = []
+    start = time.perf_counter()
+    try:
+        for _ in range(repeat):
+            for item in items:
+                durations = {}
+                if scheduler is not None:
+                    batch_options['alive2'] = TimedScheduler(scheduler, durations)
+                with timed_stages(durations, alive2=alive2):
+                    sample_start = time.perf_counter()
+                    runner.process_batch([item], keys=[item['id']], **batch_options)
+                    durations['total'] = time.perf_counter() - sample_start
+                samples.append(durations)
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown()
+    elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed)
+
+def summarize(samples, elapsed):
+    stages = {}
+    for stage in STAGES + ('total',):
+        values = [sample[stage] for sample in samples if stage in sample]
+        if values:
+            stages[stage] = {
+                'samples': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+            }
+    return {
+        'samples': len(samples),
+        'seconds': elapsed,
+        'samples_per_second': len(samples) / elapsed if elapsed > 0 else 0.0,
+        'stages': stages,
+    }
+
+def compare_to_baseline(report, baseline, tolerance=TOLERANCE):
+    # Returns a list of (metric, baseline, current) that regressed.
+    regressions = []
+    if report['samples_per_second'] * (1 + tolerance) < baseline['samples_per_second']:
+        regressions.append(('samples_per_second', baseline['samples_per_second'], report['samples_per_second']))
+    for stage, stats in report['stages'].items():
+        previous = baseline['stages'].get(stage)
+        if previous is None:
+            continue
+        for q in ('p50', 'p95'):
+            if stats[q] > previous[q] * (1 + tolerance) and stats[q] - previous[q] > MIN_DELTA_SECONDS:
+                regressions.append((f"{stage}.{q}", previous[q], stats[q]))
+    return regressions
+
+def print_report(report, baseline=None):
+    print(f"{'='*60}")
+    print("Benchmark")
+    print(f"{'='*60}")
+    print(f"  {report['samples']} samples in {report['seconds']:.2f}s ({report['samples_per_second']:.2f} samples/s)")
+    for stage in STAGES + ('total',):
+        stats = report['stages'].get(stage)
+        if stats is None:
+            continue
+        line = f"  {stage}: p50 {stats['p50'] * 1000:.1f}ms, p95 {stats['p95'] * 1000:.1f}ms over {stats['samples']} samples"
+        previous = baseline['stages'].get(stage) if baseline else None
+        if previous:
+            line += f" (baseline p50 {previous['p50'] * 1000:.1f}ms, p95 {previous['p95'] * 1000:.1f}ms)"
+        print(line)
+    print(f"{'='*60}\n")
+
+def load_corpus(path):
+    with open(path, 'rb') as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+def write_corpus(path, items):
+    with open(path, 'wb') as f:
+        for item in items:
+            f.write(orjson.dumps(item) + b"\n")
+
+def main(args):
+    if args.corpus and os.path.exists(args.corpus):
+        items = load_corpus(args.corpus)
+    else:
+        items = playground_pairs() if args.playground else []
+        items += synthetic_pairs(args.samples, args.functions, args.blocks, args.seed)
+        if args.corpus:
+            write_corpus(args.corpus, items)
+
+    compilation_command = args.compilation_command.split() if args.compilation_command else None
+    report = run_benchmark(
+        items,
+        repeat=args.repeat,
+        alive2=args.alive2,
+        alive2_workers=args.alive2_workers,
+        alive2_timeout=args.alive2_timeout,
+        alive2_escalation_timeout=args.alive2_escalation_timeout,
+        compilation_command=compilation_command,
+        output_file=args.output_file,
+        src_directory=args.src_directory,
+        io_timeout=args.io_timeout,
+        ir_engine=args.ir_engine,
+        rules=DEFAULT_RULES if args.short_circuit else frozenset(),
+    )
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'rb') as f:
+            baseline = orjson.loads(f.read())
+
+    print_report(report, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, 'wb') as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if baseline is not None:
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for metric, previous, current in regressions:
+            print(f"  REGRESSION {metric}: {previous:.4f} -> {current:.4f}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and per-stage latency benchmark of the evaluation runner")
+
+    parser.add_argument('--corpus', type=str, default=None,
+                        help='Dataset JSONL to benchmark; generated (and written here) when the file does not exist')
+    parser.add_argument('--samples', type=int, default=30, help='Synthetic pairs in a generated corpus')
+    parser.add_argument('--functions', type=int, default=4, help='Functions per synthetic module')
+    parser.add_argument('--blocks', type=int, default=12, help='Basic blocks per synthetic function')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no_playground', dest='playground', action='store_false',
+                        help='Leave the playground task pairs out of a generated corpus')
+    parser.add_argument('--repeat', type=int, default=1, help='Passes over the corpus')
+    parser.add_argument('--alive2', type=str, default='stub', choices=('stub', 'real'),
+                        help='stub hands the IR over without running alive-tv')
+    parser.add_argument('--alive2_workers', type=int, default=4, help='Concurrent alive-tv processes')
+    parser.add_argument('--alive2_timeout', type=int, default=FIRST_PASS_TIMEOUT, help='First-pass alive-tv timeout per function (seconds)')
+    parser.add_argument('--alive2_escalation_timeout', type=int, default=ESCALATION_TIMEOUT,
+                        help='Timeout for functions undecided in the first pass (seconds)')
+    parser.add_argument('--ir_engine', type=str, default='auto', choices=runner.ENGINES)
+    parser.add_argument('--short_circuit', action='store_true',
+                        help='Apply the runner\'s default short-circuit rules (off by default so every stage is timed)')
+    parser.add_argument('--compilation_command', type=str, default=None, help='Compilation command (space-separated)')
+    parser.add_argument('--output_file', type=str, default=None)
+    parser.add_argument('--src_directory', type=str, default=None)
+    parser.add_argument('--io_timeout', type=int, default=60)
+    parser.add_argument('--baseline', type=str, default=None, help='JSON report to compare against')
+    parser.add_argument('--save_baseline', action='store_true', help='Write this run as the new --baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Relative slowdown against the baseline reported as a regression')
+
+    args = parser.parse_args()
+    if args.save_baseline and not args.baseline:
+        parser.error("--save_baseline needs --baseline")
+
+    sys.exit(main(args))
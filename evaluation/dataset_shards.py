@@ -0,0 +1,126 @@
+import argparse
+import os
+import numpy as np
+import polars as pl
+from result_sink import scan_results, ROW_GROUP_ROWS
+from metrics_summary import (
+    empty_summary,
+    load_summary,
+    merge_summaries,
+    print_summary,
+    summarize_results,
+    summary_path,
+    write_summary,
+)
+
+# A line-offset index is a flat little-endian uint64 array: the dataset's
+# size and mtime (to detect a stale index), then the byte offset at which
+# every line starts.
+HEADER = 2
+CHUNK_BYTES = 64 * 1024 * 1024
+
+def index_path(dataset_path):
+    return dataset_path + ".idx"
+
+def _stamp(dataset_path):
+    stat = os.stat(dataset_path)
+    return stat.st_size, stat.st_mtime_ns
+
+def build_index(dataset_path, path=None):
+    path = path or index_path(dataset_path)
+    size, mtime = _stamp(dataset_path)
+    offsets = [np.array([size, mtime, 0] if size else [size, mtime], dtype='<u8')]
+    with open(dataset_path, 'rb') as f:
+        position = 0
+        while True:
+            chunk = f.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            # Every newline not at the very end of the file starts a line.
+            starts = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10) + position + 1
+            offsets.append(starts[starts < size].astype('<u8'))
+            position += len(chunk)
+    tmp_path = path + f".tmp{os.getpid()}"
+    np.concatenate(offsets).tofile(tmp_path)
+    # Nodes building the same index concurrently all produce the same file.
+    os.replace(tmp_path, path)
+    return path
+
+def load_index(dataset_path, path=None):
+    # Line start offsets, memory-mapped; rebuilt when missing or stale.
+    path = path or index_path(dataset_path)
+    if os.path.exists(path):
+        index = np.memmap(path, dtype='<u8', mode='r')
+        if tuple(int(v) for v in index[:HEADER]) == _stamp(dataset_path):
+            return index[HEADER:]
+    build_index(dataset_path, path)
+    return np.memmap(path, dtype='<u8', mode='r')[HEADER:]
+
+def shard_bounds(offsets, dataset_size, shard_index, num_shards):
+    # (first line, line count, byte offset) of a shard. Shards split the file
+    # into near-equal byte ranges at line starts, so large IR pairs spread
+    # evenly, and every line belongs to exactly one shard.
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} out of range for {num_shards} shards")
+    lines = len(offsets)
+    first = int(np.searchsorted(offsets, dataset_size * shard_index // num_shards)) if shard_index else 0
+    end = int(np.searchsorted(offsets, dataset_size * (shard_index + 1) // num_shards)) \
+        if shard_index + 1 < num_shards else lines
+    start_offset = int(offsets[first]) if first < lines else dataset_size
+    return first, end - first, start_offset
+
+def dataset_shard(dataset_path, shard_index, num_shards, path=None):
+    offsets = load_index(dataset_path, path)
+    return shard_bounds(offsets, os.path.getsize(dataset_path), shard_index, num_shards)
+
+def _sorted_by_key(frame):
+    # Numeric keys (line indices) in numeric order, then dataset ids.
+    number = pl.col('key').cast(pl.Int64, strict=False)
+    return (frame.with_columns(number.alias('_key_number'))
+            .sort(['_key_number', 'key'], nulls_last=True, maintain_order=True)
+            .unique(subset='key', keep='first', maintain_order=True)
+            .drop('_key_number'))
+
+def merge_results(inputs, output):
+    # Shard results in key order, whatever the shard or completion order,
+    # so the same shards always merge into the same file.
+    merged = _sorted_by_key(pl.concat([scan_results(path) for path in inputs], how='vertical_relaxed'))
+    if output.endswith('.jsonl'):
+        merged.sink_ndjson(output)
+    else:
+        os.makedirs(output, exist_ok=True)
+        merged.sink_parquet(os.path.join(output, "part-00000.parquet"), compression="zstd",
+                            row_group_size=ROW_GROUP_ROWS)
+
+def merge_shard_summaries(inputs, output):
+    summary = empty_summary()
+    for path in inputs:
+        shard_summary = summary_path(path)
+        merge_summaries(summary, load_summary(shard_summary) if os.path.exists(shard_summary)
+                        else summarize_results(path))
+    write_summary(summary_path(output), summary)
+    return summary
+
+def main(args):
+    if args.command == 'index':
+        print(f"Indexed {len(load_index(args.dataset, args.index))} lines of {args.dataset}")
+    else:
+        merge_results(args.inputs, args.output)
+        print_summary(merge_shard_summaries(args.inputs, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Line-offset index for sharded runs and merging of shard results")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index = commands.add_parser('index', help='Build (or refresh) the line-offset index of a dataset')
+    index.add_argument('dataset', type=str)
+    index.add_argument('--index', type=str, default=None, help='Index file (default: <dataset>.idx)')
+
+    merge = commands.add_parser('merge', help='Combine shard result sinks and their summaries')
+    merge.add_argument('inputs', nargs='+', help='Shard result sinks (.jsonl files or Parquet directories)')
+    merge.add_argument('--output', type=str, required=True, help='Merged .jsonl file or Parquet directory')
+
+    args = parser.parse_args()
+
+    main(args)
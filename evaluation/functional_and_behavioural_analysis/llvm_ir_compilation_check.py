@@ -1,28 +1,50 @@
 import tempfile
-import subprocess
 import os
+from contextlib import contextmanager
+from llvm_tools import ir_inputs, run_tool, scratch_root
 
-def compilation_check(ir, compilation_command, output_file, src_directory):
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as temp_ir:
-        temp_ir.write(ir)
-        temp_ir.flush()
+@contextmanager
+def build_directory(prefix="build_"):
+    # A private directory per sample, so concurrent samples never share an
+    # output path. Removed with everything in it on exit.
+    with tempfile.TemporaryDirectory(prefix=prefix, dir=scratch_root()) as path:
+        yield path
 
-    compilation_command = compilation_command.copy()
-    compilation_command[-1] = temp_ir.name
+def with_output(compilation_command, output_path):
+    # Points the command's -o at output_path, adding one before the input
+    # (the last argument) when the command has none.
+    command = compilation_command.copy()
+    for i, arg in enumerate(command[:-1]):
+        if arg == '-o' and i + 1 < len(command) - 1:
+            command[i + 1] = output_path
+            return command
+        if arg.startswith('-o') and len(arg) > 2:
+            command[i] = '-o' + output_path
+            return command
+    return command[:-1] + ['-o', output_path, command[-1]]
 
-    result = subprocess.run(
-        compilation_command,
-        cwd=src_directory,
-        check=False
-    )
+def compilation_check(ir, compilation_command, output_file, src_directory, build_dir=None):
+    # With build_dir, the output goes there and output_file is only a name;
+    # the command still runs in src_directory to find its sources. The
+    # driver picks the language from the extension, so the IR is a named
+    # scratch file.
+    if build_dir is not None:
+        output_path = os.path.join(build_dir, output_file)
+    else:
+        output_path = os.path.join(src_directory, output_file) if src_directory else output_file
 
-    os.unlink(temp_ir.name)
+    with ir_inputs(ir, named=True) as (paths, _):
+        compilation_command = compilation_command.copy()
+        compilation_command[-1] = paths[0]
+        if build_dir is not None:
+            compilation_command = with_output(compilation_command, output_path)
+
+        result = run_tool(compilation_command, cwd=src_directory, stage='compile')
 
     compilation_successful = (result.returncode == 0)
-    output_path = os.path.join(src_directory, output_file) if src_directory else output_file
     output_exists = os.path.exists(output_path)
 
     return compilation_successful and output_exists
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import tempfile
+import llvmlite.binding as llvm
+from llvm_tools import run_tool
+from functional_and_behavioural_analysis.llvm_ir_compilation_check import with_output
+
+LINK_MODES = ('full', 'incremental')
+
+OPT_COMMAND = ['opt', '-S']
+LLC_COMMAND = ['llc', '-filetype=obj']
+
+# Driver flags that do not change how the IR argument is code-generated.
+LINK_ONLY_PREFIXES = ('-o', '-l', '-L', '-W', '-I', '-D', '-U', '-std=', '-g', '-pthread', '-fuse-ld=', '-static',
+                      '-pie', '-no-pie', '-rdynamic', '-v', '-fdiagnostics', '-fcolor-diagnostics',
+                      '-fno-color-diagnostics')
+OPT_LEVELS = {'-O0': '-O0', '-O': '-O1', '-O1': '-O1', '-O2': '-O2', '-O3': '-O3', '-Os': '-Os', '-Oz': '-Oz'}
+# llc has no size levels.
+LLC_LEVELS = {'-Os': '-O2', '-Oz': '-O2'}
+RELOCATION_MODELS = {'-fPIC': 'pic', '-fpic': 'pic', '-fPIE': 'pic', '-fpie': 'pic',
+                     '-fno-pic': 'static', '-fno-PIC': 'static', '-fno-pie': 'static', '-fno-PIE': 'static'}
+
+def codegen_commands(compilation_command):
+    # The (opt, llc) commands that compile IR the way compilation_command
+    # does (its last argument being the IR), or None when the command has a
+    # flag they cannot be given, and the pair needs a full compile. Above -O0
+    # clang runs the optimizer before codegen, which llc alone does not, so
+    # opt runs first at the same level; at -O0 opt is None. Like clang, the
+    # default is -O0 and position-independent code.
+    opt_level = '-O0'
+    cpu = None
+    relocation_model = 'pic'
+    args = compilation_command[1:-1]
+    for i, arg in enumerate(args):
+        if not arg.startswith('-') or (i > 0 and args[i - 1] == '-o'):
+            continue
+        if arg in OPT_LEVELS:
+            opt_level = OPT_LEVELS[arg]
+        elif arg.startswith(('-march=', '-mcpu=')):
+            # clang's -march names the target CPU, which is llc's -mcpu.
+            cpu = arg.split('=', 1)[1]
+        elif arg in RELOCATION_MODELS:
+            relocation_model = RELOCATION_MODELS[arg]
+        elif not arg.startswith(LINK_ONLY_PREFIXES):
+            return None
+    # The optimizer tunes its cost models to the CPU as well.
+    cpu_flags = [] if cpu is None else [f'-mcpu={cpu}']
+    opt = None if opt_level == '-O0' else OPT_COMMAND + [opt_level] + cpu_flags
+    llc = LLC_COMMAND + [LLC_LEVELS.get(opt_level, opt_level), f'-relocation-model={relocation_model}'] + cpu_flags
+    return opt, llc
+
+def defined_functions(llvm_ir):
+    module = llvm.parse_assembly(llvm_ir)
+    return {fn.name: str(fn) for fn in module.functions if not fn.is_declaration}
+
+def changed_functions(ref_ir, tgt_ir):
+    # Functions whose definitions differ between the halves, or that only one
+    # half defines. None when either half does not parse.
+    try:
+        ref = defined_functions(ref_ir)
+        tgt = defined_functions(tgt_ir)
+    except RuntimeError:
+        return None
+    return sorted(name for name in set(ref) | set(tgt) if ref.get(name) != tgt.get(name))
+
+def extract(llvm_ir, functions, delete=False):
+    # llvm-extract promotes private and internal symbols to hidden ones, so
+    # the two parts of a module still link against each other.
+    command = ['llvm-extract', '-S'] + [f'--func={f}' for f in functions] + ['-', '-o', '-']
+    if delete:
+        command.insert(2, '--delete')
+    result = run_tool(command, input=llvm_ir, stage='compile')
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+def compile_object(llvm_ir, output_path, codegen=(None, LLC_COMMAND)):
+    opt, llc = codegen
+    if opt is not None:
+        result = run_tool(opt + ['-', '-o', '-'], input=llvm_ir, stage='compile')
+        if result.returncode != 0:
+            return False
+        llvm_ir = result.stdout
+    result = run_tool(llc + ['-', '-o', output_path], input=llvm_ir, stage='compile')
+    return result.returncode == 0 and os.path.exists(output_path)
+
+def shared_object(rest_ir, object_dir, codegen=(None, LLC_COMMAND)):
+    # The part of the program outside the changed functions is compiled once
+    # and reused by every sample with the same rest, across workers.
+    opt, llc = codegen
+    digest = hashlib.sha256("\0".join((opt or []) + llc + [rest_ir]).encode()).hexdigest()
+    path = os.path.join(object_dir, digest + '.o')
+    if os.path.exists(path):
+        return path
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.o', dir=object_dir)
+    os.close(fd)
+    try:
+        if not compile_object(rest_ir, tmp_path, codegen):
+            return None
+        # Concurrent builders of the same rest write identical objects, so the
+        # last rename wins harmlessly.
+        os.replace(tmp_path, path)
+        return path
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+def split_pair(ref_ir, tgt_ir):
+    # (rest, ref functions, tgt functions), or None when the halves differ
+    # outside their function bodies and share no common part.
+    functions = changed_functions(ref_ir, tgt_ir)
+    if not functions:
+        return None
+
+    rest = extract(ref_ir, functions, delete=True)
+    if rest is None or rest != extract(tgt_ir, functions, delete=True):
+        return None
+
+    ref_functions = extract(ref_ir, functions)
+    tgt_functions = extract(tgt_ir, functions)
+    if ref_functions is None or tgt_functions is None:
+        return None
+    return rest, ref_functions, tgt_functions
+
+def link_command(compilation_command, objects, output_path):
+    # The IR argument (last) becomes the objects, and -o the private output.
+    command = with_output(compilation_command, output_path)
+    return command[:-1] + objects
+
+def link(compilation_command, objects, output_path, src_directory):
+    result = run_tool(link_command(compilation_command, objects, output_path), cwd=src_directory, stage='compile')
+    return result.returncode == 0 and os.path.exists(output_path)
+
+def incremental_compilation_check(ref_ir, tgt_ir, compilation_command, ref_output, tgt_output, src_directory,
+                                  build_dir, object_dir):
+    # Compiles only the changed functions of each half and links them with
+    # the shared object of the rest. Returns (True, True), or None when the
+    # pair needs a full compile. If either half fails here both are left to
+    # the full compile, which rules out a failure caused by the split itself
+    # and builds the halves the same way.
+    codegen = codegen_commands(compilation_command)
+    if codegen is None:
+        return None
+    split = split_pair(ref_ir, tgt_ir)
+    if split is None:
+        return None
+    rest, ref_functions, tgt_functions = split
+
+    rest_object = shared_object(rest, object_dir, codegen)
+    if rest_object is None:
+        return None
+
+    for name, functions_ir, output in (('ref', ref_functions, ref_output), ('tgt', tgt_functions, tgt_output)):
+        function_object = os.path.join(build_dir, name + '_functions.o')
+        linked = (compile_object(functions_ir, function_object, codegen)
+                  and link(compilation_command, [rest_object, function_object], os.path.join(build_dir, output),
+                           src_directory))
+        if os.path.exists(function_object):
+            os.unlink(function_object)
+        if not linked:
+            return None
+    return True, True
@@ -1,45 +1,254 @@
+import math
+import os
+import resource
+import shutil
+import signal
 import subprocess
+import threading
+import time
 
-def run_executable(executable_path, timeout=60):
-    try:
-        result = subprocess.run(
-            [executable_path],
-            capture_output=True,
-            text=True,
-            timeout=timeout
+# The target may take SLOWDOWN times the reference's runtime, but never less
+# than SLOWDOWN_FLOOR seconds, so start-up noise on short runs is not
+# mistaken for a slow target.
+SLOWDOWN = 10
+SLOWDOWN_FLOOR = 1.0
+
+DEFAULT_LIMITS = {
+    'memory_bytes': 2 * 1024 * 1024 * 1024,
+    'output_bytes': 16 * 1024 * 1024,
+    'slowdown': SLOWDOWN,
+}
+
+OK = 'ok'
+TIMEOUT = 'timeout'
+SLOW = 'slow'
+OUTPUT_LIMIT = 'output_limit'
+ERROR = 'error'
+
+POLL_INTERVAL = 0.01
+
+def _rlimits(cpu_seconds, memory_bytes, output_bytes):
+    limits = {resource.RLIMIT_CPU: (cpu_seconds, cpu_seconds + 1), resource.RLIMIT_CORE: (0, 0)}
+    if memory_bytes:
+        limits[resource.RLIMIT_AS] = (memory_bytes, memory_bytes)
+    if output_bytes:
+        # Caps files the program writes; pipe output is capped by the reader.
+        limits[resource.RLIMIT_FSIZE] = (output_bytes, output_bytes)
+    return limits
+
+PRLIMIT_OPTIONS = {
+    resource.RLIMIT_CPU: '--cpu',
+    resource.RLIMIT_CORE: '--core',
+    resource.RLIMIT_AS: '--as',
+    resource.RLIMIT_FSIZE: '--fsize',
+}
+
+def _limited_command(command, limits):
+    # The runner has threads alive whenever a program starts, and a
+    # preexec_fn can deadlock the forked child on a lock one of them held.
+    # prlimit(1) sets the limits and execs the program in the same process.
+    # Without it, the limits are applied right after the spawn instead.
+    prlimit = shutil.which('prlimit')
+    if prlimit is None:
+        return command, limits
+    options = [f"{PRLIMIT_OPTIONS[limit]}={soft}:{hard}" for limit, (soft, hard) in limits.items()]
+    return [prlimit] + options + ['--'] + command, None
+
+class SandboxedProcess:
+    # One executable run on one test vector: stdin is fed and both output
+    # streams are drained by threads, each stream capped at output_bytes.
+
+    def __init__(self, executable_path, vector, timeout, limits):
+        self.output_bytes = limits.get('output_bytes')
+        self.chunks = {'stdout': [], 'stderr': []}
+        self.sizes = {'stdout': 0, 'stderr': 0}
+        self.over_limit = False
+        self.status = None
+        self.error = None
+        self.threads = []
+
+        self.start = time.monotonic()
+        command, pending_limits = _limited_command(
+            [executable_path] + [str(a) for a in vector.get('argv', ())],
+            _rlimits(math.ceil(timeout) + 1, limits.get('memory_bytes'), self.output_bytes)
         )
-        return True, result.stdout, result.stderr, result.returncode
-    except subprocess.TimeoutExpired:
-        return False, None, "Execution timed out", None
-    except Exception as e:
-        return False, None, str(e), None
+        try:
+            # prlimit would start and report a missing program as an exit
+            # status of its own.
+            if not os.access(executable_path, os.X_OK):
+                raise FileNotFoundError(f"No executable at {executable_path}")
+            self.proc = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True
+            )
+        except Exception as e:
+            self.proc = None
+            self.status = ERROR
+            self.error = str(e)
+            self.elapsed = 0.0
+            return
+
+        for limit, values in (pending_limits or {}).items():
+            try:
+                resource.prlimit(self.proc.pid, limit, values)
+            except ProcessLookupError:
+                break
+
+        stdin = vector.get('stdin') or ""
+        self._spawn(self._feed, stdin.encode() if isinstance(stdin, str) else stdin)
+        self._spawn(self._drain, 'stdout', self.proc.stdout)
+        self._spawn(self._drain, 'stderr', self.proc.stderr)
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _feed(self, data):
+        try:
+            if data:
+                self.proc.stdin.write(data)
+            self.proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def _drain(self, name, stream):
+        for chunk in iter(lambda: stream.read1(65536), b""):
+            if self.over_limit:
+                continue
+            self.sizes[name] += len(chunk)
+            if self.output_bytes and self.sizes[name] > self.output_bytes:
+                self.over_limit = True
+                self.kill()
+                continue
+            self.chunks[name].append(chunk)
+
+    def running(self):
+        return self.status is None and self.proc.poll() is None
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def stop(self, status):
+        if self.status is None:
+            self.status = status
+            self.kill()
+
+    def finish(self):
+        if self.proc is None:
+            return
+        self.proc.wait()
+        for thread in self.threads:
+            thread.join()
+        self.elapsed = time.monotonic() - self.start
+        if self.over_limit:
+            self.status = OUTPUT_LIMIT
+        elif self.status is None:
+            self.status = OK
+
+    def result(self):
+        success = self.status == OK
+        return {
+            'success': success,
+            'status': self.status,
+            'stdout': b"".join(self.chunks['stdout']).decode(errors='replace') if success else None,
+            'stderr': b"".join(self.chunks['stderr']).decode(errors='replace') if success else self._failure_message(),
+            'returncode': self.proc.returncode if success else None,
+            'elapsed': self.elapsed,
+        }
+
+    def _failure_message(self):
+        if self.status == TIMEOUT:
+            return "Execution timed out"
+        if self.status == SLOW:
+            return "Execution killed: exceeded the reference runtime budget"
+        if self.status == OUTPUT_LIMIT:
+            return "Execution killed: output limit exceeded"
+        return self.error
+
+def run_vector(ref_ir_exec, tgt_ir_exec, vector, timeout, limits=None):
+    # Runs both executables at once. The target is killed as soon as the
+    # reference has exited and the target has run `slowdown` times longer.
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    ref = SandboxedProcess(ref_ir_exec, vector, timeout, limits)
+    tgt = SandboxedProcess(tgt_ir_exec, vector, timeout, limits)
+    deadline = time.monotonic() + timeout
+    tgt_deadline = None
+
+    while True:
+        ref_running = ref.proc is not None and ref.running()
+        tgt_running = tgt.proc is not None and tgt.running()
+        if not (ref_running or tgt_running):
+            break
+
+        now = time.monotonic()
+        if not ref_running and tgt_deadline is None and ref.status is None:
+            budget = max(limits['slowdown'] * (now - ref.start), SLOWDOWN_FLOOR)
+            tgt_deadline = tgt.start + budget
+        if now >= deadline:
+            ref.stop(TIMEOUT)
+            tgt.stop(TIMEOUT)
+        elif tgt_running and tgt_deadline is not None and now >= tgt_deadline:
+            tgt.stop(SLOW)
+        time.sleep(POLL_INTERVAL)
+
+    ref.finish()
+    tgt.finish()
+    return ref.result(), tgt.result()
+
+def run_executable(executable_path, timeout=60, vector=None, limits=None):
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    process = SandboxedProcess(executable_path, vector or {}, timeout, limits)
+    if process.proc is not None:
+        try:
+            process.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.stop(TIMEOUT)
+        process.finish()
+    result = process.result()
+    return result['success'], result['stdout'], result['stderr'], result['returncode']
+
+def compare_outputs(ref, tgt):
+    both = ref['success'] and tgt['success']
+    return {
+        'both_executed': both,
+        'stdout_match': ref['stdout'] == tgt['stdout'] if both else False,
+        'stderr_match': ref['stderr'] == tgt['stderr'] if both else False,
+        'returncode_match': ref['returncode'] == tgt['returncode'] if both else False,
+    }
 
-def io_test(ref_ir_exec, tgt_ir_exec, timeout):
-    ref_success, ref_stdout, ref_stderr, ref_returncode = run_executable(ref_ir_exec, timeout)
-    tgt_success, tgt_stdout, tgt_stderr, tgt_returncode = run_executable(tgt_ir_exec, timeout)
+def io_test(ref_ir_exec, tgt_ir_exec, timeout, vectors=None, limits=None):
+    # Each vector is a dict with optional 'stdin' (str or bytes) and 'argv'
+    # (list). Without vectors the programs run once with empty stdin and no
+    # arguments. Every vector must match for the pair to match.
+    vectors = vectors or [{}]
+    runs = []
+    for vector in vectors:
+        ref, tgt = run_vector(ref_ir_exec, tgt_ir_exec, vector, timeout, limits)
+        comparison = compare_outputs(ref, tgt)
+        comparison['match'] = all(comparison.values())
+        runs.append({**comparison, 'reference_output': ref, 'target_output': tgt})
 
+    first = runs[0]
     return {
-        'both_executed': ref_success and tgt_success,
-        'stdout_match': ref_stdout == tgt_stdout if (ref_success and tgt_success) else False,
-        'stderr_match': ref_stderr == tgt_stderr if (ref_success and tgt_success) else False,
-        'returncode_match': ref_returncode == tgt_returncode if (ref_success and tgt_success) else False,
-        'reference_output': {
-            'success': ref_success,
-            'stdout': ref_stdout,
-            'stderr': ref_stderr,
-            'returncode': ref_returncode
-        },
-        'target_output': {
-            'success': tgt_success,
-            'stdout': tgt_stdout,
-            'stderr': tgt_stderr,
-            'returncode': tgt_returncode
-        },
-        'match': (ref_success and tgt_success and 
-                ref_stdout == tgt_stdout and
-                ref_stderr == tgt_stderr and
-                ref_returncode == tgt_returncode)
+        'both_executed': all(r['both_executed'] for r in runs),
+        'stdout_match': all(r['stdout_match'] for r in runs),
+        'stderr_match': all(r['stderr_match'] for r in runs),
+        'returncode_match': all(r['returncode_match'] for r in runs),
+        'reference_output': first['reference_output'],
+        'target_output': first['target_output'],
+        'vectors': runs,
+        # Slowest successful reference run, the basis of calibrated timeouts
+        'reference_seconds': max((r['reference_output']['elapsed'] for r in runs
+                                  if r['reference_output']['success']), default=None),
+        'match': all(r['match'] for r in runs)
     }
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,312 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, ExitStack
+from multiprocessing.util import Finalize
+
+# One place for every LLVM tool invocation. IR reaches a tool over stdin
+# where the tool reads "-", as an anonymous memfd passed by /proc/self/fd
+# path where it needs several inputs, and as a file in a reused tmpfs
+# scratch pool only where the tool insists on a real file name (compiler
+# drivers pick the input language from the extension).
+
+SCRATCH_ROOT = '/dev/shm'
+
+MEMFD_SUPPORTED = hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd')
+
+# Histogram bucket bounds; a final +Inf bucket is implicit.
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RSS_BUCKETS = tuple(mb * 1024 * 1024 for mb in (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+HISTOGRAMS = {
+    'wall_seconds': SECONDS_BUCKETS,
+    'cpu_seconds': SECONDS_BUCKETS,
+    'max_rss_bytes': RSS_BUCKETS,
+}
+
+def histogram(bounds):
+    return {'bounds': list(bounds), 'counts': [0] * (len(bounds) + 1), 'sum': 0.0, 'count': 0}
+
+def observe(hist, value):
+    index = len(hist['bounds'])
+    for i, bound in enumerate(hist['bounds']):
+        if value <= bound:
+            index = i
+            break
+    hist['counts'][index] += 1
+    hist['sum'] += value
+    hist['count'] += 1
+
+def merge_histogram(hist, other):
+    if hist['bounds'] != other['bounds']:
+        raise ValueError("Cannot merge histograms with different buckets")
+    hist['counts'] = [a + b for a, b in zip(hist['counts'], other['counts'])]
+    hist['sum'] += other['sum']
+    hist['count'] += other['count']
+
+class ToolMetrics:
+    # Per (tool, stage) invocation counts by status and histograms of wall
+    # time, CPU time and peak RSS. Snapshots are plain dicts and merge by
+    # addition, so worker processes can hand theirs to the parent.
+
+    def __init__(self):
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def _series(self, tool, stage):
+        key = (tool, stage)
+        if key not in self.series:
+            self.series[key] = {
+                'tool': tool,
+                'stage': stage,
+                'status': {},
+                **{name: histogram(bounds) for name, bounds in HISTOGRAMS.items()},
+            }
+        return self.series[key]
+
+    def record(self, tool, stage, status, wall_seconds, cpu_seconds, max_rss_bytes):
+        with self._lock:
+            series = self._series(tool, stage)
+            series['status'][status] = series['status'].get(status, 0) + 1
+            observe(series['wall_seconds'], wall_seconds)
+            observe(series['cpu_seconds'], cpu_seconds)
+            observe(series['max_rss_bytes'], max_rss_bytes)
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(list(self.series.values())))
+
+    def drain(self):
+        with self._lock:
+            series, self.series = list(self.series.values()), {}
+        return series
+
+    def merge(self, snapshot):
+        with self._lock:
+            for other in snapshot:
+                series = self._series(other['tool'], other['stage'])
+                for status, count in other['status'].items():
+                    series['status'][status] = series['status'].get(status, 0) + count
+                for name in HISTOGRAMS:
+                    merge_histogram(series[name], other[name])
+
+    def to_prometheus(self):
+        # Samples of each metric family are grouped under its TYPE line.
+        series = sorted(self.snapshot(), key=lambda s: (s['tool'], s['stage']))
+        labels = [f'tool="{s["tool"]}",stage="{s["stage"]}"' for s in series]
+        lines = ['# TYPE llvm_tool_invocations_total counter']
+        for entry, label in zip(series, labels):
+            for status, count in sorted(entry['status'].items()):
+                lines.append(f'llvm_tool_invocations_total{{{label},status="{status}"}} {count}')
+        for name in HISTOGRAMS:
+            lines.append(f'# TYPE llvm_tool_{name} histogram')
+            for entry, label in zip(series, labels):
+                hist = entry[name]
+                cumulative = 0
+                for bound, count in zip(hist['bounds'] + ['+Inf'], hist['counts']):
+                    cumulative += count
+                    lines.append(f'llvm_tool_{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'llvm_tool_{name}_sum{{{label}}} {hist["sum"]}')
+                lines.append(f'llvm_tool_{name}_count{{{label}}} {hist["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Prometheus text format for a .prom path, JSON otherwise.
+        with open(path, 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+
+tool_metrics = ToolMetrics()
+
+def _wait4(pid, timeout=None):
+    # (exit status, rusage) of the child, or None when it is still running
+    # at the timeout.
+    if timeout is None:
+        _, status, usage = os.wait4(pid, 0)
+        return status, usage
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        reaped, status, usage = os.wait4(pid, os.WNOHANG)
+        if reaped:
+            return status, usage
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.05)
+
+def _pipe_threads(proc, input, output):
+    # Feeds stdin and drains both pipes, so this thread is free to reap the
+    # child itself.
+    def feed():
+        try:
+            proc.stdin.write(input)
+            proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def drain(name, stream):
+        output[name] = stream.read()
+        stream.close()
+
+    threads = [threading.Thread(target=drain, args=('stdout', proc.stdout), daemon=True),
+               threading.Thread(target=drain, args=('stderr', proc.stderr), daemon=True)]
+    if input is not None:
+        threads.append(threading.Thread(target=feed, daemon=True))
+    for thread in threads:
+        thread.start()
+    return threads
+
+def run_tool(command, input=None, timeout=None, cwd=None, text=True, pass_fds=(), stage=None, check=False):
+    # CPU time and peak RSS are the tool's own, from wait4 on its pid. They
+    # include the processes the tool waited for itself, like a driver's cc1,
+    # and no other thread's tools.
+    start = time.perf_counter()
+    status = 'error'
+    usage = None
+    try:
+        proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if input is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=text,
+            cwd=cwd,
+            pass_fds=pass_fds
+        )
+        output = {}
+        threads = _pipe_threads(proc, input, output)
+        try:
+            waited = _wait4(proc.pid, timeout)
+            timed_out = waited is None
+            if timed_out:
+                proc.kill()
+                waited = _wait4(proc.pid)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        exit_status, usage = waited
+        # Reaped here, so Popen must not wait for the pid again.
+        proc.returncode = os.waitstatus_to_exitcode(exit_status)
+        for thread in threads:
+            thread.join()
+
+        if timed_out:
+            status = 'timeout'
+            raise subprocess.TimeoutExpired(command, timeout, output['stdout'], output['stderr'])
+        status = 'ok' if proc.returncode == 0 else 'failed'
+        if check and proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, command, output['stdout'], output['stderr'])
+        return subprocess.CompletedProcess(command, proc.returncode, output['stdout'], output['stderr'])
+    finally:
+        wall = time.perf_counter() - start
+        cpu = usage.ru_utime + usage.ru_stime if usage is not None else 0.0
+        max_rss = usage.ru_maxrss * 1024 if usage is not None else 0
+        tool_metrics.record(os.path.basename(command[0]), stage or 'other', status, wall, cpu, max_rss)
+
+def spool_metrics(directory):
+    # Pool initializer: the worker writes its metrics to directory when it
+    # exits, for collect_metrics in the parent.
+    path = os.path.join(directory, f"tool_metrics_{os.getpid()}.json")
+    Finalize(None, _write_snapshot, args=(path,), exitpriority=10)
+
+def _write_snapshot(path):
+    with open(path, 'w') as f:
+        json.dump(tool_metrics.drain(), f)
+
+def collect_metrics(directory):
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("tool_metrics_") and name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                tool_metrics.merge(json.load(f))
+
+class ScratchPool:
+    # Scratch files in a private tmpfs directory. A released file is kept and
+    # overwritten by the next caller, so steady-state use creates no inodes.
+
+    def __init__(self, root=None):
+        self.root = root
+        self.directory = None
+        self.free = {}
+        self.created = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_directory(self):
+        # Forked workers must not share the parent's slots.
+        if self.directory is None or self._pid != os.getpid():
+            root = self.root or scratch_root()
+            self.directory = tempfile.mkdtemp(prefix="llvm_tools_", dir=root)
+            self.free = {}
+            self.created = 0
+            self._pid = os.getpid()
+            # Unlike atexit handlers, finalizers also run when a pool worker
+            # process exits.
+            Finalize(None, shutil.rmtree, args=(self.directory, True), exitpriority=0)
+
+    def acquire(self, suffix):
+        with self._lock:
+            self._ensure_directory()
+            slots = self.free.setdefault(suffix, [])
+            if slots:
+                return slots.pop()
+            self.created += 1
+            return os.path.join(self.directory, f"slot{self.created}{suffix}")
+
+    def release(self, path, suffix):
+        with self._lock:
+            if os.path.dirname(path) == self.directory:
+                self.free.setdefault(suffix, []).append(path)
+
+    @contextmanager
+    def file(self, content, suffix='.ll'):
+        path = self.acquire(suffix)
+        try:
+            with open(path, 'w') as f:
+                f.write(content)
+            yield path
+        finally:
+            self.release(path, suffix)
+
+def scratch_root(preferred=SCRATCH_ROOT):
+    try:
+        stats = os.statvfs(preferred)
+    except OSError:
+        return tempfile.gettempdir()
+    if stats.f_flag & (os.ST_NOEXEC | os.ST_RDONLY) or not os.access(preferred, os.W_OK | os.X_OK):
+        return tempfile.gettempdir()
+    return preferred
+
+scratch_pool = ScratchPool()
+
+@contextmanager
+def memfd(content, name="ir"):
+    # Close-on-exec, so only the child given the fd in pass_fds sees it.
+    fd = os.memfd_create(name, os.MFD_CLOEXEC)
+    try:
+        data = memoryview(content.encode())
+        while data:
+            data = data[os.write(fd, data):]
+        os.lseek(fd, 0, os.SEEK_SET)
+        yield fd
+    finally:
+        os.close(fd)
+
+@contextmanager
+def ir_inputs(*contents, suffix='.ll', named=False):
+    # Yields (paths, pass_fds) for tools taking IR by path. named=True forces
+    # real files with the given suffix.
+    with ExitStack() as stack:
+        if MEMFD_SUPPORTED and not named:
+            fds = [stack.enter_context(memfd(content)) for content in contents]
+            yield [f"/proc/self/fd/{fd}" for fd in fds], tuple(fds)
+        else:
+            yield [stack.enter_context(scratch_pool.file(content, suffix)) for content in contents], ()
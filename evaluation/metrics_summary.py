@@ -0,0 +1,176 @@
+import argparse
+import orjson
+import os
+import time
+from llvm_tools import SECONDS_BUCKETS, histogram, observe, merge_histogram
+from result_sink import scan_results
+from stages import STAGES
+
+# Pass rates: the rows a sample passes on and the stage whose skip reasons
+# are reported next to the rate.
+RATES = {
+    'verification': (('ref_ir_verification', 'tgt_ir_verification'), None),
+    'canonicalization': (('ref_canonicalization', 'tgt_canonicalization'), None),
+    'identical': (('identical',), 'diff'),
+    'function_signature_match': (('function_signature_match',), 'functions'),
+    'cfg_definitive_match': (('cfg_definitive_match',), 'cfg'),
+    'alive2_verified': (('alive2_verified',), 'alive2'),
+    'compilation': (('ref_compilation_success', 'tgt_compilation_success'), 'compile'),
+    'io_match': (('io_match',), 'io'),
+}
+
+SCORE_HISTOGRAMS = {
+    'cfg_similarity_score': (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.99),
+    'io_reference_seconds': SECONDS_BUCKETS,
+}
+
+FLUSH_SAMPLES = 1000
+FLUSH_SECONDS = 60
+
+def empty_summary():
+    return {
+        'samples': 0,
+        'rates': {name: {'passed': 0, 'total': 0} for name in RATES},
+        'skipped_stages': {stage: {} for stage in STAGES},
+        'histograms': {name: histogram(bounds) for name, bounds in SCORE_HISTOGRAMS.items()},
+    }
+
+def add_result(summary, result):
+    summary['samples'] += 1
+    for name, (columns, _) in RATES.items():
+        counts = summary['rates'][name]
+        counts['total'] += 1
+        counts['passed'] += all(result.get(column) for column in columns)
+    for stage, reason in (result.get('skipped_stages') or {}).items():
+        if reason is not None:
+            reasons = summary['skipped_stages'].setdefault(stage, {})
+            reasons[reason] = reasons.get(reason, 0) + 1
+    for name in SCORE_HISTOGRAMS:
+        value = result.get(name)
+        # A skipped stage's score is a placeholder, not a measurement.
+        if value is not None and not skipped(result, name):
+            observe(summary['histograms'][name], value)
+
+def skipped(result, name):
+    stage = 'cfg' if name == 'cfg_similarity_score' else 'io'
+    return (result.get('skipped_stages') or {}).get(stage) is not None
+
+def merge_summaries(summary, other):
+    # Adds other into summary; counts and histograms are plain sums, so
+    # shards merge in any order.
+    summary['samples'] += other['samples']
+    for name, counts in other['rates'].items():
+        merged = summary['rates'].setdefault(name, {'passed': 0, 'total': 0})
+        merged['passed'] += counts['passed']
+        merged['total'] += counts['total']
+    for stage, reasons in other['skipped_stages'].items():
+        merged = summary['skipped_stages'].setdefault(stage, {})
+        for reason, count in reasons.items():
+            merged[reason] = merged.get(reason, 0) + count
+    for name, hist in other['histograms'].items():
+        merge_histogram(summary['histograms'][name], hist)
+    return summary
+
+def write_summary(path, summary):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    os.replace(tmp_path, path)
+
+def load_summary(path):
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+class MetricsAggregator:
+    # Running summary of a run, written to path every flush_samples results
+    # or flush_seconds, whichever comes first, and on close.
+
+    def __init__(self, path=None, summary=None, flush_samples=FLUSH_SAMPLES, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.flush_samples = flush_samples
+        self.flush_seconds = flush_seconds
+        self.summary = summary if summary is not None else empty_summary()
+        self._pending = 0
+        self._flushed = time.monotonic()
+
+    def add(self, result):
+        add_result(self.summary, result)
+        self._pending += 1
+        if self._pending >= self.flush_samples or time.monotonic() - self._flushed >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.path:
+            write_summary(self.path, self.summary)
+        self._pending = 0
+        self._flushed = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+def summarize_results(path):
+    # Rebuilds a summary from a result sink, for runs made without one.
+    summary = empty_summary()
+    columns = sorted({column for columns, _ in RATES.values() for column in columns} | set(SCORE_HISTOGRAMS))
+    for batch in scan_results(path).select(columns + ['skipped_stages']).collect().iter_slices(FLUSH_SAMPLES):
+        for result in batch.iter_rows(named=True):
+            add_result(summary, result)
+    return summary
+
+def summary_path(results_path):
+    # results.jsonl and a results/ Parquet directory both get results.summary.json.
+    return os.path.splitext(results_path.rstrip(os.sep))[0] + ".summary.json"
+
+def resumed_summary(path, results_path, completed):
+    # The summary of the samples already in the sink. A summary flushed
+    # before a crash can lag behind the sink; only then are the results
+    # summarized again.
+    if os.path.exists(path):
+        summary = load_summary(path)
+        if summary['samples'] == completed:
+            return summary
+    if completed == 0:
+        return empty_summary()
+    return summarize_results(results_path)
+
+def print_summary(summary):
+    print(f"{'='*60}")
+    print("Evaluation Summary")
+    print(f"{'='*60}")
+    print(f"  Samples: {summary['samples']}")
+    for name, counts in summary['rates'].items():
+        rate = counts['passed'] / counts['total'] if counts['total'] else 0.0
+        stage = RATES[name][1] if name in RATES else None
+        reasons = summary['skipped_stages'].get(stage, {}) if stage else {}
+        skips = ", ".join(f"{reason}: {count}" for reason, count in sorted(reasons.items()))
+        print(f"  {name}: {counts['passed']}/{counts['total']} ({rate:.1%})" + (f" [skipped: {skips}]" if skips else ""))
+    hist = summary['histograms']['cfg_similarity_score']
+    if hist['count']:
+        print(f"  cfg_similarity_score: mean {hist['sum'] / hist['count']:.3f} over {hist['count']} samples")
+    print(f"{'='*60}\n")
+
+def main(args):
+    if args.command == 'merge':
+        summary = empty_summary()
+        for path in args.inputs:
+            merge_summaries(summary, load_summary(path))
+    else:
+        summary = summarize_results(args.inputs[0])
+    write_summary(args.output, summary)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge evaluation summaries or rebuild one from saved results")
+
+    parser.add_argument('command', choices=('merge', 'rebuild'),
+                        help='merge: add up shard summaries; rebuild: summarize a result sink')
+    parser.add_argument('inputs', nargs='+', help='Summary JSON files to merge, or one result sink to rebuild from')
+    parser.add_argument('--output', type=str, required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'rebuild' and len(args.inputs) != 1:
+        parser.error("rebuild takes one result sink")
+
+    main(args)
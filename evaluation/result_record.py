@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field, fields
+from typing import Optional
+import polars as pl
+from stages import STAGES
+
+@dataclass(slots=True)
+class PairResult:
+    # One evaluated pair. Every field has the value of a stage that did not
+    # run, so a failed pair only sets what it knows.
+    id: int
+    ref_ir_verification: bool = False
+    ref_ir_verification_message: str = ""
+    tgt_ir_verification: bool = False
+    tgt_ir_verification_message: str = ""
+    ref_canonicalization: bool = False
+    ref_canonicalization_error: str = ""
+    tgt_canonicalization: bool = False
+    tgt_canonicalization_error: str = ""
+    identical: bool = False
+    diff_stdout: str = ""
+    diff_stderr: str = ""
+    function_count_match: bool = False
+    function_signature_match: bool = False
+    # None when isomorphism was undecided within the VF2 time budget.
+    cfg_isomorphic_match: Optional[bool] = False
+    cfg_loop_count_match: bool = False
+    cfg_complexity_match: bool = False
+    cfg_dominator_match: bool = False
+    cfg_nodes_match: bool = False
+    cfg_edges_match: bool = False
+    cfg_similarity_score: float = 0.0
+    cfg_definitive_match: bool = False
+    alive2_verified: bool = False
+    # correct, incorrect, undecided or error; None when Alive2 did not run.
+    alive2_status: Optional[str] = None
+    alive2_stdout: str = ""
+    alive2_stderr: str = ""
+    ref_compilation_success: bool = False
+    tgt_compilation_success: bool = False
+    io_both_executed: bool = False
+    io_stdout_match: bool = False
+    io_stderr_match: bool = False
+    io_returncode_match: bool = False
+    io_match: bool = False
+    io_reference_seconds: Optional[float] = None
+    skipped_stages: dict = field(default_factory=dict)
+    key: Optional[str] = None
+
+    @classmethod
+    def failed(cls, i, ref, tgt, message, skipped_stages):
+        # A pair that stopped before the comparison stages; message fills the
+        # outputs of the stages that never ran. Without verification there
+        # was no canonicalization either.
+        verified = ref['verification'] and tgt['verification']
+        return cls(
+            id=i,
+            ref_ir_verification=ref['verification'],
+            ref_ir_verification_message=ref['verification_message'],
+            tgt_ir_verification=tgt['verification'],
+            tgt_ir_verification_message=tgt['verification_message'],
+            ref_canonicalization=ref['canonicalization'] if verified else False,
+            ref_canonicalization_error=ref['canonicalization_error'] if verified else message,
+            tgt_canonicalization=tgt['canonicalization'] if verified else False,
+            tgt_canonicalization_error=tgt['canonicalization_error'] if verified else message,
+            diff_stdout=message,
+            diff_stderr=message,
+            alive2_stdout=message,
+            alive2_stderr=message,
+            skipped_stages=skipped_stages,
+        )
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+FIELDS = tuple(f.name for f in fields(PairResult))
+
+# Free-form output, as opposed to the flags and scores metrics scan over.
+TEXT_FIELDS = tuple(f.name for f in fields(PairResult) if f.type is str)
+
+_DTYPES = {bool: pl.Boolean, int: pl.Int64, float: pl.Float64, str: pl.Utf8, Optional[bool]: pl.Boolean,
+           Optional[float]: pl.Float64, Optional[str]: pl.Utf8}
+
+# Parquet schema of a result row. Skipped stages become one nullable string
+# column per stage holding the skip reason.
+RESULT_SCHEMA = {
+    f.name: pl.Struct({stage: pl.Utf8 for stage in STAGES}) if f.name == 'skipped_stages' else _DTYPES[f.type]
+    for f in fields(PairResult)
+}
+
+def to_row(result):
+    # A result dict in RESULT_SCHEMA shape: known columns only, every stage
+    # present in skipped_stages.
+    row = {name: result.get(name) for name in FIELDS}
+    skipped = result.get('skipped_stages') or {}
+    row['skipped_stages'] = {stage: skipped.get(stage) for stage in STAGES}
+    return row
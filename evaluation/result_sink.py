@@ -0,0 +1,127 @@
+import os
+import glob
+import orjson
+import polars as pl
+from result_record import RESULT_SCHEMA, to_row
+
+# Rows per Parquet row group once the parts of a run are compacted.
+ROW_GROUP_ROWS = 10000
+
+def sample_key(item, index):
+    # Datasets may carry their own id; otherwise the line number in the
+    # dataset file identifies the sample across batches and restarts.
+    key = item.get("id")
+    return str(key) if key is not None else str(index)
+
+class JsonlResultSink:
+
+    def __init__(self, path):
+        self.path = path
+        self._repair_tail()
+        self._file = open(path, 'ab')
+
+    def _repair_tail(self):
+        # A crash can leave a partially written last line; drop it so the
+        # next append starts on a fresh line.
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def existing_keys(self):
+        keys = set()
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    keys.add(orjson.loads(line)["key"])
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    continue
+        return keys
+
+    def write(self, result):
+        self._file.write(orjson.dumps(result) + b"\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ParquetResultSink:
+    # Rows are written in RESULT_SCHEMA, so every part has the same typed
+    # columns and a scan over all parts never reads the text columns it does
+    # not select.
+
+    def __init__(self, path, flush_rows=100, row_group_rows=ROW_GROUP_ROWS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.row_group_rows = row_group_rows
+        self._rows = []
+        os.makedirs(path, exist_ok=True)
+        self._part = len(self._parts())
+        self._first_part = self._part
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def _part_path(self, part):
+        return os.path.join(self.path, f"part-{part:05d}.parquet")
+
+    def existing_keys(self):
+        parts = self._parts()
+        if not parts:
+            return set()
+        return set(pl.scan_parquet(parts).select("key").collect()["key"].to_list())
+
+    def write(self, result):
+        self._rows.append(to_row(result))
+        if len(self._rows) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        part_path = self._part_path(self._part)
+        tmp_path = part_path + ".tmp"
+        pl.DataFrame(self._rows, schema=RESULT_SCHEMA).write_parquet(
+            tmp_path, compression="zstd", row_group_size=self.row_group_rows)
+        # Parts only become visible once complete, so a crash loses at most
+        # the rows still buffered in memory.
+        os.replace(tmp_path, part_path)
+        self._part += 1
+        self._rows.clear()
+
+    def compact(self):
+        # Merges the small parts of this run into one part of large row
+        # groups, streaming rather than loading them. A crash between the
+        # replace and the removals leaves duplicate rows, which resume
+        # already treats as done.
+        parts = [self._part_path(part) for part in range(self._first_part, self._part)]
+        if len(parts) < 2:
+            return
+        tmp_path = parts[0] + ".tmp"
+        pl.scan_parquet(parts).sink_parquet(tmp_path, compression="zstd", row_group_size=self.row_group_rows)
+        os.replace(tmp_path, parts[0])
+        for part in reversed(parts[1:]):
+            os.remove(part)
+        self._part = self._first_part + 1
+
+    def close(self):
+        self.flush()
+        self.compact()
+
+def result_sink_exists(path):
+    if path.endswith(".jsonl"):
+        return os.path.exists(path) and os.path.getsize(path) > 0
+    return bool(glob.glob(os.path.join(path, "part-*.parquet")))
+
+def open_result_sink(path, flush_rows=100):
+    if path.endswith(".jsonl"):
+        return JsonlResultSink(path)
+    return ParquetResultSink(path, flush_rows=flush_rows)
+
+def scan_results(path):
+    # Lazy frame over a result sink, for aggregating metrics column-wise.
+    if path.endswith(".jsonl"):
+        return pl.scan_ndjson(path, schema=RESULT_SCHEMA)
+    return pl.scan_parquet(os.path.join(path, "part-*.parquet"))
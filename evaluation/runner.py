@@ -1,20 +1,46 @@
 import argparse
 import orjson
 import os
-from static_analysis.structural_analysis.llvm_ir_verification import verify_ir
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from static_analysis.structural_analysis.llvm_ir_diff import diff_llvm_ir
-from static_analysis.structural_analysis.llvm_ir_canonicalization_and_normalization import canonicalize_and_normalize_ir
-from static_analysis.structural_analysis.llvm_ir_function_analysis import functions_count
-from static_analysis.structural_analysis.llvm_ir_cfg_comparison import compare_llvm_ir_cfgs
+from static_analysis.structural_analysis.llvm_ir_canonicalization_and_normalization import verify_and_canonicalize_ir
+from static_analysis.structural_analysis.llvm_ir_inprocess import ENGINES
+from static_analysis.structural_analysis.llvm_ir_function_analysis import compare_function_info, defined_signatures
+from static_analysis.structural_analysis.llvm_ir_cfg_comparison import compare_function_cfgs
+from static_analysis.structural_analysis.llvm_ir_analysis_context import IRAnalysisContext
 from static_analysis.semantic_analysis.llvm_ir_alive2_test_harness import verify_with_alive2
-from functional_and_behavioural_analysis.llvm_ir_compilation_check import compilation_check
-from functional_and_behavioural_analysis.llvm_ir_io_test import io_test
+from static_analysis.semantic_analysis.llvm_ir_alive2_scheduler import (
+    Alive2Scheduler, FIRST_PASS_TIMEOUT, ESCALATION_TIMEOUT, CORRECT, UNDECIDED, ERROR, classify_alive2_output
+)
+from functional_and_behavioural_analysis.llvm_ir_compilation_check import compilation_check, build_directory
+from functional_and_behavioural_analysis.llvm_ir_incremental_build import incremental_compilation_check, LINK_MODES
+from functional_and_behavioural_analysis.llvm_ir_io_test import io_test, SLOWDOWN, DEFAULT_LIMITS as DEFAULT_IO_LIMITS
+from result_sink import sample_key, open_result_sink, result_sink_exists
+from result_record import PairResult
+from metrics_summary import MetricsAggregator, FLUSH_SAMPLES, print_summary, resumed_summary, summary_path
+from stages import SHORT_CIRCUIT_RULES, DEFAULT_RULES, IDENTICAL_SKIPS, StagePlan, check_rules, skip_all, stage_order, record_stage_counts
+from runtime_db import RuntimeDB, TIMEOUT_FACTOR, runtime_key
+from dataset_shards import dataset_shard
+from llvm_tools import scratch_root, tool_metrics, spool_metrics, collect_metrics
+from analysis_cache import AnalysisCache, merge_cache_counters, transient_failure
 
+# Set per process, so that pool workers each hold their own connection.
+analysis_cache = None
 
-def load_dataset(path, batch_size):
+
+def load_dataset(path, batch_size, start_offset=0, line_count=None):
+    # Reads line_count lines (all when None) from start_offset on, which a
+    # shard takes from the dataset's line-offset index.
     batch = []
     with open(path, "rb") as f:
-        for line in f:
+        f.seek(start_offset)
+        for n, line in enumerate(f):
+            if line_count is not None and n >= line_count:
+                break
             batch.append(orjson.loads(line))
             if len(batch) == batch_size:
                 yield batch
@@ -22,130 +48,148 @@ def load_dataset(path, batch_size):
         if batch:
             yield batch
 
-def process_batch(batch, compilation_command=None, output_file=None, src_directory=None, io_timeout=60):
-    results = []
-    for i, item in enumerate(batch):
-        src = item["src"]
-        ref_ir = item["ref_ir"]
-        tgt_ir = item["tgt_ir"]
-
-        # Verify IR
-        ref_ir_verification, ref_ir_verification_message = verify_ir(ref_ir)
-        tgt_ir_verification, tgt_ir_verification_message = verify_ir(tgt_ir)
-
-        if not ref_ir_verification or not tgt_ir_verification:
-            result = {
-                'id': i,
-                'ref_ir_verification': ref_ir_verification,
-                'ref_ir_verification_message': ref_ir_verification_message,
-                'tgt_ir_verification': tgt_ir_verification,
-                'tgt_ir_verification_message': tgt_ir_verification_message,
-                'ref_canonicalization': False,
-                'ref_canonicalization_error': "VERIFY FAILED",
-                'tgt_canonicalization': False,
-                'tgt_canonicalization_error': "VERIFY FAILED",
-                'identical': False,
-                'diff_stdout': "VERIFY FAILED",
-                'diff_stderr': "VERIFY FAILED",
-                'function_count_match': False,
-                'function_signature_match': False,
-                'cfg_isomorphic_match': False,
-                'cfg_loop_count_match': False,
-                'cfg_complexity_match': False,
-                'cfg_dominator_match': False,
-                'cfg_nodes_match': False,
-                'cfg_edges_match': False,
-                'cfg_similarity_score': 0.0,
-                'cfg_definitive_match': False,
-                'alive2_verified': False,
-                'alive2_stdout': "VERIFY FAILED",
-                'alive2_stderr': "VERIFY FAILED",
-                'ref_compilation_success': False,
-                'tgt_compilation_success': False,
-                'io_both_executed': False,
-                'io_stdout_match': False,
-                'io_stderr_match': False,
-                'io_returncode_match': False,
-                'io_match': False,
-            }
-            results.append(result)
-            continue
-        
-        # Canonicalize and Normalize IR
-        ref_canon_success, ref_canon_ir, ref_canon_error = canonicalize_and_normalize_ir(ref_ir)
-        tgt_canon_success, tgt_canon_ir, tgt_canon_error = canonicalize_and_normalize_ir(tgt_ir)
-
-        if not ref_canon_success or not tgt_canon_success:
-            result = {
-                'id': i,
-                'ref_ir_verification': ref_ir_verification,
-                'ref_ir_verification_message': ref_ir_verification_message,
-                'tgt_ir_verification': tgt_ir_verification,
-                'tgt_ir_verification_message': tgt_ir_verification_message,
-                'ref_canonicalization': ref_canon_success,
-                'ref_canonicalization_error': ref_canon_error,
-                'tgt_canonicalization': tgt_canon_success,
-                'tgt_canonicalization_error': tgt_canon_error,
-                'identical': False,
-                'diff_stdout': "CANONICALIZATION FAILED",
-                'diff_stderr': "CANONICALIZATION FAILED",
-                'function_count_match': False,
-                'function_signature_match': False,
-                'cfg_isomorphic_match': False,
-                'cfg_loop_count_match': False,
-                'cfg_complexity_match': False,
-                'cfg_dominator_match': False,
-                'cfg_nodes_match': False,
-                'cfg_edges_match': False,
-                'cfg_similarity_score': 0.0,
-                'cfg_definitive_match': False,
-                'alive2_verified': False,
-                'alive2_stdout': "CANONICALIZATION FAILED",
-                'alive2_stderr': "CANONICALIZATION FAILED",
-                'ref_compilation_success': False,
-                'tgt_compilation_success': False,
-                'io_both_executed': False,
-                'io_stdout_match': False,
-                'io_stderr_match': False,
-                'io_returncode_match': False,
-                'io_match': False,
-            }
-            results.append(result)
-            continue
+def init_analysis_cache(path, max_bytes):
+    global analysis_cache
+    analysis_cache = AnalysisCache(path, max_bytes=max_bytes)
+
+def init_worker(cache_path, cache_bytes, metrics_dir):
+    if cache_path:
+        init_analysis_cache(cache_path, cache_bytes)
+    if metrics_dir:
+        spool_metrics(metrics_dir)
+
+def prepare_ir(ir, ir_engine='auto'):
+    start = time.perf_counter()
+    cache = analysis_cache
+
+    # Verify, Canonicalize and Normalize IR
+    key = cache.key('canonicalize', ir, ir_engine) if cache else None
+    prepared = cache.get('canonicalize', key) if cache else None
+    if prepared is None:
+        prepared = verify_and_canonicalize_ir(ir, engine=ir_engine)
+        if cache and not transient_failure(prepared[1], prepared[4]):
+            cache.put('canonicalize', key, prepared)
+
+    (verification, verification_message, canon_success, canon_ir,
+     canon_error, engine_used) = prepared
+
+    # Parse the canonical IR and build its CFGs here so both halves of a pair
+    # are analysed in parallel and every pair analysis reuses them.
+    context = IRAnalysisContext(canon_ir, cache=cache).preload() if canon_success else None
+
+    side = {
+        'verification': verification,
+        'verification_message': verification_message,
+        'canonicalization': canon_success,
+        'canonical_ir': canon_ir,
+        'canonicalization_error': canon_error,
+        'engine': engine_used,
+        'context': context,
+        'cache_counters': cache.drain_counters() if cache else None,
+    }
+
+    return side, os.getpid(), time.perf_counter() - start
+
+def inconsistent_half(ref, tgt):
+    # Both sides must come out of the same pass pipeline for the comparison to
+    # be meaningful. If only one side fell back to opt, the in-process side has
+    # to be redone with opt as well.
+    if ref['engine'] == tgt['engine'] or not (ref['canonicalization'] and tgt['canonicalization']):
+        return None
+    return 'ref' if ref['engine'] == 'llvmlite' else 'tgt'
+
+IDENTICAL_CFG_COMPARISON = {
+    'is_isomorphic': True,
+    'loop_count_match': True,
+    'cyclomatic_complexity_match': True,
+    'dominator_tree_match': True,
+    'graph1_nodes': 0,
+    'graph2_nodes': 0,
+    'graph1_edges': 0,
+    'graph2_edges': 0,
+}
+
+def implied_alive2(reason):
+    if reason == 'identical':
+        return True, "SKIPPED: identical canonical IR", "", CORRECT
+    if reason == 'signature_mismatch':
+        return False, "SKIPPED: function signatures differ", "", None
+    return False, "", "", None
+
+def blocking_alive2_status(stdout):
+    # verify_with_alive2 reports a killed alive-tv with this message only.
+    if stdout == "Verification timed out.":
+        return UNDECIDED
+    return classify_alive2_output(stdout)
+
+def analyze_pair(i, ref, tgt, run_alive2=True, rules=DEFAULT_RULES):
+    start = time.perf_counter()
+
+    ref_ir_verification = ref['verification']
+    tgt_ir_verification = tgt['verification']
+
+    if not ref_ir_verification or not tgt_ir_verification:
+        result = PairResult.failed(i, ref, tgt, "VERIFY FAILED", skip_all('verify_failed'))
+        return result.as_dict(), os.getpid(), time.perf_counter() - start
+
+    if not ref['canonicalization'] or not tgt['canonicalization']:
+        result = PairResult.failed(i, ref, tgt, "CANONICALIZATION FAILED", skip_all('canonicalization_failed'))
+        return result.as_dict(), os.getpid(), time.perf_counter() - start
+
+    ref_context = ref['context']
+    tgt_context = tgt['context']
+    ref_canon_ir = ref_context.llvm_ir
+    tgt_canon_ir = tgt_context.llvm_ir
+
+    plan = StagePlan()
+    if 'identical' in rules and ref_canon_ir == tgt_canon_ir:
+        for stage in IDENTICAL_SKIPS:
+            plan.skip(stage, 'identical')
 
-        # Function Analysis
-        func_analysis = functions_count(ref_canon_ir, tgt_canon_ir)
+    # Function Analysis
+    if plan.runs('functions'):
+        func_analysis = compare_function_info(ref_context.functions, tgt_context.functions)
+        if ('signature_mismatch' in rules
+                and defined_signatures(ref_context.functions) != defined_signatures(tgt_context.functions)):
+            plan.skip('alive2', 'signature_mismatch')
+    else:
+        func_analysis = {'count_match': True, 'signature_match': True}
 
-        # IR Diff
+    # IR Diff
+    if plan.runs('diff'):
         is_identical, diff_stdout, diff_stderr = diff_llvm_ir(ref_canon_ir, tgt_canon_ir)
+    else:
+        is_identical, diff_stdout, diff_stderr = True, "", ""
 
-        # CFG Comparison
-        try:
-            cfg_comparison = compare_llvm_ir_cfgs(ref_canon_ir, tgt_canon_ir)
-
-            # Aggregate metrics across all functions
-            comparisons = cfg_comparison.get('comparisons', {})
-
-            if comparisons:
-                cfg_isomorphic = all(r.get('is_isomorphic', False) for r in comparisons.values())
-                cfg_loop_match = all(r.get('loop_count_match', False) for r in comparisons.values())
-                cfg_complexity_match = all(r.get('cyclomatic_complexity_match', False) for r in comparisons.values())
-                cfg_dominator_match = all(r.get('dominator_tree_match', False) for r in comparisons.values() if r.get('dominator_tree_match') is not None)
-                cfg_nodes_match = all(r.get('graph1_nodes') == r.get('graph2_nodes') for r in comparisons.values())
-                cfg_edges_match = all(r.get('graph1_edges') == r.get('graph2_edges') for r in comparisons.values())
-                cfg_similarity_score = cfg_comparison.get('all_similarity_avg', 0.0) or 0.0
-                cfg_definitive_match = cfg_comparison.get('all_match', False)
-            else:
-                cfg_isomorphic = False
-                cfg_loop_match = False
-                cfg_complexity_match = False
-                cfg_dominator_match = False
-                cfg_nodes_match = False
-                cfg_edges_match = False
-                cfg_similarity_score = 0.0
-                cfg_definitive_match = False
-
-        except Exception:
+    # CFG Comparison
+    try:
+        if plan.runs('cfg'):
+            cfg_comparison = compare_function_cfgs(ref_context.cfgs, tgt_context.cfgs)
+        else:
+            # Comparing a CFG with itself matches on every metric; only the
+            # functions need to be known.
+            cfg_comparison = {
+                'comparisons': {name: IDENTICAL_CFG_COMPARISON for name in ref_context.cfgs},
+                'all_match': bool(ref_context.cfgs),
+                'all_similarity_avg': 1.0 if ref_context.cfgs else None,
+            }
+
+        # Aggregate metrics across all functions
+        comparisons = cfg_comparison.get('comparisons', {})
+
+        if comparisons:
+            # None when VF2 ran out of time on a function and no other
+            # function is known not to match.
+            isomorphic = [r.get('is_isomorphic', False) for r in comparisons.values()]
+            cfg_isomorphic = False if False in isomorphic else None if None in isomorphic else True
+            cfg_loop_match = all(r.get('loop_count_match', False) for r in comparisons.values())
+            cfg_complexity_match = all(r.get('cyclomatic_complexity_match', False) for r in comparisons.values())
+            cfg_dominator_match = all(r.get('dominator_tree_match', False) for r in comparisons.values() if r.get('dominator_tree_match') is not None)
+            cfg_nodes_match = all(r.get('graph1_nodes') == r.get('graph2_nodes') for r in comparisons.values())
+            cfg_edges_match = all(r.get('graph1_edges') == r.get('graph2_edges') for r in comparisons.values())
+            cfg_similarity_score = cfg_comparison.get('all_similarity_avg', 0.0) or 0.0
+            cfg_definitive_match = cfg_comparison.get('all_match', False)
+        else:
             cfg_isomorphic = False
             cfg_loop_match = False
             cfg_complexity_match = False
@@ -155,131 +199,611 @@ def process_batch(batch, compilation_command=None, output_file=None, src_directo
             cfg_similarity_score = 0.0
             cfg_definitive_match = False
 
-        # Alive2 Verification
+    except Exception:
+        cfg_isomorphic = False
+        cfg_loop_match = False
+        cfg_complexity_match = False
+        cfg_dominator_match = False
+        cfg_nodes_match = False
+        cfg_edges_match = False
+        cfg_similarity_score = 0.0
+        cfg_definitive_match = False
+
+    # Alive2 Verification (left to the scheduler when one is used)
+    alive2_verified = False
+    alive2_stdout = ""
+    alive2_stderr = ""
+    alive2_status = None
+    if not plan.runs('alive2'):
+        alive2_verified, alive2_stdout, alive2_stderr, alive2_status = implied_alive2(plan.reason('alive2'))
+    elif run_alive2:
         try:
             alive2_verified, alive2_stdout, alive2_stderr = verify_with_alive2(ref_canon_ir, tgt_canon_ir)
+            alive2_status = blocking_alive2_status(alive2_stdout)
         except Exception as e:
             alive2_verified = False
             alive2_stdout = ""
             alive2_stderr = f"Alive2 verification error: {str(e)}"
+            alive2_status = ERROR
 
-        # Compilation Check
-        ref_compilation_success = False
-        tgt_compilation_success = False
-        ref_executable = None
-        tgt_executable = None
+    result = PairResult(
+        id=i,
+        ref_ir_verification=ref_ir_verification,
+        ref_ir_verification_message=ref['verification_message'],
+        tgt_ir_verification=tgt_ir_verification,
+        tgt_ir_verification_message=tgt['verification_message'],
+        ref_canonicalization=ref['canonicalization'],
+        ref_canonicalization_error=ref['canonicalization_error'],
+        tgt_canonicalization=tgt['canonicalization'],
+        tgt_canonicalization_error=tgt['canonicalization_error'],
+        identical=is_identical,
+        diff_stdout=diff_stdout,
+        diff_stderr=diff_stderr,
+        function_count_match=func_analysis.get('count_match', False),
+        function_signature_match=func_analysis.get('signature_match', False),
+        cfg_isomorphic_match=cfg_isomorphic,
+        cfg_loop_count_match=cfg_loop_match,
+        cfg_complexity_match=cfg_complexity_match,
+        cfg_dominator_match=cfg_dominator_match,
+        cfg_nodes_match=cfg_nodes_match,
+        cfg_edges_match=cfg_edges_match,
+        cfg_similarity_score=cfg_similarity_score,
+        cfg_definitive_match=cfg_definitive_match,
+        alive2_verified=alive2_verified,
+        alive2_status=alive2_status,
+        alive2_stdout=alive2_stdout,
+        alive2_stderr=alive2_stderr,
+        skipped_stages=plan.skipped,
+    )
 
-        if compilation_command and output_file:
-            try:
-                ref_output = "ref_" + output_file
-                ref_compilation_success = compilation_check(
-                    ref_canon_ir,
+    return result.as_dict(), os.getpid(), time.perf_counter() - start
+
+def execute_pair(ref_canon_ir, tgt_canon_ir, compilation_command, output_file, src_directory, io_timeout,
+                 identical=False, io_vectors=None, io_limits=None, link_mode='full', object_dir=None):
+    # Both executables live in a scratch directory of their own, so pairs
+    # can be compiled and run concurrently.
+    with build_directory() as build_dir:
+        return _execute_pair(ref_canon_ir, tgt_canon_ir, compilation_command, output_file, src_directory,
+                             io_timeout, identical, io_vectors, io_limits, build_dir, link_mode, object_dir)
+
+def _execute_pair(ref_canon_ir, tgt_canon_ir, compilation_command, output_file, src_directory, io_timeout,
+                  identical, io_vectors, io_limits, build_dir, link_mode, object_dir):
+    # Compilation Check
+    ref_compilation_success = False
+    tgt_compilation_success = False
+    ref_executable = None
+    tgt_executable = None
+
+    try:
+        ref_output = "ref_" + output_file
+        tgt_output = "tgt_" + output_file
+        # When the incremental link cannot build both halves, both get a full
+        # compile.
+        incremental = None
+        if link_mode == 'incremental' and not identical:
+            incremental = incremental_compilation_check(ref_canon_ir, tgt_canon_ir, compilation_command, ref_output,
+                                                        tgt_output, src_directory, build_dir, object_dir)
+        ref_compilation_success, tgt_compilation_success = incremental or (None, None)
+
+        if ref_compilation_success is None:
+            ref_compilation_success = compilation_check(
+                ref_canon_ir,
+                compilation_command,
+                ref_output,
+                src_directory,
+                build_dir=build_dir
+            )
+
+        if identical:
+            # Same canonical IR, same executable: the target builds and
+            # behaves exactly like the reference.
+            return {
+                'ref_compilation_success': ref_compilation_success,
+                'tgt_compilation_success': ref_compilation_success,
+                'io_both_executed': False,
+                'io_stdout_match': ref_compilation_success,
+                'io_stderr_match': ref_compilation_success,
+                'io_returncode_match': ref_compilation_success,
+                'io_match': ref_compilation_success,
+                'io_reference_seconds': None,
+            }
+
+        if ref_compilation_success:
+            ref_executable = os.path.join(build_dir, ref_output)
+
+            if tgt_compilation_success is None:
+                tgt_compilation_success = compilation_check(
+                    tgt_canon_ir,
                     compilation_command,
-                    ref_output,
-                    src_directory
+                    tgt_output,
+                    src_directory,
+                    build_dir=build_dir
                 )
 
-                if ref_compilation_success:
-                    ref_executable = os.path.join(src_directory, ref_output) if src_directory else ref_output
+            if tgt_compilation_success:
+                tgt_executable = os.path.join(build_dir, tgt_output)
+        else:
+            tgt_compilation_success = False
+    except Exception as e:
+        ref_compilation_success = False
+        tgt_compilation_success = False
 
-                    tgt_output = "tgt_" + output_file
-                    tgt_compilation_success = compilation_check(
-                        tgt_canon_ir,
-                        compilation_command,
-                        tgt_output,
-                        src_directory
-                    )
+    return _io_fields(ref_compilation_success, tgt_compilation_success, ref_executable, tgt_executable,
+                      io_timeout, io_vectors, io_limits)
 
-                    if tgt_compilation_success:
-                        tgt_executable = os.path.join(src_directory, tgt_output) if src_directory else tgt_output
-            except Exception as e:
-                ref_compilation_success = False
-                tgt_compilation_success = False
+def _io_fields(ref_compilation_success, tgt_compilation_success, ref_executable, tgt_executable,
+               io_timeout, io_vectors, io_limits):
+    # I/O Testing
+    io_both_executed = False
+    io_stdout_match = False
+    io_stderr_match = False
+    io_returncode_match = False
+    io_match = False
+    io_reference_seconds = None
 
-        # I/O Testing
-        io_both_executed = False
-        io_stdout_match = False
-        io_stderr_match = False
-        io_returncode_match = False
-        io_match = False
+    if ref_compilation_success and tgt_compilation_success and ref_executable and tgt_executable:
+        try:
+            io_result = io_test(ref_executable, tgt_executable, io_timeout, vectors=io_vectors, limits=io_limits)
 
-        if ref_compilation_success and tgt_compilation_success and ref_executable and tgt_executable:
-            try:
-                io_result = io_test(ref_executable, tgt_executable, io_timeout)
+            io_both_executed = io_result.get('both_executed', False)
+            io_stdout_match = io_result.get('stdout_match', False)
+            io_stderr_match = io_result.get('stderr_match', False)
+            io_returncode_match = io_result.get('returncode_match', False)
+            io_match = io_result.get('match', False)
+            io_reference_seconds = io_result.get('reference_seconds')
+        except Exception as e:
+            io_both_executed = False
+            io_stdout_match = False
+            io_stderr_match = False
+            io_returncode_match = False
+            io_match = False
+
+    return {
+        'ref_compilation_success': ref_compilation_success,
+        'tgt_compilation_success': tgt_compilation_success,
+        'io_both_executed': io_both_executed,
+        'io_stdout_match': io_stdout_match,
+        'io_stderr_match': io_stderr_match,
+        'io_returncode_match': io_returncode_match,
+        'io_match': io_match,
+        'io_reference_seconds': io_reference_seconds,
+    }
+
+def record_worker_time(worker_stats, pid, elapsed, samples=0):
+    if worker_stats is None:
+        return
+    stats = worker_stats.setdefault(pid, {'tasks': 0, 'samples': 0, 'busy_seconds': 0.0})
+    stats['tasks'] += 1
+    stats['samples'] += samples
+    stats['busy_seconds'] += elapsed
+
+def common_functions(ref, tgt):
+    # Functions defined on both sides; alive-tv checks each of them separately.
+    try:
+        return sorted(set(ref['context'].cfgs) & set(tgt['context'].cfgs))
+    except RuntimeError:
+        return None
+
+def record_cache_counters(cache_stats, side):
+    if cache_stats is None or side['cache_counters'] is None:
+        return
+    merge_cache_counters(cache_stats, side['cache_counters'])
+
+def process_batch(batch, compilation_command=None, output_file=None, src_directory=None, io_timeout=60,
+                  executor=None, worker_stats=None, keys=None, on_result=None, ir_engine='auto',
+                  cache_stats=None, alive2=None, rules=DEFAULT_RULES, stage_stats=None,
+                  io_limits=None, link_mode='full', object_dir=None, runtime_db=None):
+    results = [None] * len(batch)
+    compiled = bool(compilation_command and output_file)
+    alive2_futures = {}
+
+    if keys is None:
+        keys = [sample_key(item, i) for i, item in enumerate(batch)]
+    runtime_keys = [runtime_key(item['ref_ir'], compilation_command) for item in batch] if runtime_db is not None else None
+
+    # Rows finish out of order (on the pool, and whenever Alive2 runs
+    # behind); they are handed on in dataset order, as soon as every row
+    # before them is done.
+    finished = [False] * len(batch)
+    emitted = 0
+
+    def finish(i, result):
+        nonlocal emitted
+        result['key'] = keys[i]
+        results[i] = result
+        finished[i] = True
+        record_stage_counts(stage_stats, result['skipped_stages'])
+        while emitted < len(batch) and finished[emitted]:
+            if on_result is not None:
+                on_result(results[emitted])
+            emitted += 1
+
+    def timeout(i, stage, default):
+        # Per-sample timeouts calibrated from earlier runs, when recorded.
+        return runtime_db.timeout(runtime_keys[i], stage, default) if runtime_db is not None else default
+
+    def submit_alive2(i, ref, tgt):
+        if alive2 is not None and 'alive2' not in results[i]['skipped_stages']:
+            alive2_futures[i] = alive2.submit(ref['canonical_ir'], tgt['canonical_ir'], common_functions(ref, tgt),
+                                              escalation_timeout=timeout(i, 'alive2', alive2.escalation_timeout))
+
+    def execute_args(i, ref, tgt):
+        # Arguments of execute_pair for item i, or None when it is not built.
+        skipped = results[i]['skipped_stages']
+        if not compiled:
+            skipped.setdefault('compile', 'disabled')
+            skipped.setdefault('io', 'disabled')
+            return None
+        if 'compile' in skipped:
+            return None
+        return ((ref['canonical_ir'], tgt['canonical_ir'], compilation_command, output_file, src_directory,
+                 timeout(i, 'io', io_timeout)),
+                {'identical': skipped.get('io') == 'identical', 'io_vectors': batch[i].get('io_vectors'),
+                 'io_limits': io_limits, 'link_mode': link_mode, 'object_dir': object_dir})
 
-                io_both_executed = io_result.get('both_executed', False)
-                io_stdout_match = io_result.get('stdout_match', False)
-                io_stderr_match = io_result.get('stderr_match', False)
-                io_returncode_match = io_result.get('returncode_match', False)
-                io_match = io_result.get('match', False)
+    def record_execution(i, fields):
+        result = results[i]
+        result.update(fields)
+        if runtime_db is not None:
+            runtime_db.record(runtime_keys[i], 'io', fields['io_reference_seconds'])
+        if not (result['ref_compilation_success'] and result['tgt_compilation_success']):
+            result['skipped_stages'].setdefault('io', 'compilation_failed')
+
+    def execute(i, ref, tgt):
+        call = execute_args(i, ref, tgt)
+        if call is not None:
+            record_execution(i, execute_pair(*call[0], **call[1]))
+
+    def finish_alive2():
+        for i, future in alive2_futures.items():
+            try:
+                alive2_verified, alive2_stdout, alive2_stderr, alive2_seconds, alive2_status = future.result()
             except Exception as e:
-                io_both_executed = False
-                io_stdout_match = False
-                io_stderr_match = False
-                io_returncode_match = False
-                io_match = False
-
-        result = {
-            'id': i,
-            'ref_ir_verification': ref_ir_verification,
-            'ref_ir_verification_message': ref_ir_verification_message,
-            'tgt_ir_verification': tgt_ir_verification,
-            'tgt_ir_verification_message': tgt_ir_verification_message,
-            'ref_canonicalization': ref_canon_success,
-            'ref_canonicalization_error': ref_canon_error,
-            'tgt_canonicalization': tgt_canon_success,
-            'tgt_canonicalization_error': tgt_canon_error,
-            'identical': is_identical,
-            'diff_stdout': diff_stdout,
-            'diff_stderr': diff_stderr,
-            'function_count_match': func_analysis.get('count_match', False),
-            'function_signature_match': func_analysis.get('signature_match', False),
-            'cfg_isomorphic_match': cfg_isomorphic,
-            'cfg_loop_count_match': cfg_loop_match,
-            'cfg_complexity_match': cfg_complexity_match,
-            'cfg_dominator_match': cfg_dominator_match,
-            'cfg_nodes_match': cfg_nodes_match,
-            'cfg_edges_match': cfg_edges_match,
-            'cfg_similarity_score': cfg_similarity_score,
-            'cfg_definitive_match': cfg_definitive_match,
-            'alive2_verified': alive2_verified,
-            'alive2_stdout': alive2_stdout,
-            'alive2_stderr': alive2_stderr,
-            'ref_compilation_success': ref_compilation_success,
-            'tgt_compilation_success': tgt_compilation_success,
-            'io_both_executed': io_both_executed,
-            'io_stdout_match': io_stdout_match,
-            'io_stderr_match': io_stderr_match,
-            'io_returncode_match': io_returncode_match,
-            'io_match': io_match,
-        }
-
-        results.append(result)
+                alive2_verified, alive2_stdout, alive2_stderr = False, "", f"Alive2 verification error: {str(e)}"
+                alive2_seconds, alive2_status = None, ERROR
+            if runtime_db is not None:
+                runtime_db.record(runtime_keys[i], 'alive2', alive2_seconds)
+            results[i].update({
+                'alive2_verified': alive2_verified,
+                'alive2_status': alive2_status,
+                'alive2_stdout': alive2_stdout,
+                'alive2_stderr': alive2_stderr,
+            })
+            finish(i, results[i])
+
+    if executor is None:
+        for i, item in enumerate(batch):
+            ref, pid, ref_elapsed = prepare_ir(item["ref_ir"], ir_engine)
+            tgt, pid, tgt_elapsed = prepare_ir(item["tgt_ir"], ir_engine)
+
+            stale = inconsistent_half(ref, tgt)
+            if stale == 'ref':
+                ref, pid, ref_elapsed = prepare_ir(item["ref_ir"], 'opt')
+            elif stale == 'tgt':
+                tgt, pid, tgt_elapsed = prepare_ir(item["tgt_ir"], 'opt')
+            record_cache_counters(cache_stats, ref)
+            record_cache_counters(cache_stats, tgt)
+
+            result, pid, elapsed = analyze_pair(i, ref, tgt, run_alive2=alive2 is None, rules=rules)
+            record_worker_time(worker_stats, pid, ref_elapsed + tgt_elapsed + elapsed, samples=1)
+            results[i] = result
+            submit_alive2(i, ref, tgt)
+            execute(i, ref, tgt)
+
+            if i not in alive2_futures:
+                finish(i, result)
+
+        finish_alive2()
+        return results
+
+    # The ref and tgt halves of every item are verified and canonicalized as
+    # independent tasks; an item's analysis is submitted once both halves are in.
+    sides = [{} for _ in batch]
+    side_futures = {}
+    for i, item in enumerate(batch):
+        side_futures[executor.submit(prepare_ir, item["ref_ir"], ir_engine)] = (i, 'ref')
+        side_futures[executor.submit(prepare_ir, item["tgt_ir"], ir_engine)] = (i, 'tgt')
+
+    pair_futures = {}
+    pending = set(side_futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            i, half = side_futures.pop(future)
+            side, pid, elapsed = future.result()
+            record_worker_time(worker_stats, pid, elapsed)
+            record_cache_counters(cache_stats, side)
+            sides[i][half] = side
+            if len(sides[i]) < 2:
+                continue
 
+            stale = inconsistent_half(sides[i]['ref'], sides[i]['tgt'])
+            if stale:
+                del sides[i][stale]
+                redo = executor.submit(prepare_ir, batch[i][f"{stale}_ir"], 'opt')
+                side_futures[redo] = (i, stale)
+                pending.add(redo)
+            else:
+                pair_futures[executor.submit(analyze_pair, i, sides[i]['ref'], sides[i]['tgt'], alive2 is None, rules)] = i
+
+    # Every pair builds in its own scratch directory, so compilation and I/O
+    # testing run on the pool as soon as the pair's analysis is in.
+    build_futures = {}
+    for future in as_completed(pair_futures):
+        i = pair_futures[future]
+        result, pid, elapsed = future.result()
+        record_worker_time(worker_stats, pid, elapsed, samples=1)
+        results[i] = result
+        submit_alive2(i, sides[i]['ref'], sides[i]['tgt'])
+        call = execute_args(i, sides[i]['ref'], sides[i]['tgt'])
+        if call is not None:
+            build_futures[executor.submit(execute_pair, *call[0], **call[1])] = i
+        elif i not in alive2_futures:
+            finish(i, result)
+
+    for future in as_completed(build_futures):
+        i = build_futures[future]
+        record_execution(i, future.result())
+        if i not in alive2_futures:
+            finish(i, results[i])
+
+    finish_alive2()
     return results
 
+def print_worker_report(worker_stats, wall_seconds, total_samples):
+    print(f"\n{'='*60}")
+    print("Worker Throughput")
+    print(f"{'='*60}")
+    for pid, stats in sorted(worker_stats.items()):
+        busy = stats['busy_seconds']
+        rate = stats['tasks'] / busy if busy > 0 else 0.0
+        print(f"  Worker {pid}: {stats['tasks']} tasks, {stats['samples']} samples, "
+              f"{busy:.1f}s busy, {rate:.2f} tasks/s")
+    overall = total_samples / wall_seconds if wall_seconds > 0 else 0.0
+    print(f"\n  Total: {total_samples} samples in {wall_seconds:.1f}s ({overall:.2f} samples/s)")
+    print(f"{'='*60}\n")
+
+def print_alive2_report(stats):
+    print(f"{'='*60}")
+    print("Alive2 Scheduler")
+    print(f"{'='*60}")
+    print(f"  Functions: {stats['functions']} ({stats['cached']} cached, {stats['escalated']} escalated)")
+    print(f"  Correct: {stats['correct']}, incorrect: {stats['incorrect']}, "
+          f"undecided: {stats['undecided']}, errors: {stats['error']}")
+    print(f"{'='*60}\n")
+
+def print_stage_report(stage_stats):
+    print(f"{'='*60}")
+    print("Stages (cheapest first)")
+    print(f"{'='*60}")
+    for stage in stage_order():
+        stats = stage_stats.get(stage, {'executed': 0, 'skipped': 0, 'reasons': {}})
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in sorted(stats['reasons'].items()))
+        print(f"  {stage}: {stats['executed']} executed, {stats['skipped']} skipped" + (f" ({reasons})" if reasons else ""))
+    print(f"{'='*60}\n")
+
+def print_cache_report(cache_stats):
+    print(f"{'='*60}")
+    print("Analysis Cache")
+    print(f"{'='*60}")
+    for kind, counts in sorted(cache_stats.items()):
+        lookups = counts['hits'] + counts['misses']
+        rate = counts['hits'] / lookups if lookups else 0.0
+        print(f"  {kind}: {counts['hits']} hits, {counts['misses']} misses ({rate:.1%} hit rate)")
+    print(f"{'='*60}\n")
+
+def print_timeout_report(timeout_stats):
+    print(f"{'='*60}")
+    print("Calibrated Timeouts")
+    print(f"{'='*60}")
+    for stage, stats in sorted(timeout_stats.items()):
+        savings = stats['default_seconds'] - stats['calibrated_seconds']
+        print(f"  {stage}: {stats['calibrated']}/{stats['samples']} samples calibrated, "
+              f"budget {stats['calibrated_seconds']:.0f}s instead of {stats['default_seconds']:.0f}s "
+              f"({savings:+.0f}s saved)")
+    print(f"{'='*60}\n")
+
+def print_tool_report(series):
+    print(f"{'='*60}")
+    print("LLVM Tool Invocations")
+    print(f"{'='*60}")
+    for entry in sorted(series, key=lambda s: -s['wall_seconds']['sum']):
+        calls = entry['wall_seconds']['count']
+        failures = calls - entry['status'].get('ok', 0)
+        print(f"  {entry['tool']} [{entry['stage']}]: {calls} calls ({failures} not ok), "
+              f"{entry['wall_seconds']['sum']:.1f}s wall, {entry['cpu_seconds']['sum']:.1f}s CPU")
+    print(f"{'='*60}\n")
+
 def main(args):
     compilation_command = args.compilation_command.split() if args.compilation_command else None
 
-    for batch in load_dataset(args.dataset, args.batch_size):
-        process_batch(
-            batch,
-            compilation_command=compilation_command,
-            output_file=args.output_file,
-            src_directory=args.src_directory,
-            io_timeout=args.io_timeout
+    sink = None
+    completed_keys = set()
+    if args.results:
+        if result_sink_exists(args.results) and not args.resume:
+            print(f"Results already exist at {args.results}. Use --resume to continue the run.")
+            sys.exit(1)
+        sink = open_result_sink(args.results)
+        if args.resume:
+            completed_keys = sink.existing_keys()
+            print(f"Resuming: {len(completed_keys)} samples already evaluated.")
+
+    # Pass rates and score histograms kept as results come in, so the summary
+    # never needs a second pass over the results.
+    summary_file = args.summary or (summary_path(args.results) if args.results else None)
+    summary = resumed_summary(summary_file, args.results, len(completed_keys)) if args.resume and summary_file else None
+    aggregator = MetricsAggregator(summary_file, summary=summary, flush_samples=args.summary_every)
+
+    def on_result(result):
+        if sink is not None:
+            sink.write(result)
+        aggregator.add(result)
+
+    worker_stats = {}
+    stage_stats = {}
+    cache_stats = {} if args.cache else None
+    rules = check_rules(args.short_circuit)
+    io_limits = {
+        'memory_bytes': args.io_memory_mb * 1024 * 1024,
+        'output_bytes': args.io_output_mb * 1024 * 1024,
+        'slowdown': args.io_slowdown,
+    }
+    total_samples = 0
+    dataset_index = 0
+    start_offset, line_count = 0, None
+    if args.num_shards > 1:
+        # Sample keys stay dataset line numbers, so shards never collide.
+        dataset_index, line_count, start_offset = dataset_shard(args.dataset, args.shard_index, args.num_shards,
+                                                                args.dataset_index)
+        print(f"Shard {args.shard_index + 1}/{args.num_shards}: lines {dataset_index}-{dataset_index + line_count - 1}")
+    start = time.perf_counter()
+
+    cache_bytes = args.cache_size_mb * 1024 * 1024
+    if args.cache:
+        # The parent's connection serves the sequential path and the Alive2
+        # scheduler; pool workers open their own in the initializer.
+        init_analysis_cache(args.cache, cache_bytes)
+
+    # Pool workers write their tool metrics here when they exit.
+    metrics_dir = tempfile.mkdtemp(prefix="tool_metrics_", dir=scratch_root()) if args.workers > 1 else None
+
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=init_worker,
+            initargs=(args.cache, cache_bytes, metrics_dir)
         )
+    else:
+        executor = None
+
+    runtime_db = RuntimeDB(args.runtime_db, factor=args.timeout_factor) if args.runtime_db else None
+
+    # Shared objects of incremental mode outlive single pairs; a scratch
+    # directory holds them unless --object_dir keeps them across runs.
+    object_dir = None
+    if args.link_mode == 'incremental':
+        if args.object_dir:
+            object_dir = args.object_dir
+            os.makedirs(object_dir, exist_ok=True)
+        else:
+            object_dir = tempfile.mkdtemp(prefix="objects_", dir=scratch_root())
+
+    alive2 = Alive2Scheduler(
+        max_workers=args.alive2_workers,
+        first_timeout=args.alive2_timeout,
+        escalation_timeout=args.alive2_escalation_timeout,
+        cache=analysis_cache
+    )
+
+    try:
+        for batch in load_dataset(args.dataset, args.batch_size, start_offset, line_count):
+            keys = [sample_key(item, dataset_index + j) for j, item in enumerate(batch)]
+            dataset_index += len(batch)
+
+            pending = [(key, item) for key, item in zip(keys, batch) if key not in completed_keys]
+            if not pending:
+                continue
+
+            process_batch(
+                [item for _, item in pending],
+                compilation_command=compilation_command,
+                output_file=args.output_file,
+                src_directory=args.src_directory,
+                io_timeout=args.io_timeout,
+                ir_engine=args.ir_engine,
+                executor=executor,
+                worker_stats=worker_stats,
+                keys=[key for key, _ in pending],
+                on_result=on_result,
+                cache_stats=cache_stats,
+                alive2=alive2,
+                rules=rules,
+                stage_stats=stage_stats,
+                io_limits=io_limits,
+                link_mode=args.link_mode,
+                object_dir=object_dir,
+                runtime_db=runtime_db
+            )
+            total_samples += len(pending)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        alive2.shutdown()
+        if metrics_dir is not None:
+            collect_metrics(metrics_dir)
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+        if sink is not None:
+            sink.close()
+        aggregator.close()
+        if runtime_db is not None:
+            runtime_db.close()
+        if object_dir is not None and not args.object_dir:
+            shutil.rmtree(object_dir, ignore_errors=True)
+        if analysis_cache is not None:
+            merge_cache_counters(cache_stats, analysis_cache.drain_counters())
+            # Workers evict as they insert; one final pass enforces the bound.
+            analysis_cache.close()
+
+    print_worker_report(worker_stats, time.perf_counter() - start, total_samples)
+    print_summary(aggregator.summary)
+    print_stage_report(stage_stats)
+    print_alive2_report(alive2.stats)
+    if runtime_db is not None:
+        print_timeout_report(runtime_db.stats)
+    if cache_stats is not None:
+        print_cache_report(cache_stats)
+    print_tool_report(tool_metrics.snapshot())
+    if args.tool_metrics:
+        tool_metrics.write(args.tool_metrics)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Runner for Source Code Analysis")
 
     parser.add_argument('--dataset', type=str, required=True)
-    parser.add_argument('--batch_size', type=str, default=100)
+    parser.add_argument('--batch_size', type=int, default=100)
+    parser.add_argument('--shard_index', type=int, default=0, help='Shard of the dataset this run evaluates (0-based)')
+    parser.add_argument('--num_shards', type=int, default=1, help='Number of byte-balanced shards the dataset is split into')
+    parser.add_argument('--dataset_index', type=str, default=None,
+                        help='Line-offset index of --dataset (default: <dataset>.idx, built when missing or stale)')
     parser.add_argument('--compilation_command', type=str, default=None, help='Compilation command (space-separated)')
     parser.add_argument('--output_file', type=str, default=None)
     parser.add_argument('--src_directory', type=str, default=None)
+    parser.add_argument('--link_mode', type=str, default='full', choices=LINK_MODES,
+                        help='incremental compiles the unchanged part of a pair once and links only the changed functions')
+    parser.add_argument('--object_dir', type=str, default=None,
+                        help='Where incremental mode keeps shared objects (default: a scratch directory removed at exit)')
     parser.add_argument('--io_timeout', type=int, default=60)
+    parser.add_argument('--io_slowdown', type=float, default=SLOWDOWN,
+                        help='Kill the target once it runs this many times longer than the finished reference')
+    parser.add_argument('--io_memory_mb', type=int, default=DEFAULT_IO_LIMITS['memory_bytes'] // (1024 * 1024),
+                        help='Address-space limit of each executable under I/O test')
+    parser.add_argument('--io_output_mb', type=int, default=DEFAULT_IO_LIMITS['output_bytes'] // (1024 * 1024),
+                        help='Per-stream output limit of each executable under I/O test')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes (1 runs sequentially)')
+    parser.add_argument('--ir_engine', type=str, default='auto', choices=ENGINES,
+                        help='Verification/canonicalization engine: in-process llvmlite, opt, or auto')
+    parser.add_argument('--results', type=str, default=None, help='Result sink: a .jsonl file or a Parquet directory')
+    parser.add_argument('--resume', action='store_true', help='Skip samples already present in --results')
+    parser.add_argument('--summary', type=str, default=None,
+                        help='Running summary JSON of pass rates and score histograms (default: next to --results)')
+    parser.add_argument('--summary_every', type=int, default=FLUSH_SAMPLES,
+                        help='Write the summary after this many results (and at least every minute)')
+    parser.add_argument('--cache', type=str, default=None, help='SQLite file caching canonical IR, signatures and CFGs')
+    parser.add_argument('--cache_size_mb', type=int, default=1024, help='Size bound of --cache, evicted least recently used first')
+    parser.add_argument('--short_circuit', nargs='*', default=sorted(DEFAULT_RULES), choices=list(SHORT_CIRCUIT_RULES),
+                        help='Rules that skip stages whose outcome is already implied (pass none to disable; '
+                             'signature_mismatch is opt-in)')
+    parser.add_argument('--runtime_db', type=str, default=None,
+                        help='SQLite file of reference run and verification times, used to calibrate per-sample timeouts')
+    parser.add_argument('--timeout_factor', type=float, default=TIMEOUT_FACTOR,
+                        help='Calibrated timeout as a multiple of the p95 recorded runtime, within per-stage bounds')
+    parser.add_argument('--tool_metrics', type=str, default=None,
+                        help='Write per-tool, per-stage invocation histograms here (Prometheus text for .prom, JSON otherwise)')
+    parser.add_argument('--alive2_workers', type=int, default=4, help='Concurrent alive-tv processes')
+    parser.add_argument('--alive2_timeout', type=int, default=FIRST_PASS_TIMEOUT, help='First-pass alive-tv timeout per function (seconds)')
+    parser.add_argument('--alive2_escalation_timeout', type=int, default=ESCALATION_TIMEOUT,
+                        help='Timeout for functions undecided in the first pass (seconds)')
 
     args = parser.parse_args()
 
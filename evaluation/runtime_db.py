@@ -0,0 +1,87 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+TIMEOUT_FACTOR = 5
+# Floors and ceilings of calibrated timeouts, in seconds, per stage.
+TIMEOUT_BOUNDS = {
+    'io': (1, 600),
+    'alive2': (30, 3600),
+}
+# Only the most recent runtimes of a sample count towards its timeout.
+HISTORY_LIMIT = 20
+
+def runtime_key(ref_ir, compilation_command=None):
+    # Runtimes belong to the reference program and how it is built, not to
+    # its position in a dataset that may be reordered or filtered.
+    h = hashlib.sha256(ref_ir.encode())
+    for arg in compilation_command or ():
+        h.update(b"\0" + arg.encode())
+    return h.hexdigest()
+
+def percentile(values, q):
+    # Nearest-rank percentile; values need not be sorted.
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def calibrated_timeout(history, default, factor=TIMEOUT_FACTOR, bounds=None):
+    if not history:
+        return default
+    floor, ceiling = bounds if bounds is not None else (0, math.inf)
+    return min(max(factor * percentile(history, 95), floor), ceiling)
+
+class RuntimeDB:
+    # Reference execution and verification times per runtime_key and stage,
+    # from which later runs derive per-sample timeouts.
+
+    def __init__(self, path, factor=TIMEOUT_FACTOR, bounds=TIMEOUT_BOUNDS):
+        self.path = path
+        self.factor = factor
+        self.bounds = bounds
+        self.stats = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runtimes ("
+            "key TEXT NOT NULL, stage TEXT NOT NULL, seconds REAL NOT NULL, recorded REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runtimes_key_stage ON runtimes (key, stage, recorded)")
+
+    def record(self, key, stage, seconds):
+        if seconds is None:
+            return
+        with self._lock:
+            self._conn.execute("INSERT INTO runtimes (key, stage, seconds, recorded) VALUES (?, ?, ?, ?)",
+                               (key, stage, seconds, time.time()))
+
+    def history(self, key, stage):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seconds FROM runtimes WHERE key = ? AND stage = ? ORDER BY recorded DESC LIMIT ?",
+                (key, stage, HISTORY_LIMIT)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def timeout(self, key, stage, default):
+        timeout = calibrated_timeout(self.history(key, stage), default, self.factor, self.bounds.get(stage))
+        stats = self.stats.setdefault(stage, {'samples': 0, 'calibrated': 0, 'default_seconds': 0.0,
+                                              'calibrated_seconds': 0.0})
+        stats['samples'] += 1
+        stats['default_seconds'] += default
+        stats['calibrated_seconds'] += timeout
+        if timeout != default:
+            stats['calibrated'] += 1
+        return timeout
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,82 @@
+STAGES = {
+    # Relative cost per sample. A stage whose dependency is skipped is
+    # skipped for the same reason. Costs and dependencies describe the
+    # stages for skip propagation and reporting; analyze_pair and
+    # execute_pair run them in their own fixed order.
+    'functions': {'cost': 1, 'deps': ()},
+    'diff': {'cost': 2, 'deps': ()},
+    'cfg': {'cost': 4, 'deps': ()},
+    'compile': {'cost': 50, 'deps': ()},
+    'io': {'cost': 60, 'deps': ('compile',)},
+    'alive2': {'cost': 200, 'deps': ('functions',)},
+}
+
+SHORT_CIRCUIT_RULES = {
+    'identical': "byte-identical canonical IR implies every structural, semantic and I/O match",
+    'signature_mismatch': "differing signatures of defined functions settle Alive2 as not verified",
+}
+
+# signature_mismatch is opt-in: it reports pairs as not verified that
+# Alive2 never saw, which the runner did not do before the rules existed.
+DEFAULT_RULES = frozenset({'identical'})
+
+# Stages the identical rule skips. The reference is still compiled, since
+# whether it builds is not implied by the comparison.
+IDENTICAL_SKIPS = ('functions', 'diff', 'cfg', 'io', 'alive2')
+
+def stage_order(stages=STAGES):
+    # Cheapest first, with every stage after its dependencies. Only used to
+    # order reports; it does not drive execution.
+    order = []
+    done = set()
+    remaining = sorted(stages, key=lambda s: (stages[s]['cost'], s))
+    while remaining:
+        for stage in remaining:
+            if all(dep in done for dep in stages[stage]['deps']):
+                order.append(stage)
+                done.add(stage)
+                remaining.remove(stage)
+                break
+        else:
+            raise ValueError(f"Stage dependencies form a cycle: {remaining}")
+    return order
+
+def check_rules(rules):
+    unknown = set(rules) - set(SHORT_CIRCUIT_RULES)
+    if unknown:
+        raise ValueError(f"Unknown short-circuit rules: {sorted(unknown)}")
+    return frozenset(rules)
+
+class StagePlan:
+
+    def __init__(self, skipped=None):
+        self.skipped = dict(skipped or {})
+
+    def skip(self, stage, reason):
+        if stage in self.skipped:
+            return
+        self.skipped[stage] = reason
+        for other, spec in STAGES.items():
+            if stage in spec['deps']:
+                self.skip(other, reason)
+
+    def runs(self, stage):
+        return stage not in self.skipped
+
+    def reason(self, stage):
+        return self.skipped.get(stage)
+
+def skip_all(reason):
+    return {stage: reason for stage in STAGES}
+
+def record_stage_counts(stage_stats, skipped_stages):
+    if stage_stats is None:
+        return
+    for stage in STAGES:
+        stats = stage_stats.setdefault(stage, {'executed': 0, 'skipped': 0, 'reasons': {}})
+        reason = skipped_stages.get(stage)
+        if reason is None:
+            stats['executed'] += 1
+        else:
+            stats['skipped'] += 1
+            stats['reasons'][reason] = stats['reasons'].get(reason, 0) + 1
@@ -0,0 +1,165 @@
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from llvm_tools import ir_inputs, run_tool
+
+CORRECT = 'correct'
+INCORRECT = 'incorrect'
+UNDECIDED = 'undecided'
+ERROR = 'error'
+
+FIRST_PASS_TIMEOUT = 30
+ESCALATION_TIMEOUT = 600
+
+@lru_cache(maxsize=None)
+def alive2_version(alive_tv_path='alive-tv'):
+    try:
+        result = run_tool([alive_tv_path, '--version'], timeout=60, stage='probe')
+    except Exception:
+        return "unknown"
+    return (result.stdout or result.stderr).strip() or "unknown"
+
+def classify_alive2_output(stdout):
+    if "Transformation doesn't verify!" in stdout or re.search(r'^\s*[1-9]\d* incorrect transformations', stdout, re.MULTILINE):
+        return INCORRECT
+    if "ERROR: Timeout" in stdout or re.search(r'^\s*[1-9]\d* failed-to-prove', stdout, re.MULTILINE):
+        return UNDECIDED
+    if "Transformation seems to be correct!" in stdout:
+        return CORRECT
+    return ERROR
+
+def combined_status(statuses):
+    # A pair is incorrect when any function is, correct only when all are.
+    statuses = set(statuses)
+    for status in (INCORRECT, ERROR, UNDECIDED):
+        if status in statuses:
+            return status
+    return CORRECT if statuses else ERROR
+
+def run_alive_tv(source_ir, target_ir, function=None, timeout=FIRST_PASS_TIMEOUT, alive_tv_path='alive-tv'):
+    try:
+        with ir_inputs(source_ir, target_ir) as (paths, fds):
+            # The SMT solver gets the same budget as the process, so hard
+            # queries end as an Alive2 timeout rather than a killed process.
+            command = [alive_tv_path, f'--smt-to={timeout * 1000}'] + paths
+            if function is not None:
+                command.insert(1, f'--func={function}')
+
+            result = run_tool(command, timeout=timeout + 30, pass_fds=fds, stage='alive2')
+        return classify_alive2_output(result.stdout), result.stdout, result.stderr
+
+    except subprocess.TimeoutExpired:
+        return UNDECIDED, "Verification timed out.", f"Process terminated after {timeout} seconds."
+    except Exception as e:
+        return ERROR, "", f"An unexpected error occurred: {str(e)}"
+
+class _PairJob:
+    # Collects the per-function verdicts of one ref/tgt pair and resolves the
+    # pair's future once the last function is decided.
+
+    def __init__(self, functions):
+        self.future = Future()
+        self.outcomes = {}
+        self.seconds = {}
+        self.remaining = len(functions)
+        self.lock = threading.Lock()
+
+    def record(self, function, outcome, seconds=None):
+        with self.lock:
+            self.outcomes[function] = outcome
+            if seconds is not None:
+                self.seconds[function] = seconds
+            self.remaining -= 1
+            done = self.remaining == 0
+        if done:
+            self.future.set_result(self.combine())
+
+    def combine(self):
+        status = combined_status(status for status, _, _ in self.outcomes.values())
+
+        stdout = []
+        stderr = []
+        for function in sorted(self.outcomes, key=lambda f: f or ""):
+            verdict, out, err = self.outcomes[function]
+            header = f"; function {function}: {verdict}\n" if function is not None else ""
+            stdout.append(header + out)
+            if err:
+                stderr.append(header + err)
+        # The slowest verified function bounds the pair's timeout; None when
+        # every function came from the cache.
+        seconds = max(self.seconds.values()) if self.seconds else None
+        return status == CORRECT, "".join(stdout), "".join(stderr), seconds, status
+
+class Alive2Scheduler:
+    # Verifies pairs function by function on a bounded pool of alive-tv
+    # processes. Each function first gets a short timeout; undecided ones
+    # are requeued on a smaller pool with the long timeout, so a few hard
+    # functions cannot hold up the rest of the run.
+
+    def __init__(self, max_workers=4, first_timeout=FIRST_PASS_TIMEOUT, escalation_timeout=ESCALATION_TIMEOUT,
+                 escalation_workers=None, alive_tv_path='alive-tv', cache=None):
+        self.first_timeout = first_timeout
+        self.escalation_timeout = escalation_timeout
+        self.alive_tv_path = alive_tv_path
+        self.cache = cache
+        self.version = alive2_version(alive_tv_path)
+        self.first_pass = ThreadPoolExecutor(max_workers=max_workers)
+        self.escalation = ThreadPoolExecutor(max_workers=escalation_workers or max(1, max_workers // 2))
+        self.stats = {'functions': 0, 'cached': 0, 'escalated': 0, CORRECT: 0, INCORRECT: 0, UNDECIDED: 0, ERROR: 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _cache_key(self, source_ir, target_ir, function):
+        return self.cache.key('alive2', source_ir, target_ir, self.version, function or "")
+
+    def submit(self, source_ir, target_ir, functions=None, escalation_timeout=None):
+        # functions=None verifies the whole module in one alive-tv call.
+        # escalation_timeout overrides the scheduler's for this pair.
+        escalation_timeout = escalation_timeout or self.escalation_timeout
+        functions = sorted(functions) if functions else [None]
+        job = _PairJob(functions)
+
+        for function in functions:
+            self._count('functions')
+            if self.cache is not None:
+                cached = self.cache.get('alive2', self._cache_key(source_ir, target_ir, function))
+                if cached is not None:
+                    self._count('cached')
+                    job.record(function, cached)
+                    continue
+            self.first_pass.submit(self._verify, job, source_ir, target_ir, function, False, escalation_timeout)
+
+        return job.future
+
+    def _verify(self, job, source_ir, target_ir, function, escalated, escalation_timeout):
+        timeout = escalation_timeout if escalated else self.first_timeout
+        start = time.perf_counter()
+        outcome = run_alive_tv(source_ir, target_ir, function, timeout=timeout, alive_tv_path=self.alive_tv_path)
+        seconds = time.perf_counter() - start
+
+        if outcome[0] == UNDECIDED and not escalated and escalation_timeout > self.first_timeout:
+            self._count('escalated')
+            self.escalation.submit(self._verify, job, source_ir, target_ir, function, True, escalation_timeout)
+            return
+
+        self._count(outcome[0])
+        # Only verdicts are cached: an undecided function may be decided
+        # by a later run with a longer timeout.
+        if self.cache is not None and outcome[0] in (CORRECT, INCORRECT):
+            try:
+                self.cache.put('alive2', self._cache_key(source_ir, target_ir, function), outcome)
+            except Exception:
+                pass
+        # Errors end early for reasons unrelated to solver time.
+        job.record(function, outcome, seconds if outcome[0] != ERROR else None)
+
+    def shutdown(self):
+        # First-pass jobs may still escalate, so that pool drains first.
+        self.first_pass.shutdown(wait=True)
+        self.escalation.shutdown(wait=True)
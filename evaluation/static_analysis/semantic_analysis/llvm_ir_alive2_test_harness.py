@@ -1,27 +1,11 @@
 import subprocess
-import os
-import tempfile
 import sys
+from llvm_tools import ir_inputs, run_tool
 
 def verify_with_alive2(source_ir, target_ir, timeout=600, alive_tv_path='alive-tv'):
-    tmp_source = None
-    tmp_target = None
-
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='_src.ll', delete=False) as f_src:
-            f_src.write(source_ir)
-            tmp_source = f_src.name
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix='_tgt.ll', delete=False) as f_tgt:
-            f_tgt.write(target_ir)
-            tmp_target = f_tgt.name
-
-        result = subprocess.run(
-            [alive_tv_path, tmp_source, tmp_target],
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
+        with ir_inputs(source_ir, target_ir) as (paths, fds):
+            result = run_tool([alive_tv_path] + paths, timeout=timeout, pass_fds=fds, stage='alive2')
 
         stdout = result.stdout
         stderr = result.stderr
@@ -35,13 +19,6 @@ def verify_with_alive2(source_ir, target_ir, timeout=600, alive_tv_path='alive-t
         return False, "Verification timed out.", f"Process terminated after {timeout} seconds."
     except Exception as e:
         return False, "", f"An unexpected error occurred: {str(e)}"
-    finally:
-        for path in (tmp_source, tmp_target):
-            if path and os.path.exists(path):
-                try:
-                    os.unlink(path)
-                except:
-                    pass
 
 
 
@@ -0,0 +1,78 @@
+import llvmlite.binding as llvm
+from static_analysis.structural_analysis.llvm_ir_function_analysis import module_function_info, get_sig
+from static_analysis.structural_analysis.llvm_ir_cfg_comparison import module_cfgs
+
+class IRAnalysisContext:
+    # Everything the pair analyses derive from one canonical IR, computed once
+    # and shared by the function, CFG, diff and Alive2 stages.
+
+    def __init__(self, llvm_ir, cache=None):
+        self.llvm_ir = llvm_ir
+        self.cache = cache
+        self._module = None
+        self._functions = None
+        self._cfgs = None
+        self._cfg_error = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = llvm.parse_assembly(self.llvm_ir)
+        return self._module
+
+    @property
+    def functions(self):
+        if self._functions is None:
+            # The tag keeps entries without the declaration flag out.
+            key = self.cache.key('functions', self.llvm_ir, 'declarations') if self.cache else None
+            self._functions = self.cache.get('functions', key) if self.cache else None
+            if self._functions is None:
+                try:
+                    self._functions = module_function_info(self.module)
+                except Exception:
+                    # Not cached: a later run must not read a failed
+                    # extraction as a module without functions.
+                    self._functions = []
+                    return self._functions
+                if self.cache:
+                    self.cache.put('functions', key, self._functions)
+        return self._functions
+
+    @property
+    def signatures(self):
+        return set(get_sig(f) for f in self.functions)
+
+    @property
+    def cfgs(self):
+        if self._cfg_error is not None:
+            raise RuntimeError(self._cfg_error)
+        if self._cfgs is None:
+            # Graphs are keyed by function name since they are built from the
+            # module; the tag keeps entries from the DOT-based builder out.
+            key = self.cache.key('cfgs', self.llvm_ir, 'llvmlite') if self.cache else None
+            self._cfgs = self.cache.get('cfgs', key) if self.cache else None
+            if self._cfgs is None:
+                try:
+                    self._cfgs = module_cfgs(self.module)
+                except Exception as e:
+                    self._cfg_error = f"CFG generation failed: {str(e)}"
+                    raise RuntimeError(self._cfg_error)
+                if self.cache:
+                    self.cache.put('cfgs', key, self._cfgs)
+        return self._cfgs
+
+    def preload(self):
+        self.functions
+        try:
+            self.cfgs
+        except RuntimeError:
+            pass
+        return self
+
+    def __getstate__(self):
+        # llvmlite modules and cache connections cannot be pickled; the
+        # receiving process reparses only if it needs the module itself.
+        state = self.__dict__.copy()
+        state['_module'] = None
+        state['cache'] = None
+        return state
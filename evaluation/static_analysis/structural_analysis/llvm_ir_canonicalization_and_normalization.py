@@ -1,68 +1,84 @@
-import tempfile
 import subprocess
-import os
 import re
+from llvm_tools import run_tool
+from static_analysis.structural_analysis.llvm_ir_inprocess import (
+    InProcessUnsupported,
+    use_inprocess,
+    canonicalize_ir_inprocess,
+    verify_and_canonicalize_inprocess,
+)
+from static_analysis.structural_analysis.llvm_ir_verification import verify_ir
 
-def canonicalize_and_normalize_ir(llvm_ir):
-    tmp_file_path = None
-    tmp_output_path = None
+CANONICALIZATION_PASSES = [
+    'mem2reg',
+    'instcombine',
+    'dce',
+    'simplifycfg',
+    'gvn',
+    'loop-simplify',
+    'instcombine',
+    'simplifycfg',
+    'instsimplify'
+]
 
-    try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as tmp_file:
-            tmp_file.write(llvm_ir)
-            tmp_file_path = tmp_file.name
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as tmp_output:
-            tmp_output_path = tmp_output.name
+def normalize_module_header(llvm_ir):
+    llvm_ir = re.sub(r'^; ModuleID = .*$\n?', '', llvm_ir, flags=re.MULTILINE)
+    llvm_ir = re.sub(r'^source_filename = .*$\n?', '', llvm_ir, flags=re.MULTILINE)
+    llvm_ir = re.sub(r'^target datalayout = .*$\n?', '', llvm_ir, flags=re.MULTILINE)
+    llvm_ir = re.sub(r'^target triple = .*$\n?', '', llvm_ir, flags=re.MULTILINE)
+    return llvm_ir
 
-        passes = [
-            'mem2reg',
-            'instcombine',
-            'dce',
-            'simplifycfg',
-            'gvn',
-            'loop-simplify',
-            'instcombine',
-            'simplifycfg',
-            'instsimplify'
-        ]
+def canonicalize_and_normalize_ir(llvm_ir, engine='auto'):
+    if use_inprocess(engine):
+        try:
+            success, canonical_ir, error = canonicalize_ir_inprocess(llvm_ir)
+            return success, normalize_module_header(canonical_ir), error
+        except InProcessUnsupported:
+            pass
+        except Exception as e:
+            return False, "", f"Error during canonicalization: {str(e)}"
 
-        pass_pipeline = ','.join(passes)
+    try:
+        pass_pipeline = ','.join(CANONICALIZATION_PASSES)
 
-        result = subprocess.run(
-            ['opt', f'-passes={pass_pipeline}', '--strip-debug', '--strip-named-metadata', '-S', tmp_file_path, '-o', tmp_output_path],
-            capture_output=True,
-            text=True,
-            timeout=60
+        result = run_tool(
+            ['opt', f'-passes={pass_pipeline}', '--strip-debug', '--strip-named-metadata', '-S', '-', '-o', '-'],
+            input=llvm_ir,
+            timeout=60,
+            stage='canonicalize'
         )
 
         if result.returncode != 0:
             return False, "", result.stderr
 
-        if not os.path.exists(tmp_output_path):
-            return False, "", "opt completed but did not produce an output file."
-
-        with open(tmp_output_path) as f:
-            normalized_ir = f.read()
+        if not result.stdout:
+            return False, "", "opt completed but did not produce any output."
 
-        normalized_ir = re.sub(r'^; ModuleID = .*$\n?', '', normalized_ir, flags=re.MULTILINE)
-        normalized_ir = re.sub(r'^source_filename = .*$\n?', '', normalized_ir, flags=re.MULTILINE)
-        normalized_ir = re.sub(r'^target datalayout = .*$\n?', '', normalized_ir, flags=re.MULTILINE)
-        normalized_ir = re.sub(r'^target triple = .*$\n?', '', normalized_ir, flags=re.MULTILINE)
-
-        return True, normalized_ir, ""
+        return True, normalize_module_header(result.stdout), ""
 
     except subprocess.TimeoutExpired:
         return False, "", "Canonicalization timed out"
     except Exception as e:
         return False, "", f"Error during canonicalization: {str(e)}"
-    finally:
-        for path in (tmp_file_path, tmp_output_path):
-            if path and os.path.exists(path):
-                try:
-                    os.unlink(path)
-                except FileNotFoundError:
-                    pass
+
+def verify_and_canonicalize_ir(llvm_ir, engine='auto'):
+    # Returns (verified, verification_message, canonicalized, canonical_ir,
+    # canonicalization_error, engine_used).
+    if use_inprocess(engine):
+        try:
+            verified, message, success, canonical_ir, error = verify_and_canonicalize_inprocess(llvm_ir)
+            return verified, message, success, normalize_module_header(canonical_ir), error, 'llvmlite'
+        except InProcessUnsupported:
+            pass
+        except Exception as e:
+            return True, "IR verification passed", False, "", f"Error during canonicalization: {str(e)}", 'llvmlite'
+
+    verified, message = verify_ir(llvm_ir, engine='opt')
+    if not verified:
+        return verified, message, False, "", "VERIFY FAILED", 'opt'
+
+    success, canonical_ir, error = canonicalize_and_normalize_ir(llvm_ir, engine='opt')
+    return verified, message, success, canonical_ir, error, 'opt'
 
 
 if __name__ == "__main__":
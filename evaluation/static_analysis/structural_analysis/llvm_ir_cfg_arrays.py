@@ -0,0 +1,299 @@
+import numpy as np
+
+class CompactCFG:
+    # CSR adjacency over integer block ids 0..n-1. Only structure is kept;
+    # `nodes` maps ids back to the original graph's nodes.
+
+    def __init__(self, n, src, dst, nodes=None):
+        self.n = n
+        order = np.lexsort((dst, src))
+        self.src = np.asarray(src, dtype=np.int64)[order]
+        self.dst = np.asarray(dst, dtype=np.int64)[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.src, minlength=n), out=self.indptr[1:])
+        self.nodes = nodes if nodes is not None else list(range(n))
+        self._scc = None
+
+    @classmethod
+    def from_graph(cls, G):
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+        return cls(len(nodes), edges[:, 0], edges[:, 1], nodes=nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.src)
+
+    def successors(self, u):
+        return self.dst[self.indptr[u]:self.indptr[u + 1]]
+
+    def in_degrees(self):
+        return np.bincount(self.dst, minlength=self.n)
+
+    def out_degrees(self):
+        return np.diff(self.indptr)
+
+    def predecessors_csr(self):
+        order = np.argsort(self.dst, kind='stable')
+        indptr = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.dst, minlength=self.n), out=indptr[1:])
+        return indptr, self.src[order]
+
+    def degree_pairs(self):
+        # Sorted (in, out) degree sequence, a cheap isomorphism invariant.
+        pairs = np.stack([self.in_degrees(), self.out_degrees()], axis=1)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    def degree_histograms(self):
+        if self.n == 0:
+            return [], []
+        return np.bincount(self.in_degrees()).tolist(), np.bincount(self.out_degrees()).tolist()
+
+    def weak_component_count(self):
+        if self.n == 0:
+            return 0
+        # Min-label propagation over both edge directions with pointer jumping;
+        # at the fixpoint every component carries the id of its smallest node.
+        labels = np.arange(self.n)
+        while True:
+            updated = labels.copy()
+            np.minimum.at(updated, self.src, labels[self.dst])
+            np.minimum.at(updated, self.dst, labels[self.src])
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                return len(np.unique(labels))
+            labels = updated
+
+    def cyclomatic_complexity(self):
+        if self.n == 0:
+            return 0
+        return self.num_edges - self.n + 2 * self.weak_component_count()
+
+    def scc_labels(self):
+        # Iterative Tarjan. Components are numbered in the order they are
+        # completed, which is a reverse topological order of the condensation.
+        if self._scc is not None:
+            return self._scc
+
+        indptr = self.indptr.tolist()
+        dst = self.dst.tolist()
+        index = [-1] * self.n
+        low = [0] * self.n
+        on_stack = [False] * self.n
+        comp = [-1] * self.n
+        stack = []
+        counter = 0
+        num_comps = 0
+
+        for root in range(self.n):
+            if index[root] != -1:
+                continue
+            work = [(root, indptr[root])]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+
+            while work:
+                u, pos = work[-1]
+                if pos < indptr[u + 1]:
+                    work[-1] = (u, pos + 1)
+                    v = dst[pos]
+                    if index[v] == -1:
+                        index[v] = low[v] = counter
+                        counter += 1
+                        stack.append(v)
+                        on_stack[v] = True
+                        work.append((v, indptr[v]))
+                    elif on_stack[v]:
+                        low[u] = min(low[u], index[v])
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[u])
+                if low[u] == index[u]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        comp[w] = num_comps
+                        if w == u:
+                            break
+                    num_comps += 1
+
+        self._scc = (num_comps, np.array(comp, dtype=np.int64))
+        return self._scc
+
+    def loop_scc_count(self):
+        num_comps, comp = self.scc_labels()
+        if num_comps == 0:
+            return 0
+        cyclic = np.bincount(comp, minlength=num_comps) > 1
+        self_loops = self.src[self.src == self.dst]
+        cyclic[comp[self_loops]] = True
+        return int(cyclic.sum())
+
+    def condensation_features(self):
+        if self.n == 0:
+            return {"sccs": 0, "cond_nodes": 0, "cond_edges": 0, "cond_longest_path": 0}
+
+        num_comps, comp = self.scc_labels()
+        csrc = comp[self.src]
+        cdst = comp[self.dst]
+        between = csrc != cdst
+        cond_edges = np.unique(csrc[between] * num_comps + cdst[between])
+        csrc = cond_edges // num_comps
+        cdst = cond_edges % num_comps
+
+        # Bellman-Ford style relaxation on the DAG: one vectorized sweep per
+        # level, so the loop runs longest-path + 1 times.
+        dist = np.zeros(num_comps, dtype=np.int64)
+        while True:
+            updated = dist.copy()
+            np.maximum.at(updated, csrc, dist[cdst] + 1)
+            if np.array_equal(updated, dist):
+                break
+            dist = updated
+
+        return {
+            "sccs": num_comps,
+            "cond_nodes": num_comps,
+            "cond_edges": len(cond_edges),
+            "cond_longest_path": int(dist.max()) if num_comps else 0,
+        }
+
+    def immediate_dominators(self):
+        # Cooper-Harvey-Kennedy over a virtual super entry (id n) that points
+        # at every block without predecessors. Unreachable blocks get -1.
+        n = self.n
+        roots = np.flatnonzero(self.in_degrees() == 0).tolist()
+        indptr = self.indptr.tolist()
+        dst = self.dst.tolist()
+
+        def succ(u):
+            return roots if u == n else dst[indptr[u]:indptr[u + 1]]
+
+        order = []
+        seen = [False] * (n + 1)
+        seen[n] = True
+        work = [(n, iter(succ(n)))]
+        while work:
+            u, it = work[-1]
+            for v in it:
+                if not seen[v]:
+                    seen[v] = True
+                    work.append((v, iter(succ(v))))
+                    break
+            else:
+                work.pop()
+                order.append(u)
+        order.reverse()
+
+        rpo = [-1] * (n + 1)
+        for i, u in enumerate(order):
+            rpo[u] = i
+
+        preds = [[] for _ in range(n + 1)]
+        for u in order:
+            for v in succ(u):
+                preds[v].append(u)
+
+        idom = [-1] * (n + 1)
+        idom[n] = n
+        changed = True
+        while changed:
+            changed = False
+            for u in order[1:]:
+                new = -1
+                for p in preds[u]:
+                    if idom[p] == -1:
+                        continue
+                    if new == -1:
+                        new = p
+                        continue
+                    a, b = p, new
+                    while a != b:
+                        while rpo[a] > rpo[b]:
+                            a = idom[a]
+                        while rpo[b] > rpo[a]:
+                            b = idom[b]
+                    new = a
+                if idom[u] != new:
+                    idom[u] = new
+                    changed = True
+        return idom
+
+    def dominator_forest_code(self, table):
+        # AHU canonical form of the dominator tree without the super entry.
+        # `table` interns child-code tuples and must be shared by every graph
+        # whose codes are compared.
+        n = self.n
+        idom = self.immediate_dominators()
+        children = [[] for _ in range(n + 1)]
+        for u in range(n):
+            if idom[u] != -1:
+                children[idom[u]].append(u)
+
+        post = []
+        work = [n]
+        while work:
+            u = work.pop()
+            post.append(u)
+            work.extend(children[u])
+
+        code = [0] * (n + 1)
+        for u in reversed(post):
+            key = tuple(sorted(code[c] for c in children[u]))
+            code[u] = table.setdefault(key, len(table))
+        return tuple(sorted(code[c] for c in children[n]))
+
+def dominator_forests_isomorphic(c1, c2):
+    if c1.n == 0 or c2.n == 0:
+        return None
+    table = {}
+    return c1.dominator_forest_code(table) == c2.dominator_forest_code(table)
+
+def _wl_refine(compact, colors, table):
+    indptr = compact.indptr.tolist()
+    dst = compact.dst.tolist()
+    pred_indptr, pred_src = compact.predecessors_csr()
+    pred_indptr = pred_indptr.tolist()
+    pred_src = pred_src.tolist()
+
+    refined = []
+    for u in range(compact.n):
+        key = (
+            colors[u],
+            tuple(sorted(colors[v] for v in dst[indptr[u]:indptr[u + 1]])),
+            tuple(sorted(colors[v] for v in pred_src[pred_indptr[u]:pred_indptr[u + 1]])),
+        )
+        refined.append(table.setdefault(key, len(table)))
+    return refined
+
+def invariants_match(c1, c2):
+    return (c1.n == c2.n and c1.num_edges == c2.num_edges
+            and np.array_equal(c1.degree_pairs(), c2.degree_pairs()))
+
+def wl_equivalent(c1, c2):
+    # Weisfeiler-Lehman colour refinement over successors and predecessors,
+    # run on both graphs with one shared colour table. Differing colour
+    # histograms prove the graphs non-isomorphic; equal stable histograms
+    # only make isomorphism possible.
+    table = {}
+    colors1 = [table.setdefault(("deg", int(i), int(o)), len(table))
+               for i, o in zip(c1.in_degrees(), c1.out_degrees())]
+    colors2 = [table.setdefault(("deg", int(i), int(o)), len(table))
+               for i, o in zip(c2.in_degrees(), c2.out_degrees())]
+
+    classes = -1
+    while True:
+        if sorted(colors1) != sorted(colors2):
+            return False
+        refined_classes = len(set(colors1))
+        if refined_classes == classes:
+            return True
+        classes = refined_classes
+        colors1 = _wl_refine(c1, colors1, table)
+        colors2 = _wl_refine(c2, colors2, table)
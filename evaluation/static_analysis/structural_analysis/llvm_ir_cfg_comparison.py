@@ -1,10 +1,50 @@
+import time
 import tempfile
 import os
-import subprocess
 import shutil
 from pathlib import Path
+import llvmlite.binding as llvm
+from llvm_tools import run_tool
 import networkx as nx
+from networkx.algorithms.isomorphism import DiGraphMatcher
 import re
+from static_analysis.structural_analysis.llvm_ir_cfg_arrays import (
+    CompactCFG,
+    dominator_forests_isomorphic,
+    invariants_match,
+    wl_equivalent,
+)
+
+# Seconds VF2 may spend on one function pair before the answer is undecided.
+ISOMORPHISM_TIME_BUDGET = 10.0
+
+class IsomorphismTimeout(Exception):
+    pass
+
+class DeadlineDiGraphMatcher(DiGraphMatcher):
+
+    def __init__(self, G1, G2, deadline):
+        super().__init__(G1, G2)
+        self.deadline = deadline
+
+    def syntactic_feasibility(self, G1_node, G2_node):
+        if time.perf_counter() > self.deadline:
+            raise IsomorphismTimeout()
+        return super().syntactic_feasibility(G1_node, G2_node)
+
+def cfg_isomorphism(cfg1, cfg2, compact1, compact2, time_budget=ISOMORPHISM_TIME_BUDGET):
+    # Returns True/False, or None when VF2 ran out of time. Cheap invariants
+    # and Weisfeiler-Lehman refinement reject almost every non-isomorphic pair,
+    # so VF2 only runs on pairs that are very likely isomorphic.
+    if not invariants_match(compact1, compact2):
+        return False
+    if not wl_equivalent(compact1, compact2):
+        return False
+
+    try:
+        return DeadlineDiGraphMatcher(cfg1, cfg2, time.perf_counter() + time_budget).is_isomorphic()
+    except IsomorphismTimeout:
+        return None
 
 def _with_super_entry(G):
     super_entry = "__super_entry__"
@@ -124,20 +164,16 @@ def dominator_tree_isomorphic(cfg1, cfg2):
 
 def generate_cfg(llvm_ir):
     tmp_dir = None
-    tmp_file_path = None
 
     try:
         tmp_dir = tempfile.mkdtemp()
-        tmp_file_path = os.path.join(tmp_dir, "input.ll")
-
-        with open(tmp_file_path, 'w') as f:
-            f.write(llvm_ir)
 
-        subprocess.run([
+        # opt writes one .dot file per function into its working directory.
+        run_tool([
             'opt', '-disable-output',
             '-passes=dot-cfg',
-            tmp_file_path
-        ], check=True, cwd=tmp_dir)
+            '-'
+        ], input=llvm_ir, check=True, cwd=tmp_dir, stage='cfg')
 
         dot_files = list(Path(tmp_dir).glob('*.dot'))
 
@@ -227,21 +263,44 @@ def print_graph_info(G):
 
     print(f"{'='*60}\n")
 
-def compute_cfg_similarity_score(cfg1, cfg2, dominator_tree_match=None):
-    n1, e1 = cfg1.number_of_nodes(), cfg1.number_of_edges()
-    n2, e2 = cfg2.number_of_nodes(), cfg2.number_of_edges()
+def cfg_features(compact):
+    in_hist, out_hist = compact.degree_histograms()
+    return {
+        "nodes": compact.n,
+        "edges": compact.num_edges,
+        "cc": compact.cyclomatic_complexity(),
+        "loops": compact.loop_scc_count(),
+        "in_hist": in_hist,
+        "out_hist": out_hist,
+        "cond": compact.condensation_features(),
+    }
 
-    cc1 = cyclomatic_complexity(cfg1)
-    cc2 = cyclomatic_complexity(cfg2)
+def networkx_cfg_features(G):
+    in_hist, out_hist = degree_histogram(G)
+    return {
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "cc": cyclomatic_complexity(G),
+        "loops": loop_scc_count(G),
+        "in_hist": in_hist,
+        "out_hist": out_hist,
+        "cond": condensation_features(G),
+    }
 
-    loop1 = loop_scc_count(cfg1)
-    loop2 = loop_scc_count(cfg2)
+def compute_cfg_similarity_score(cfg1, cfg2, dominator_tree_match=None):
+    features1 = cfg_features(CompactCFG.from_graph(cfg1))
+    features2 = cfg_features(CompactCFG.from_graph(cfg2))
+    return similarity_from_features(features1, features2, dominator_tree_match)
 
-    in1, out1 = degree_histogram(cfg1)
-    in2, out2 = degree_histogram(cfg2)
+def similarity_from_features(features1, features2, dominator_tree_match=None):
+    n1, e1 = features1["nodes"], features1["edges"]
+    n2, e2 = features2["nodes"], features2["edges"]
 
-    cond1 = condensation_features(cfg1)
-    cond2 = condensation_features(cfg2)
+    cc1, cc2 = features1["cc"], features2["cc"]
+    loop1, loop2 = features1["loops"], features2["loops"]
+    in1, out1 = features1["in_hist"], features1["out_hist"]
+    in2, out2 = features2["in_hist"], features2["out_hist"]
+    cond1, cond2 = features1["cond"], features2["cond"]
 
     sim_nodes = norm_sim(n1, n2)
     sim_edges = norm_sim(e1, e2)
@@ -304,19 +363,29 @@ def compute_cfg_similarity_score(cfg1, cfg2, dominator_tree_match=None):
     score = float(max(0.0, min(1.0, score)))
     return {"score": score, "breakdown": breakdown}
 
-def compare_cfgs(cfg1, cfg2):
+def compare_cfgs(cfg1, cfg2, time_budget=ISOMORPHISM_TIME_BUDGET):
 
-    is_isomorphic = nx.is_isomorphic(cfg1, cfg2)
+    # Every structural feature below comes from the array form, built once
+    # per graph.
+    compact1 = CompactCFG.from_graph(cfg1)
+    compact2 = CompactCFG.from_graph(cfg2)
 
-    complexity1 = cyclomatic_complexity(cfg1)
-    complexity2 = cyclomatic_complexity(cfg2)
+    is_isomorphic = cfg_isomorphism(cfg1, cfg2, compact1, compact2, time_budget=time_budget)
+    features1 = cfg_features(compact1)
+    features2 = cfg_features(compact2)
 
-    loops1 = loop_scc_count(cfg1)
-    loops2 = loop_scc_count(cfg2)
+    complexity1 = features1["cc"]
+    complexity2 = features2["cc"]
 
-    dom_match = dominator_tree_isomorphic(cfg1, cfg2)
+    loops1 = features1["loops"]
+    loops2 = features2["loops"]
 
-    sim = compute_cfg_similarity_score(cfg1, cfg2, dominator_tree_match=dom_match)
+    try:
+        dom_match = dominator_forests_isomorphic(compact1, compact2)
+    except Exception:
+        dom_match = None
+
+    sim = similarity_from_features(features1, features2, dominator_tree_match=dom_match)
 
     result = {
         'is_isomorphic': is_isomorphic,
@@ -334,7 +403,7 @@ def compare_cfgs(cfg1, cfg2):
         'similarity_score': sim["score"],
         'similarity_breakdown': sim["breakdown"],
         'definitive_match': (
-            is_isomorphic 
+            is_isomorphic is True
             and complexity1 == complexity2 
             and loops1 == loops2 
             and (dom_match if dom_match is not None else True)
@@ -364,39 +433,66 @@ def print_comparison_results(result):
     print(f"\n  DEFINITIVE MATCH: {result['definitive_match']}")
     print(f"{'='*60}\n")
 
-def compare_llvm_ir_cfgs(llvm_ir1, llvm_ir2):
-    tmp_dir1 = None
-    tmp_dir2 = None
+# Branch targets in a terminator's text, named or numbered, possibly quoted.
+_LABEL = re.compile(r'label %("(?:[^"\\]|\\.)*"|[-\w.$]+)')
+
+def _block_label(block):
+    # llvmlite hands out a fresh wrapper per access, so blocks are matched by
+    # label. An unnamed block's number is only in its printed header line;
+    # the unnamed entry block has none, but it is never a branch target.
+    if block.name:
+        return block.name
+    header = str(block).lstrip('\n').split('\n', 1)[0]
+    if header and not header[0].isspace():
+        return header.split(':', 1)[0]
+    return None
+
+def function_cfg(function):
+    G = nx.DiGraph()
 
-    try:
-        cfg_data1, tmp_dir1 = generate_cfg(llvm_ir1)
-        cfg_data2, tmp_dir2 = generate_cfg(llvm_ir2)
-
-        graphs1 = {name: parse_dot_to_graph(dot) for name, dot in cfg_data1.items()}
-        graphs2 = {name: parse_dot_to_graph(dot) for name, dot in cfg_data2.items()}
-
-        common_functions = set(graphs1.keys()) & set(graphs2.keys())
-
-        comparison_results = {}
-        for func_name in common_functions:
-            comparison_results[func_name] = compare_cfgs(graphs1[func_name], graphs2[func_name])
-
-        scores = [r.get("similarity_score") for r in comparison_results.values() if "similarity_score" in r]
-        avg_score = (sum(scores) / len(scores)) if scores else None
-
-        return {
-            'comparisons': comparison_results,
-            'only_in_ir1': list(set(graphs1.keys()) - set(graphs2.keys())),
-            'only_in_ir2': list(set(graphs2.keys()) - set(graphs1.keys())),
-            'all_match': all(r['definitive_match'] for r in comparison_results.values()) if comparison_results else False,
-            'all_similarity_avg': avg_score,
-        }
-
-    finally:
-        if tmp_dir1 and os.path.exists(tmp_dir1):
-            shutil.rmtree(tmp_dir1)
-        if tmp_dir2 and os.path.exists(tmp_dir2):
-            shutil.rmtree(tmp_dir2)
+    blocks = list(function.blocks)
+    index = {}
+    for i, block in enumerate(blocks):
+        index[_block_label(block)] = i
+        G.add_node(i, block_name=block.name or str(i))
+
+    for i, block in enumerate(blocks):
+        terminator = None
+        for terminator in block.instructions:
+            pass
+        if terminator is None:
+            continue
+        for label in _LABEL.findall(str(terminator)):
+            G.add_edge(i, index[label.strip('"')])
+
+    return G
+
+def module_cfgs(module):
+    return {f.name: function_cfg(f) for f in module.functions if not f.is_declaration}
+
+def function_cfgs(llvm_ir):
+    return module_cfgs(llvm.parse_assembly(llvm_ir))
+
+def compare_function_cfgs(graphs1, graphs2, time_budget=ISOMORPHISM_TIME_BUDGET):
+    common_functions = set(graphs1.keys()) & set(graphs2.keys())
+
+    comparison_results = {}
+    for func_name in common_functions:
+        comparison_results[func_name] = compare_cfgs(graphs1[func_name], graphs2[func_name], time_budget=time_budget)
+
+    scores = [r.get("similarity_score") for r in comparison_results.values() if "similarity_score" in r]
+    avg_score = (sum(scores) / len(scores)) if scores else None
+
+    return {
+        'comparisons': comparison_results,
+        'only_in_ir1': list(set(graphs1.keys()) - set(graphs2.keys())),
+        'only_in_ir2': list(set(graphs2.keys()) - set(graphs1.keys())),
+        'all_match': all(r['definitive_match'] for r in comparison_results.values()) if comparison_results else False,
+        'all_similarity_avg': avg_score,
+    }
+
+def compare_llvm_ir_cfgs(llvm_ir1, llvm_ir2):
+    return compare_function_cfgs(function_cfgs(llvm_ir1), function_cfgs(llvm_ir2))
 
 if __name__ == "__main__":
     test_ir = """
@@ -1,27 +1,11 @@
 import sys
 import subprocess
-import tempfile
-import os
+from llvm_tools import ir_inputs, run_tool
 
 def diff_llvm_ir(ir1, ir2):
-    tmp_file1 = None
-    tmp_file2 = None
-
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as f1:
-            f1.write(ir1)
-            tmp_file1 = f1.name
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as f2:
-            f2.write(ir2)
-            tmp_file2 = f2.name
-
-        result = subprocess.run(
-            ['llvm-diff', tmp_file1, tmp_file2],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        with ir_inputs(ir1, ir2) as (paths, fds):
+            result = run_tool(['llvm-diff'] + paths, timeout=60, pass_fds=fds, stage='diff')
 
         is_identical = not result.stdout.strip()
 
@@ -31,13 +15,6 @@ def diff_llvm_ir(ir1, ir2):
         return False, "", "llvm-diff timed out"
     except Exception as e:
         return False, "", f"Error during diff: {str(e)}"
-    finally:
-        for path in (tmp_file1, tmp_file2):
-            if path and os.path.exists(path):
-                try:
-                    os.unlink(path)
-                except:
-                    pass
 
 if __name__ == "__main__":
     # Example: Two different LLVM IR snippets
@@ -12,40 +12,45 @@ def normalize_type(type_str):
     # %struct._IO_FILE.0* -> %struct._IO_FILE*
     return re.sub(r'(%struct\.[a-zA-Z_][a-zA-Z0-9_]*)\.\d+', r'\1', type_str)
 
-def extract_function_info(ir_code):
+def module_function_info(module):
     functions = []
-    try:
-        module = llvm.parse_assembly(ir_code)
-        for func in module.functions:
-            func_type = func.global_value_type
-            type_elements = list(func_type.elements)
-
-            return_type = str(type_elements[0]) if type_elements else "void"
-            arguments = [str(arg_type) for arg_type in type_elements[1:]] if len(type_elements) > 1 else []
-
-            return_type = normalize_type(return_type)
-            arguments = [normalize_type(arg) for arg in arguments]
-
-            function_info = {
-                "name": func.name,
-                "return_type": return_type,
-                "arguments": arguments
-            }
-            functions.append(function_info)
-    except Exception:
-        pass
+    for func in module.functions:
+        func_type = func.global_value_type
+        type_elements = list(func_type.elements)
+
+        return_type = str(type_elements[0]) if type_elements else "void"
+        arguments = [str(arg_type) for arg_type in type_elements[1:]] if len(type_elements) > 1 else []
+
+        return_type = normalize_type(return_type)
+        arguments = [normalize_type(arg) for arg in arguments]
+
+        function_info = {
+            "name": func.name,
+            "return_type": return_type,
+            "arguments": arguments,
+            "declaration": func.is_declaration
+        }
+        functions.append(function_info)
     return functions
 
-def functions_count(ir1, ir2, debug=False):
+def extract_function_info(ir_code):
     try:
-        funcs1 = extract_function_info(ir1)
-        funcs2 = extract_function_info(ir2)
+        return module_function_info(llvm.parse_assembly(ir_code))
+    except Exception:
+        return []
 
-        count_match = len(funcs1) == len(funcs2)
+def get_sig(f):
+    args = ", ".join(f["arguments"])
+    return f"{f['return_type']} {f['name']}({args})"
+
+def defined_signatures(funcs):
+    # Declarations differ whenever one side calls an intrinsic the other
+    # spells out, so they say nothing about whether the definitions agree.
+    return set(get_sig(f) for f in funcs if not f.get("declaration", False))
 
-        def get_sig(f):
-            args = ", ".join(f["arguments"])
-            return f"{f['return_type']} {f['name']}({args})"
+def compare_function_info(funcs1, funcs2, debug=False):
+    try:
+        count_match = len(funcs1) == len(funcs2)
 
         sigs1 = set(get_sig(f) for f in funcs1)
         sigs2 = set(get_sig(f) for f in funcs2)
@@ -97,6 +102,9 @@ def functions_count(ir1, ir2, debug=False):
             "error": str(e)
         }
 
+def functions_count(ir1, ir2, debug=False):
+    return compare_function_info(extract_function_info(ir1), extract_function_info(ir2), debug=debug)
+
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,107 @@
+import re
+from functools import lru_cache
+import llvmlite.binding as llvm
+from llvm_tools import run_tool
+
+try:
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+except Exception:
+    pass
+
+# llvmlite's new pass manager does not expose mem2reg, gvn or instsimplify.
+# sroa promotes the same allocas as mem2reg, newgvn stands in for gvn and the
+# trailing instcombine already covers instsimplify's folds.
+CANONICALIZATION_PASSES = [
+    'add_sroa_pass',
+    'add_instruction_combine_pass',
+    'add_dead_code_elimination_pass',
+    'add_simplify_cfg_pass',
+    'add_new_gvn_pass',
+    'add_loop_simplify_pass',
+    'add_instruction_combine_pass',
+    'add_simplify_cfg_pass',
+]
+
+ENGINES = ('auto', 'llvmlite', 'opt')
+
+_DEBUG_INFO_PATTERN = re.compile(r'!dbg\b|@llvm\.dbg\.|#dbg_|!DI[A-Z]')
+_NAMED_METADATA_PATTERN = re.compile(r'^![A-Za-z._$][\w.$-]* = !\{.*\}[ \t]*$\n?', re.MULTILINE)
+
+class InProcessUnsupported(Exception):
+    pass
+
+@lru_cache(maxsize=None)
+def opt_version(opt_path='opt'):
+    try:
+        result = run_tool([opt_path, '--version'], timeout=60, stage='probe')
+    except Exception:
+        return None
+    return result.stdout.strip()
+
+def opt_major_version(opt_path='opt'):
+    match = re.search(r'LLVM version (\d+)', opt_version(opt_path) or "")
+    return int(match.group(1)) if match else None
+
+def inprocess_supported():
+    # The printed IR is handed to llvm-diff, alive-tv and clang, which only
+    # read IR of their own LLVM version, so the bindings must match opt.
+    return opt_major_version() == llvm.llvm_version_info[0]
+
+def use_inprocess(engine):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown IR engine: {engine}")
+    if engine == 'opt':
+        return False
+    return engine == 'llvmlite' or inprocess_supported()
+
+def parse_ir(llvm_ir):
+    # llvmlite cannot strip debug info, so leave those modules to opt.
+    if _DEBUG_INFO_PATTERN.search(llvm_ir):
+        raise InProcessUnsupported("Module contains debug info")
+
+    # Named metadata is never referenced by instructions; dropping it before
+    # parsing is equivalent to --strip-named-metadata, and nodes it alone
+    # referenced are not printed.
+    try:
+        return llvm.parse_assembly(_NAMED_METADATA_PATTERN.sub('', llvm_ir))
+    except RuntimeError as e:
+        # Parse failures may come from syntax the bindings do not accept,
+        # so opt gets the final say on whether the IR is valid.
+        raise InProcessUnsupported(str(e))
+
+def verify_module(module):
+    try:
+        module.verify()
+        return True, "IR verification passed"
+    except RuntimeError as e:
+        return False, str(e)
+
+def run_canonicalization_passes(module):
+    target_machine = llvm.Target.from_default_triple().create_target_machine()
+    pass_builder = llvm.create_pass_builder(target_machine, llvm.create_pipeline_tuning_options())
+
+    pass_manager = llvm.create_new_module_pass_manager()
+    for add_pass in CANONICALIZATION_PASSES:
+        getattr(pass_manager, add_pass)()
+
+    pass_manager.run(module, pass_builder)
+    return str(module)
+
+def verify_ir_inprocess(llvm_ir):
+    return verify_module(parse_ir(llvm_ir))
+
+def canonicalize_ir_inprocess(llvm_ir):
+    module = parse_ir(llvm_ir)
+    verified, message = verify_module(module)
+    if not verified:
+        return False, "", message
+    return True, run_canonicalization_passes(module), ""
+
+def verify_and_canonicalize_inprocess(llvm_ir):
+    # One parse serves both the verifier and the pass pipeline.
+    module = parse_ir(llvm_ir)
+    verified, message = verify_module(module)
+    if not verified:
+        return verified, message, False, "", "VERIFY FAILED"
+    return verified, message, True, run_canonicalization_passes(module), ""
@@ -1,20 +1,17 @@
-import tempfile
 import subprocess
-import os
+from llvm_tools import run_tool
+from static_analysis.structural_analysis.llvm_ir_inprocess import InProcessUnsupported, use_inprocess, verify_ir_inprocess
 
-def verify_ir(llvm_ir):
+def verify_ir(llvm_ir, engine='auto'):
 
-    try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as tmp_file:
-            tmp_file.write(llvm_ir)
-            tmp_file_path = tmp_file.name
-
-        result = subprocess.run(['opt', '-passes=verify', '-S', tmp_file_path, '-o', '/dev/null'],
-                            capture_output=True,
-                            text=True,
-                            timeout=60)
+    if use_inprocess(engine):
+        try:
+            return verify_ir_inprocess(llvm_ir)
+        except InProcessUnsupported:
+            pass
 
-        os.unlink(tmp_file_path)
+    try:
+        result = run_tool(['opt', '-passes=verify', '-S', '-', '-o', '/dev/null'], input=llvm_ir, timeout=60, stage='verify')
 
         if result.returncode == 0:
             return True, "IR verification passed"
@@ -22,12 +19,8 @@ def verify_ir(llvm_ir):
             return False, result.stderr
 
     except subprocess.TimeoutExpired:
-        if os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
         return False, "Verification timed out"
     except Exception as e:
-        if 'tmp_file_path' in locals() and os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
         return False, f"Error during verification: {str(e)}"
 
 if __name__ == "__main__":
@@ -2,9 +2,10 @@ import os
 import sys
 import pytest
 from unittest.mock import Mock, patch, MagicMock
-import subprocess
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'ir_processing'))
+# llvm_tools lives in evaluation/ and is copied next to these scripts in the worker image.
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
 
 from IR_extractor import generate_ir_output_command, generate_ir_for_source_file, generate_ir_for_function
 
@@ -60,7 +61,7 @@ class TestGenerateIrOutputCommand:
 
 class TestGenerateIrForSourceFile:
 
-    @patch('subprocess.run')
+    @patch('IR_extractor.run_tool')
     def test_successful_ir_generation(self, mock_run):
         mock_result = Mock()
         mock_result.stdout = "define i32 @main() { ... }"
@@ -74,16 +75,12 @@ class TestGenerateIrForSourceFile:
         result = generate_ir_for_source_file(source_path, compilation_command)
 
         assert result == mock_result
-        mock_run.assert_called_once_with(
-            compilation_command,
-            cwd=source_path,
-            shell=False,
-            capture_output=True,
-            text=True,
-            check=False
-        )
-
-    @patch('subprocess.run')
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0] == compilation_command
+        assert mock_run.call_args[1]['cwd'] == source_path
+        assert mock_run.call_args[1]['stage'] == 'ir_extract'
+
+    @patch('IR_extractor.run_tool')
     def test_ir_generation_with_error(self, mock_run):
 
         mock_result = Mock()
@@ -99,7 +96,7 @@ class TestGenerateIrForSourceFile:
 
         assert result == mock_result
 
-    @patch('subprocess.run')
+    @patch('IR_extractor.run_tool')
     @patch('builtins.print')
     def test_subprocess_exception_handling(self, mock_print, mock_run):
         mock_run.side_effect = Exception("Subprocess failed")
@@ -115,7 +112,7 @@ class TestGenerateIrForSourceFile:
 
 class TestGenerateIrForFunction:
 
-    @patch('subprocess.run')
+    @patch('IR_extractor.run_tool')
     def test_successful_function_extraction(self, mock_run):
 
         mock_result = Mock()
@@ -131,16 +128,12 @@ class TestGenerateIrForFunction:
 
         assert result == mock_result
         expected_command = ["llvm-extract", "-func=add", "--keep-const-init", "-S", "-", "-o", "-"]
-        mock_run.assert_called_once_with(
-            expected_command,
-            shell=False,
-            input=source_ir,
-            capture_output=True,
-            text=True,
-            check=False
-        )
-
-    @patch('subprocess.run')
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0] == expected_command
+        assert mock_run.call_args[1]['input'] == source_ir
+        assert mock_run.call_args[1]['stage'] == 'ir_extract'
+
+    @patch('IR_extractor.run_tool')
     def test_function_not_found_and_edge_cases(self, mock_run):
 
         mock_result = Mock()
@@ -159,7 +152,7 @@ class TestGenerateIrForFunction:
         result_empty = generate_ir_for_function(empty_ir, "main")
         assert result_empty == mock_result
 
-    @patch('subprocess.run')
+    @patch('IR_extractor.run_tool')
     @patch('builtins.print')
     def test_llvm_extract_exception_handling(self, mock_print, mock_run):
         mock_run.side_effect = Exception("llvm-extract failed")
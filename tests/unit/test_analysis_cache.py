@@ -0,0 +1,102 @@
+import os
+import sys
+import pytest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+import analysis_cache
+from analysis_cache import AnalysisCache, merge_cache_counters, transient_failure
+from static_analysis.structural_analysis import llvm_ir_analysis_context
+from static_analysis.structural_analysis.llvm_ir_analysis_context import IRAnalysisContext
+
+IR = "define void @f() {\n  ret void\n}\n"
+
+class TestAnalysisCache:
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+        yield cache
+        cache.close()
+
+    def test_roundtrip_and_counters(self, cache):
+
+        key = cache.key('canonicalize', "define void @f() {\n  ret void\n}\n", 'auto')
+        assert cache.get('canonicalize', key) is None
+
+        cache.put('canonicalize', key, (True, "IR verification passed", True, "canon", "", 'opt'))
+
+        assert cache.get('canonicalize', key) == (True, "IR verification passed", True, "canon", "", 'opt')
+        assert cache.drain_counters()['canonicalize'] == {'hits': 1, 'misses': 1}
+        assert cache.counters['canonicalize'] == {'hits': 0, 'misses': 0}
+
+    def test_persists_across_connections(self, tmp_path):
+
+        path = str(tmp_path / "cache.sqlite")
+        first = AnalysisCache(path)
+        first.put('functions', first.key('functions', "ir"), [{"name": "f"}])
+        first.close()
+
+        second = AnalysisCache(path)
+        assert second.get('functions', second.key('functions', "ir")) == [{"name": "f"}]
+        second.close()
+
+    def test_key_depends_on_toolchain(self, tmp_path):
+
+        path = str(tmp_path / "cache.sqlite")
+        with patch.object(analysis_cache, 'opt_version', return_value="LLVM version 14.0.6"):
+            key14 = AnalysisCache(path).key('cfgs', "ir")
+        with patch.object(analysis_cache, 'opt_version', return_value="LLVM version 15.0.7"):
+            key15 = AnalysisCache(path).key('cfgs', "ir")
+
+        assert key14 != key15
+
+    def test_least_recently_used_evicted_first(self, tmp_path):
+
+        cache = AnalysisCache(str(tmp_path / "cache.sqlite"), max_bytes=2500, evict_every=1000)
+        with patch.object(analysis_cache.time, 'time', side_effect=[1.0, 2.0, 3.0, 4.0]):
+            cache.put('cfgs', "a", "x" * 1000)
+            cache.put('cfgs', "b", "x" * 1000)
+            cache.get('cfgs', "a")
+            cache.put('cfgs', "c", "x" * 1000)
+
+        assert cache.evict() == 1
+        assert cache.get('cfgs', "b") is None
+        assert cache.get('cfgs', "a") is not None
+        assert cache.get('cfgs', "c") is not None
+        cache.close()
+
+    def test_context_reuses_cached_cfgs(self, cache):
+
+        with patch.object(llvm_ir_analysis_context, 'module_cfgs', return_value={"f": "graph"}) as mock_cfgs:
+            IRAnalysisContext(IR, cache=cache).preload()
+            assert IRAnalysisContext(IR, cache=cache).cfgs == {"f": "graph"}
+            mock_cfgs.assert_called_once()
+
+    def test_cfg_failures_not_cached(self, cache):
+
+        with patch.object(llvm_ir_analysis_context, 'module_cfgs', side_effect=OSError("opt not found")) as mock_cfgs:
+            IRAnalysisContext(IR, cache=cache).preload()
+            IRAnalysisContext(IR, cache=cache).preload()
+            assert mock_cfgs.call_count == 2
+
+    def test_function_extraction_failures_not_cached(self, cache):
+
+        with patch.object(llvm_ir_analysis_context, 'module_function_info', side_effect=RuntimeError("bad type")):
+            assert IRAnalysisContext(IR, cache=cache).functions == []
+
+        assert [f["name"] for f in IRAnalysisContext(IR, cache=cache).functions] == ["f"]
+
+class TestHelpers:
+
+    def test_merge_cache_counters(self):
+        total = {}
+        merge_cache_counters(total, {'cfgs': {'hits': 1, 'misses': 2}})
+        merge_cache_counters(total, {'cfgs': {'hits': 3, 'misses': 0}})
+        assert total == {'cfgs': {'hits': 4, 'misses': 2}}
+
+    def test_transient_failure(self):
+        assert transient_failure("IR verification passed", "Canonicalization timed out")
+        assert transient_failure("Error during verification: boom", "VERIFY FAILED")
+        assert not transient_failure("opt: error: expected top-level entity", "VERIFY FAILED")
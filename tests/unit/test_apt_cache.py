@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import pytest
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'package_builder'))
+
+import apt_cache
+from apt_cache import AptCache, closure_path, install_build_deps, parse_print_uris, publish_archives, seed_archives
+
+PRINT_URIS = (
+    "'http://deb.debian.org/debian/pool/main/z/zlib/zlib1g-dev_1.3.dfsg-3_amd64.deb' "
+    "zlib1g-dev_1%3a1.3.dfsg-3_amd64.deb 921 SHA256:abc\n"
+    "'http://deb.debian.org/debian/pool/main/m/make/make_4.4-1_amd64.deb' make_4.4-1_amd64.deb 12 SHA256:def\n"
+)
+
+def _deb(path, content):
+    path.write_bytes(content)
+    return {"uri": path.as_uri(), "file": path.name, "size": len(content),
+            "hash": "SHA256:" + hashlib.sha256(content).hexdigest()}
+
+class TestWorkerSide:
+
+    def test_parse_print_uris(self):
+
+        debs = parse_print_uris("Reading package lists...\n" + PRINT_URIS)
+
+        assert [deb["file"] for deb in debs] == ["zlib1g-dev_1%3a1.3.dfsg-3_amd64.deb", "make_4.4-1_amd64.deb"]
+        assert debs[1] == {"uri": "http://deb.debian.org/debian/pool/main/m/make/make_4.4-1_amd64.deb",
+                           "file": "make_4.4-1_amd64.deb", "size": 12, "hash": "SHA256:def"}
+
+    def test_seed_only_complete_cached_debs(self, tmp_path):
+
+        shared, archives = tmp_path / "shared", tmp_path / "archives"
+        shared.mkdir()
+        cached = _deb(shared / "a.deb", b"aaaa")
+        truncated = dict(_deb(shared / "b.deb", b"bb"), size=3)
+        missing = {"uri": "", "file": "c.deb", "size": 1, "hash": ""}
+
+        assert seed_archives(str(shared), [cached, truncated, missing], str(archives)) == 1
+        assert sorted(os.listdir(archives)) == ["a.deb", "partial"]
+
+    def test_publish_new_debs_only(self, tmp_path):
+
+        shared, archives = tmp_path / "shared", tmp_path / "archives"
+        shared.mkdir()
+        archives.mkdir()
+        (shared / "a.deb").write_bytes(b"old")
+        (archives / "a.deb").write_bytes(b"new")
+        (archives / "b.deb").write_bytes(b"b")
+        (archives / "lock").write_bytes(b"")
+
+        assert publish_archives(str(archives), str(shared)) == 1
+        assert (shared / "a.deb").read_bytes() == b"old"
+        assert (shared / "b.deb").read_bytes() == b"b"
+
+    def test_install_records_closure_and_uses_private_archives(self, tmp_path):
+
+        shared = tmp_path / "shared"
+        shared.mkdir()
+        calls = []
+
+        def fake_run(command, **kwargs):
+            calls.append(command)
+            return Mock(returncode=0, stdout=PRINT_URIS if "--print-uris" in command else "")
+
+        with patch.dict(os.environ, {"APT_SHARED_CACHE": str(shared)}), \
+                patch.object(apt_cache, 'PRIVATE_ARCHIVES', str(tmp_path / "private")), \
+                patch.object(apt_cache, 'run_command', side_effect=fake_run):
+            result = install_build_deps("zlib", str(tmp_path), 60)
+
+        assert result.returncode == 0
+        assert f"Dir::Cache::Archives={tmp_path / 'private'}/" in calls[1]
+        with open(closure_path(str(shared), "zlib")) as f:
+            assert [deb["file"] for deb in json.load(f)] == ["zlib1g-dev_1%3a1.3.dfsg-3_amd64.deb", "make_4.4-1_amd64.deb"]
+        assert not (tmp_path / "private").exists()
+
+    def test_install_without_shared_cache(self, tmp_path):
+
+        with patch.dict(os.environ, {}, clear=True), \
+                patch.object(apt_cache, 'run_command', return_value=Mock(returncode=0)) as run:
+            install_build_deps("zlib", str(tmp_path), 60)
+
+        assert run.call_args[0][0] == ["sudo", "apt-get", "build-dep", "zlib", "-y"]
+
+class TestAptCache:
+
+    @pytest.fixture
+    def counter(self, tmp_path):
+
+        return tmp_path / "updates"
+
+    @pytest.fixture
+    def cache(self, tmp_path, counter):
+
+        update = [sys.executable, "-c", f"open({str(counter)!r}, 'a').write('x')"]
+        return AptCache(str(tmp_path / "cache"), "debian-builder", update_command=update)
+
+    def test_single_flight_update(self, cache, counter):
+
+        threads = [threading.Thread(target=cache.refresh) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.read_text() == "x"
+        assert cache.fresh() and cache.updates == 1
+
+    def test_update_again_after_epoch(self, cache, counter):
+
+        cache.refresh()
+        cache.epoch_seconds = 0
+
+        assert cache.refresh()
+        assert counter.read_text() == "xx"
+
+    def test_background_refresh_runs_one_update_at_a_time(self, tmp_path):
+
+        started, release = threading.Event(), threading.Event()
+        cache = AptCache(str(tmp_path / "cache"), "debian-builder")
+
+        def update(*args, **kwargs):
+            started.set()
+            release.wait()
+            return Mock(returncode=0)
+
+        with patch.object(apt_cache.subprocess, 'run', side_effect=update) as run:
+            refresher = cache.refresh_in_background()
+            started.wait()
+            assert cache.refresh_in_background() is None
+            release.set()
+            refresher.join()
+
+        assert run.call_count == 1
+        assert cache.fresh() and cache.refresh_in_background() is None
+
+    def test_failed_update_leaves_lists_to_workers(self, tmp_path):
+
+        cache = AptCache(str(tmp_path / "cache"), "debian-builder", update_command=[sys.executable, "-c", "exit(1)"])
+
+        assert not cache.refresh()
+        assert cache.volumes() == [f"{cache.archives}:{apt_cache.CONTAINER_SHARED}"]
+        assert "APT_SHARED_LISTS" not in cache.environment()
+
+    def test_fresh_lists_mounted_read_only(self, cache):
+
+        cache.refresh()
+
+        assert f"{cache.snapshot()}:{apt_cache.CONTAINER_LISTS}:ro" in cache.volumes()
+        assert cache.environment()["APT_SHARED_LISTS"] == "1"
+
+    def test_refresh_swaps_in_a_new_snapshot(self, tmp_path):
+
+        update = [sys.executable, "-c", "import sys; open(sys.argv[1] + '/Packages', 'a').write('x')", "{lists}"]
+        cache = AptCache(str(tmp_path / "cache"), "debian-builder", update_command=update)
+        cache.refresh()
+        first = cache.snapshot()
+        mounted = cache.volumes()
+        cache.epoch_seconds = 0
+
+        assert cache.refresh()
+        assert cache.snapshot() != first
+        assert open(os.path.join(first, "Packages")).read() == "x"
+        assert open(os.path.join(cache.lists, "Packages")).read() == "xx"
+        assert cache.volumes() != mounted
+
+    def test_old_snapshots_pruned(self, cache):
+
+        for _ in range(4):
+            cache.epoch_seconds = 0
+            cache.refresh()
+
+        assert len(os.listdir(cache.snapshots)) == apt_cache.KEEP_SNAPSHOTS
+        assert os.path.basename(cache.snapshot()) == max(os.listdir(cache.snapshots), key=lambda name: int(name.split("-")[1]))
+
+    def test_failed_update_keeps_current_snapshot(self, cache):
+
+        cache.refresh()
+        current, snapshots = cache.snapshot(), sorted(os.listdir(cache.snapshots))
+        cache.epoch_seconds = 0
+        cache.update_command = [sys.executable, "-c", "exit(1)"]
+
+        assert not cache.refresh()
+        assert cache.snapshot() == current
+        assert sorted(os.listdir(cache.snapshots)) == snapshots
+
+    def test_plain_lists_directory_adopted(self, tmp_path):
+
+        lists = tmp_path / "cache" / "lists"
+        lists.mkdir(parents=True)
+        (lists / "Packages").write_text("old")
+
+        cache = AptCache(str(tmp_path / "cache"), "debian-builder")
+
+        assert os.path.islink(cache.lists)
+        assert open(os.path.join(cache.snapshot(), "Packages")).read() == "old"
+
+    def test_prefetch_recorded_closures(self, cache, tmp_path):
+
+        mirror = tmp_path / "mirror"
+        mirror.mkdir()
+        good = _deb(mirror / "good.deb", b"good")
+        corrupt = dict(_deb(mirror / "bad.deb", b"bad"), hash="SHA256:" + "0" * 64)
+        with open(closure_path(cache.archives, "zlib"), 'w') as f:
+            json.dump([good, corrupt], f)
+
+        cache.prefetch(["zlib", "never-built"])
+
+        assert sorted(name for name in os.listdir(cache.archives) if name.endswith(".deb")) == ["good.deb"]
+        assert cache.fetched == 1
+        assert not cache.fetch(good)
@@ -0,0 +1,167 @@
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+from concurrent.futures import Future
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+import benchmark
+import runner
+from benchmark import (
+    compare_to_baseline,
+    playground_pairs,
+    run_benchmark,
+    summarize,
+    synthetic_module,
+    synthetic_pairs,
+    timed_stages,
+)
+
+class TestCorpus:
+
+    def test_synthetic_pairs_deterministic(self):
+
+        assert synthetic_pairs(6, seed=3) == synthetic_pairs(6, seed=3)
+
+    def test_mutations(self):
+
+        identical, equivalent, changed = synthetic_pairs(3, functions=3, blocks=9)
+
+        assert identical['ref_ir'] == identical['tgt_ir']
+        assert equivalent['ref_ir'] != equivalent['tgt_ir']
+        assert changed['ref_ir'] != changed['tgt_ir']
+
+    def test_size_controls_blocks(self):
+
+        small = synthetic_module(2, 3, seed=0)
+        large = synthetic_module(2, 30, seed=0)
+
+        assert large.count("phi i32") == 10 * small.count("phi i32")
+        assert small.count("define i32 @f") == 2
+
+    @pytest.mark.skipif(shutil.which('opt') is None, reason="opt not available")
+    def test_synthetic_modules_verify(self):
+
+        for item in synthetic_pairs(3, functions=2, blocks=6):
+            for ir in (item['ref_ir'], item['tgt_ir']):
+                result = subprocess.run(['opt', '-passes=verify', '-disable-output', '-'],
+                                        input=ir, capture_output=True, text=True)
+                assert result.returncode == 0, result.stderr
+
+    def test_playground_pairs(self, tmp_path):
+
+        task = tmp_path / "task"
+        task.mkdir()
+        (task / "original.ll").write_text("ref")
+        (task / "modified_a.ll").write_text("a")
+        (task / "modified_b.ll").write_text("b")
+        (task / "source.c").write_text("int main() {}")
+
+        items = playground_pairs(str(tmp_path))
+
+        assert [item['id'] for item in items] == ["playground/task/modified_a.ll", "playground/task/modified_b.ll"]
+        assert all(item['ref_ir'] == "ref" for item in items)
+
+    def test_bundled_playground_found(self):
+
+        assert playground_pairs()
+
+class TestTiming:
+
+    def test_stage_functions_timed_and_restored(self):
+
+        original = runner.diff_llvm_ir
+        durations = {}
+
+        with timed_stages(durations):
+            assert runner.diff_llvm_ir is not original
+            assert runner.verify_with_alive2("a", "b") == (False, "", "alive2 stub")
+
+        assert runner.diff_llvm_ir is original
+        assert 'alive2' in durations
+
+    @pytest.mark.skipif(shutil.which('opt') is None, reason="opt not available")
+    def test_run_benchmark(self):
+
+        report = run_benchmark(synthetic_pairs(3, functions=2, blocks=6), ir_engine='opt')
+
+        assert report['samples'] == 3
+        assert report['samples_per_second'] > 0
+        for stage in ('verify', 'canonicalize', 'functions', 'diff', 'cfg', 'alive2', 'total'):
+            assert report['stages'][stage]['samples'] == 3
+        assert 'compile' not in report['stages']
+
+    @pytest.mark.skipif(shutil.which('opt') is None, reason="opt not available")
+    def test_real_alive2_runs_on_a_scheduler(self):
+
+        class FakeScheduler:
+            escalation_timeout = 600
+            instances = []
+
+            def __init__(self, **kwargs):
+                self.kwargs = kwargs
+                self.submitted = 0
+                self.closed = False
+                FakeScheduler.instances.append(self)
+
+            def submit(self, *args, **kwargs):
+                self.submitted += 1
+                future = Future()
+                future.set_result((True, "", "", 0.1, 'correct'))
+                return future
+
+            def shutdown(self):
+                self.closed = True
+
+        with patch.object(benchmark, 'Alive2Scheduler', FakeScheduler):
+            report = run_benchmark(synthetic_pairs(2, functions=2, blocks=6, mutations=('changed',)),
+                                   alive2='real', alive2_workers=2, ir_engine='opt')
+
+        scheduler, = FakeScheduler.instances
+        assert scheduler.kwargs['max_workers'] == 2
+        assert scheduler.submitted == 2 and scheduler.closed
+        assert report['stages']['alive2']['samples'] == 2
+
+class TestBaseline:
+
+    def report(self, p50, p95, rate=10.0):
+        return {'samples': 1, 'seconds': 1.0, 'samples_per_second': rate,
+                'stages': {'diff': {'samples': 1, 'p50': p50, 'p95': p95}}}
+
+    def test_percentiles(self):
+
+        report = summarize([{'diff': 0.01 * n} for n in range(1, 21)], 2.0)
+
+        assert report['samples_per_second'] == 10.0
+        assert report['stages']['diff']['p50'] == 0.1
+        assert report['stages']['diff']['p95'] == 0.19
+
+    def test_slower_stage_is_regression(self):
+
+        regressions = compare_to_baseline(self.report(0.05, 0.2), self.report(0.05, 0.1))
+
+        assert [metric for metric, _, _ in regressions] == ["diff.p95"]
+
+    def test_small_absolute_difference_ignored(self):
+
+        assert compare_to_baseline(self.report(0.0004, 0.0004), self.report(0.0001, 0.0001)) == []
+
+    def test_throughput_drop_is_regression(self):
+
+        regressions = compare_to_baseline(self.report(0.05, 0.1, rate=5.0), self.report(0.05, 0.1, rate=10.0))
+
+        assert regressions == [('samples_per_second', 10.0, 5.0)]
+
+class TestCommandLine:
+
+    def test_save_baseline_needs_a_path(self):
+
+        script = os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation', 'benchmark.py')
+        result = subprocess.run([sys.executable, script, '--save_baseline', '--samples', '0'],
+                                capture_output=True, text=True)
+
+        assert result.returncode == 2
+        assert "--save_baseline needs --baseline" in result.stderr
@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'package_builder'))
+
+from build_history import BuildHistory, package_version, run_command, timed_phase
+
+def _phase(name, wall, rss=None, returncode=0):
+    return {"phase": name, "wall_seconds": wall, "cpu_seconds": wall / 2, "max_rss_bytes": rss, "returncode": returncode}
+
+class TestTimedPhase:
+
+    def test_records_child_cpu_and_returncode(self):
+
+        phases = []
+        with timed_phase(phases, "build") as record:
+            record["returncode"] = subprocess.run(
+                [sys.executable, "-c", "sum(range(2000000))"]).returncode
+
+        assert phases[0]["phase"] == "build"
+        assert phases[0]["returncode"] == 0
+        assert phases[0]["cpu_seconds"] > 0
+
+    def test_peak_is_each_phases_own(self):
+
+        phases = []
+        with timed_phase(phases, "build"):
+            run_command([sys.executable, "-c", "b = bytearray(256 * 1024 * 1024)"], check=True)
+        with timed_phase(phases, "test"):
+            run_command(["true"])
+        with timed_phase(phases, "ir_processing"):
+            pass
+
+        build, test, ir_processing = (phase["max_rss_bytes"] for phase in phases)
+        assert build >= 256 * 1024 * 1024
+        assert 0 < test < build
+        assert ir_processing is None
+
+    def test_run_command_output_and_errors(self):
+
+        result = run_command([sys.executable, "-c", "import sys; print(sys.stdin.read().upper())"],
+                             input="ir", capture_output=True, text=True)
+
+        assert (result.returncode, result.stdout) == (0, "IR\n")
+        with pytest.raises(subprocess.CalledProcessError):
+            run_command(["false"], check=True)
+        with pytest.raises(subprocess.TimeoutExpired):
+            run_command(["sleep", "5"], timeout=0.1)
+
+    def test_recorded_when_phase_raises(self):
+
+        phases = []
+        with pytest.raises(RuntimeError):
+            with timed_phase(phases, "build_dep"):
+                raise RuntimeError("apt")
+
+        assert phases[0]["phase"] == "build_dep"
+        assert phases[0]["returncode"] is None
+
+class TestPackageVersion:
+
+    def test_first_changelog_entry(self, tmp_path):
+
+        (tmp_path / "debian").mkdir()
+        (tmp_path / "debian" / "changelog").write_text(
+            "zlib (1:1.3.dfsg-3) unstable; urgency=medium\n\n  * Upload.\n\n"
+            "zlib (1:1.2.13.dfsg-1) unstable; urgency=medium\n")
+
+        assert package_version(str(tmp_path)) == "1:1.3.dfsg-3"
+
+    def test_missing_changelog(self, tmp_path):
+
+        assert package_version(str(tmp_path)) == "unknown"
+
+class TestBuildHistory:
+
+    @pytest.fixture
+    def history(self, tmp_path):
+
+        history = BuildHistory(str(tmp_path / "history.sqlite"))
+        history.record_build("gcc", "14.2-1", 7000.0, 8, True,
+                             [_phase("build_dep", 300.0), _phase("build", 6000.0, 4 << 30)], work=10, started=1.0)
+        history.record_build("gcc", "14.2-2", 6500.0, 8, True, [_phase("build", 5900.0, 5 << 30)], work=12, started=2.0)
+        history.record_build("zlib", "1.3", 90.0, 2, False, [_phase("build", 80.0, 1 << 20, 2)], started=3.0)
+        return history
+
+    def test_durations_from_latest_build(self, history):
+
+        assert history.durations() == {
+            "gcc": {"seconds": 6500.0, "cores": 8, "work": 12},
+            "zlib": {"seconds": 90.0, "cores": 2, "work": 0},
+        }
+
+    def test_slowest_builds(self, history):
+
+        slowest = history.slowest(limit=2)
+
+        assert [(package, version) for package, version, *_ in slowest] == [("gcc", "14.2-1"), ("gcc", "14.2-2")]
+        assert slowest[0][4] == 3150.0 and slowest[0][5] == 4 << 30
+
+    def test_slowest_runs_of_a_phase(self, history):
+
+        slowest = history.slowest(phase="build")
+
+        assert [(package, wall) for package, _, _, wall, _, _ in slowest] == [("gcc", 6000.0), ("gcc", 5900.0), ("zlib", 80.0)]
+
+    def test_phase_totals(self, history):
+
+        totals = {phase: (runs, wall, rss) for phase, runs, wall, _, _, rss in history.phase_totals()}
+
+        assert totals["build"] == (3, 11980.0, 5 << 30)
+        assert totals["build_dep"] == (1, 300.0, None)
+
+    def test_package_builds_in_order(self, history):
+
+        builds = history.package_builds("gcc")
+
+        assert [build[1] for build in builds] == ["14.2-1", "14.2-2"]
+        assert [phase[0] for phase in builds[0][-1]] == ["build_dep", "build"]
+
+    def test_reopened_database_keeps_history(self, history):
+
+        assert len(BuildHistory(history.path).package_builds("zlib")) == 1
@@ -0,0 +1,130 @@
+import os
+import sys
+import pytest
+from unittest.mock import Mock, patch
+
+HELPER_SCRIPTS = os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts')
+# The worker image holds all of these side by side.
+WORKER_PATHS = [
+    os.path.join(HELPER_SCRIPTS, 'package_builder'),
+    os.path.join(HELPER_SCRIPTS, 'test_framework'),
+    os.path.join(HELPER_SCRIPTS, 'ir_processing'),
+    os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'),
+]
+sys.path[:0] = WORKER_PATHS
+
+import build_worker
+from build_worker import container_dirty, package_selections, restore_packages
+from worker_pool import LocalRuntime, WorkerPool
+
+class FakeDpkg:
+    # dpkg and apt-get over an in-memory package set. Packages in stuck
+    # survive a purge.
+
+    def __init__(self, installed, stuck=(), audit=""):
+        self.installed = set(installed)
+        self.stuck = set(stuck)
+        self.audit = audit
+        self.purged = []
+
+    def run(self, command, **kwargs):
+        if command[:2] == ["dpkg", "--get-selections"]:
+            return Mock(returncode=0, stdout="".join(f"{name}\t\t\tinstall\n" for name in sorted(self.installed)))
+        if command[:2] == ["dpkg", "--audit"]:
+            return Mock(returncode=0, stdout=self.audit)
+        if command[:3] == ["sudo", "apt-get", "purge"]:
+            names = [arg for arg in command[3:] if not arg.startswith("-")]
+            self.purged.append(names)
+            self.installed -= set(names) - self.stuck
+            return Mock(returncode=0, stdout="")
+        raise AssertionError(f"unexpected command {command}")
+
+@pytest.fixture
+def dpkg():
+
+    fake = FakeDpkg({"base-files", "python3"})
+    with patch.object(build_worker.subprocess, 'run', side_effect=fake.run):
+        yield fake
+
+class TestRestorePackages:
+
+    def test_build_deps_purged(self, dpkg):
+
+        baseline = package_selections()
+        dpkg.installed |= {"zlib1g-dev", "debhelper"}
+
+        assert restore_packages(baseline)
+        assert dpkg.purged == [["debhelper", "zlib1g-dev"]]
+        assert package_selections() == baseline
+
+    def test_clean_job_purges_nothing(self, dpkg):
+
+        assert restore_packages(package_selections())
+        assert dpkg.purged == []
+
+    def test_failed_purge_is_drift(self, dpkg):
+
+        baseline = package_selections()
+        dpkg.installed |= {"zlib1g-dev"}
+        dpkg.stuck = {"zlib1g-dev"}
+
+        assert not restore_packages(baseline)
+
+    def test_removed_package_is_drift(self, dpkg):
+
+        baseline = package_selections()
+        dpkg.installed.discard("python3")
+
+        assert not restore_packages(baseline)
+        assert dpkg.purged == []
+
+    def test_without_dpkg_nothing_to_restore(self):
+
+        with patch.object(build_worker.subprocess, 'run', side_effect=FileNotFoundError("dpkg")):
+            assert package_selections() is None
+            assert restore_packages(None)
+
+class TestContainerDirty:
+
+    def test_audit_findings_make_it_dirty(self):
+
+        with patch.object(build_worker.subprocess, 'run', side_effect=FakeDpkg((), audit="half-installed: foo\n").run):
+            assert container_dirty()
+
+    def test_clean_audit(self, dpkg):
+
+        assert not container_dirty()
+
+SERVING_WORKER = """
+import os, sys
+sys.path[:0] = {paths!r}
+from unittest.mock import patch
+import build_worker
+from test_build_worker import FakeDpkg
+
+dpkg = FakeDpkg({{"base-files"}}, stuck={{"stuck-dev"}})
+
+def run_job(package_dir, sub_dir):
+    name = os.path.basename(package_dir)
+    dpkg.installed |= {{name + "-dev"}}
+    return [name, os.getpid()], False
+
+with patch.object(build_worker.subprocess, 'run', side_effect=dpkg.run), \\
+        patch.object(build_worker, 'run_job', run_job):
+    build_worker.serve()
+"""
+
+class TestServe:
+
+    def test_worker_recycled_when_restore_fails(self, tmp_path):
+
+        worker = tmp_path / "worker.py"
+        worker.write_text(SERVING_WORKER.format(paths=WORKER_PATHS + [os.path.dirname(__file__)]))
+
+        with WorkerPool(LocalRuntime([sys.executable, str(worker)])) as pool:
+            first = pool.run("/pkgs/zlib", "/pkgs/zlib/src", "0,1")
+            second = pool.run("/pkgs/stuck", "/pkgs/stuck/src", "0,1")
+            third = pool.run("/pkgs/bash", "/pkgs/bash/src", "0,1")
+
+        assert first[1] == second[1] != third[1]
+        assert (pool.started, pool.recycled) == (2, 1)
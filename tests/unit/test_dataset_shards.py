@@ -0,0 +1,114 @@
+import os
+import sys
+import orjson
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from dataset_shards import build_index, dataset_shard, load_index, merge_results, merge_shard_summaries, shard_bounds
+from metrics_summary import MetricsAggregator, load_summary, summary_path
+from result_sink import open_result_sink
+from runner import load_dataset
+
+@pytest.fixture
+def dataset(tmp_path):
+    # Lines of very different sizes, as IR pairs are.
+    path = tmp_path / "ds.jsonl"
+    with open(path, 'wb') as f:
+        for i in range(20):
+            f.write(orjson.dumps({'n': i, 'ref_ir': "x" * (i * 37 % 500)}) + b"\n")
+    return str(path)
+
+class TestIndex:
+
+    def test_offsets_are_line_starts(self, dataset):
+
+        offsets = load_index(dataset)
+
+        with open(dataset, 'rb') as f:
+            data = f.read()
+        assert len(offsets) == 20
+        assert all(offset == 0 or data[offset - 1:offset] == b"\n" for offset in offsets)
+
+    def test_stale_index_rebuilt(self, dataset):
+
+        build_index(dataset)
+        with open(dataset, 'ab') as f:
+            f.write(orjson.dumps({'n': 20}) + b"\n")
+
+        assert len(load_index(dataset)) == 21
+
+    def test_last_line_without_newline(self, tmp_path):
+
+        path = tmp_path / "ds.jsonl"
+        path.write_bytes(b'{"n": 0}\n{"n": 1}')
+
+        assert list(load_index(str(path))) == [0, 9]
+
+class TestShards:
+
+    @pytest.mark.parametrize("num_shards", [1, 3, 7, 25])
+    def test_shards_partition_lines(self, dataset, num_shards):
+
+        shards = [dataset_shard(dataset, k, num_shards) for k in range(num_shards)]
+
+        lines = [n for first, count, _ in shards for n in range(first, first + count)]
+        assert lines == list(range(20))
+
+    def test_shards_balanced_by_bytes(self):
+
+        offsets = [0, 10, 20, 30, 1000]
+
+        assert shard_bounds(offsets, 1010, 0, 2) == (0, 4, 0)
+        assert shard_bounds(offsets, 1010, 1, 2) == (4, 1, 1000)
+
+    def test_invalid_shard(self, dataset):
+
+        with pytest.raises(ValueError):
+            dataset_shard(dataset, 3, 3)
+
+    def test_loader_reads_only_its_shard(self, dataset):
+
+        first, count, offset = dataset_shard(dataset, 1, 3)
+
+        items = [item for batch in load_dataset(dataset, 4, offset, count) for item in batch]
+
+        assert [item['n'] for item in items] == list(range(first, first + count))
+
+class TestMerge:
+
+    def write_shard(self, path, keys):
+        sink = open_result_sink(path)
+        aggregator = MetricsAggregator(summary_path(path))
+        for key in keys:
+            row = {'key': key, 'identical': int(key) % 2 == 0, 'skipped_stages': {}}
+            sink.write(row)
+            aggregator.add(row)
+        sink.close()
+        aggregator.close()
+        return path
+
+    def test_merge_is_deterministic(self, tmp_path):
+
+        first = self.write_shard(str(tmp_path / "s0.jsonl"), ["3", "1", "0", "2"])
+        second = self.write_shard(str(tmp_path / "s1.jsonl"), ["10", "4", "5"])
+
+        merge_results([second, first], str(tmp_path / "a.jsonl"))
+        merge_results([first, second], str(tmp_path / "b.jsonl"))
+
+        a = (tmp_path / "a.jsonl").read_bytes()
+        assert a == (tmp_path / "b.jsonl").read_bytes()
+        assert [orjson.loads(line)['key'] for line in a.splitlines()] == ["0", "1", "2", "3", "4", "5", "10"]
+
+    def test_merge_to_parquet_with_summaries(self, tmp_path):
+
+        first = self.write_shard(str(tmp_path / "s0.jsonl"), ["0", "1"])
+        second = self.write_shard(str(tmp_path / "s1.jsonl"), ["2"])
+        os.remove(summary_path(second))
+
+        summary = merge_shard_summaries([first, second], str(tmp_path / "merged"))
+        merge_results([first, second], str(tmp_path / "merged"))
+
+        assert summary['rates']['identical'] == {'passed': 2, 'total': 3}
+        assert load_summary(summary_path(str(tmp_path / "merged"))) == summary
+        assert open_result_sink(str(tmp_path / "merged")).existing_keys() == {"0", "1", "2"}
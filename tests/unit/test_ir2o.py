@@ -1,11 +1,11 @@
 import os
 import sys
 import pytest
-import tempfile
-import subprocess
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'ir_processing'))
+# llvm_tools lives in evaluation/ and is copied next to these scripts in the worker image.
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
 
 from ir2o import ir_to_o
 
@@ -23,17 +23,13 @@ class TestIr2o:
         output_file = "test.o"
         src_directory = "/tmp"
 
-        with patch('subprocess.run') as mock_run:
+        with patch('ir2o.run_tool') as mock_run:
             mock_run.return_value = MagicMock(returncode=0)
-            with patch('tempfile.NamedTemporaryFile') as mock_temp:
-                with patch('os.unlink') as mock_unlink:
-                    mock_temp.return_value.__enter__.return_value.name = "/tmp/temp.ll"
 
-                    result = ir_to_o(ir, compilation_command, output_file, src_directory)
+            result = ir_to_o(ir, compilation_command, output_file, src_directory)
 
-                    assert result.returncode == 0
-                    mock_run.assert_called_once()
-                    mock_unlink.assert_called_once_with("/tmp/temp.ll")
+            assert result.returncode == 0
+            mock_run.assert_called_once()
 
     def test_compilation_failure(self):
 
@@ -42,16 +38,12 @@ class TestIr2o:
         output_file = "test.o"
         src_directory = "/tmp"
 
-        with patch('subprocess.run') as mock_run:
+        with patch('ir2o.run_tool') as mock_run:
             mock_run.return_value = MagicMock(returncode=1)
-            with patch('tempfile.NamedTemporaryFile') as mock_temp:
-                with patch('os.unlink') as mock_unlink:
-                    mock_temp.return_value.__enter__.return_value.name = "/tmp/temp.ll"
 
-                    result = ir_to_o(ir, compilation_command, output_file, src_directory)
+            result = ir_to_o(ir, compilation_command, output_file, src_directory)
 
-                    assert result.returncode == 1
-                    mock_unlink.assert_called_once_with("/tmp/temp.ll")
+            assert result.returncode == 1
 
     def test_compilation_command_modification(self):
 
@@ -60,20 +52,16 @@ class TestIr2o:
         output_file = "test.o"
         src_directory = "/tmp"
 
-        with patch('subprocess.run') as mock_run:
+        with patch('ir2o.run_tool') as mock_run:
             mock_run.return_value = MagicMock(returncode=0)
-            with patch('tempfile.NamedTemporaryFile') as mock_temp:
-                with patch('os.unlink') as mock_unlink:
-                    temp_name = "/tmp/temp_123.ll"
-                    mock_temp.return_value.__enter__.return_value.name = temp_name
 
-                    ir_to_o(ir, compilation_command, output_file, src_directory)
+            ir_to_o(ir, compilation_command, output_file, src_directory)
 
-                    call_args = mock_run.call_args
-                    actual_command = call_args[0][0]
-                    assert actual_command[-1] == temp_name
-                    assert actual_command[:-1] == compilation_command[:-1]
-                    mock_unlink.assert_called_once_with(temp_name)
+            actual_command = mock_run.call_args[0][0]
+            assert actual_command[-1] != "original_file.ll"
+            assert actual_command[-1].endswith(".ll")
+            assert actual_command[:-1] == compilation_command[:-1]
+            assert compilation_command[-1] == "original_file.ll"
 
     def test_working_directory_used(self):
 
@@ -82,17 +70,13 @@ class TestIr2o:
         output_file = "test.o"
         src_directory = "/custom/directory"
 
-        with patch('subprocess.run') as mock_run:
+        with patch('ir2o.run_tool') as mock_run:
             mock_run.return_value = MagicMock(returncode=0)
-            with patch('tempfile.NamedTemporaryFile') as mock_temp:
-                with patch('os.unlink') as mock_unlink:
-                    mock_temp.return_value.__enter__.return_value.name = "/tmp/temp.ll"
 
-                    ir_to_o(ir, compilation_command, output_file, src_directory)
+            ir_to_o(ir, compilation_command, output_file, src_directory)
 
-                    call_args = mock_run.call_args
-                    assert call_args[1]['cwd'] == src_directory
-                    mock_unlink.assert_called_once_with("/tmp/temp.ll")
+            call_args = mock_run.call_args
+            assert call_args[1]['cwd'] == src_directory
 
     def test_temp_file_content_written(self):
 
@@ -100,20 +84,30 @@ class TestIr2o:
         compilation_command = ["clang", "-c", "-o", "test.o", "file.ll"]
         output_file = "test.o"
         src_directory = "/tmp"
+        seen = []
 
-        with patch('subprocess.run') as mock_run:
+        def fake_run(command, **kwargs):
+            with open(command[-1]) as f:
+                seen.append(f.read())
+            return MagicMock(returncode=0)
+
+        with patch('ir2o.run_tool', side_effect=fake_run):
+            ir_to_o(ir, compilation_command, output_file, src_directory)
+
+        assert seen == [ir]
+
+    def test_scratch_file_reused(self):
+
+        compilation_command = ["clang", "-c", "-o", "test.o", "file.ll"]
+
+        with patch('ir2o.run_tool') as mock_run:
             mock_run.return_value = MagicMock(returncode=0)
-            with patch('tempfile.NamedTemporaryFile', mock_open()) as mock_temp:
-                with patch('os.unlink') as mock_unlink:
-                    mock_file = MagicMock()
-                    mock_temp.return_value.__enter__.return_value = mock_file
-                    mock_file.name = "/tmp/temp.ll"
 
-                    ir_to_o(ir, compilation_command, output_file, src_directory)
+            ir_to_o("first", compilation_command, "test.o", "/tmp")
+            ir_to_o("second", compilation_command, "test.o", "/tmp")
 
-                    mock_file.write.assert_called_once_with(ir)
-                    mock_file.flush.assert_called_once()
-                    mock_unlink.assert_called_once_with("/tmp/temp.ll")
+            first, second = [c[0][0][-1] for c in mock_run.call_args_list]
+            assert first == second
 
     def test_complex_compilation_command(self):
 
@@ -132,19 +126,13 @@ class TestIr2o:
         output_file = "output.o"
         src_directory = "/build/dir"
 
-        with patch('subprocess.run') as mock_run:
+        with patch('ir2o.run_tool') as mock_run:
             mock_run.return_value = MagicMock(returncode=0)
-            with patch('tempfile.NamedTemporaryFile') as mock_temp:
-                with patch('os.unlink') as mock_unlink:
-                    temp_name = "/tmp/complex_temp.ll"
-                    mock_temp.return_value.__enter__.return_value.name = temp_name
 
-                    result = ir_to_o(ir, compilation_command, output_file, src_directory)
+            result = ir_to_o(ir, compilation_command, output_file, src_directory)
 
-                    call_args = mock_run.call_args
-                    actual_command = call_args[0][0]
+            actual_command = mock_run.call_args[0][0]
 
-                    assert actual_command[-1] == temp_name
-                    assert actual_command[:-1] == compilation_command[:-1]
-                    assert result.returncode == 0
-                    mock_unlink.assert_called_once_with(temp_name)
\ No newline at end of file
+            assert actual_command[-1].endswith(".ll")
+            assert actual_command[:-1] == compilation_command[:-1]
+            assert result.returncode == 0
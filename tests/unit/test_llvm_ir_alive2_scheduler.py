@@ -0,0 +1,138 @@
+import os
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from static_analysis.semantic_analysis import llvm_ir_alive2_scheduler
+from static_analysis.semantic_analysis.llvm_ir_alive2_scheduler import (
+    Alive2Scheduler,
+    classify_alive2_output,
+    run_alive_tv,
+    CORRECT,
+    INCORRECT,
+    UNDECIDED,
+    ERROR,
+)
+from analysis_cache import AnalysisCache
+
+SUMMARY = "Summary:\n  {} correct transformations\n  {} incorrect transformations\n  {} failed-to-prove transformations\n  0 Alive2 errors\n"
+
+class TestClassifyAlive2Output:
+
+    def test_correct(self):
+        assert classify_alive2_output("Transformation seems to be correct!\n\n" + SUMMARY.format(1, 0, 0)) == CORRECT
+
+    def test_incorrect(self):
+        assert classify_alive2_output("Transformation doesn't verify!\n\n" + SUMMARY.format(0, 1, 0)) == INCORRECT
+
+    def test_failed_to_prove_is_undecided(self):
+        assert classify_alive2_output("ERROR: Timeout\n\n" + SUMMARY.format(0, 0, 1)) == UNDECIDED
+
+    def test_unrecognised_output_is_error(self):
+        assert classify_alive2_output("") == ERROR
+
+class TestRunAliveTv:
+
+    def test_function_and_smt_timeout_passed(self):
+        with patch.object(llvm_ir_alive2_scheduler, 'run_tool') as mock_run:
+            mock_run.return_value = MagicMock(stdout="Transformation seems to be correct!\n", stderr="")
+
+            status, _, _ = run_alive_tv("src", "tgt", function="f", timeout=5)
+
+            command = mock_run.call_args[0][0]
+            assert status == CORRECT
+            assert command[:3] == ['alive-tv', '--func=f', '--smt-to=5000']
+
+class TestAlive2Scheduler:
+
+    @pytest.fixture
+    def scheduler_factory(self):
+        schedulers = []
+
+        def make(**kwargs):
+            with patch.object(llvm_ir_alive2_scheduler, 'alive2_version', return_value="alive2 test"):
+                scheduler = Alive2Scheduler(first_timeout=1, escalation_timeout=10, **kwargs)
+            schedulers.append(scheduler)
+            return scheduler
+
+        yield make
+        for scheduler in schedulers:
+            scheduler.shutdown()
+
+    def test_functions_verified_separately(self, scheduler_factory):
+
+        def fake_run(src, tgt, function=None, timeout=None, alive_tv_path=None):
+            status = INCORRECT if function == "g" else CORRECT
+            return status, f"{function} {status}\n", ""
+
+        with patch.object(llvm_ir_alive2_scheduler, 'run_alive_tv', side_effect=fake_run) as mock_run:
+            scheduler = scheduler_factory()
+            verified, stdout, _, _, status = scheduler.submit("src", "tgt", ["g", "f"]).result(timeout=5)
+
+            assert verified is False
+            assert status == INCORRECT
+            assert {c.args[2] for c in mock_run.call_args_list} == {"f", "g"}
+            assert stdout.index("; function f: correct") < stdout.index("; function g: incorrect")
+
+    def test_whole_module_without_functions(self, scheduler_factory):
+
+        with patch.object(llvm_ir_alive2_scheduler, 'run_alive_tv', return_value=(CORRECT, "ok", "")) as mock_run:
+            scheduler = scheduler_factory()
+            assert scheduler.submit("src", "tgt").result(timeout=5)[:3] == (True, "ok", "")
+            assert mock_run.call_args.args[2] is None
+
+    def test_undecided_functions_escalated(self, scheduler_factory):
+
+        def fake_run(src, tgt, function=None, timeout=None, alive_tv_path=None):
+            if function == "hard" and timeout == 1:
+                return UNDECIDED, "ERROR: Timeout", ""
+            return CORRECT, "Transformation seems to be correct!", ""
+
+        with patch.object(llvm_ir_alive2_scheduler, 'run_alive_tv', side_effect=fake_run) as mock_run:
+            scheduler = scheduler_factory()
+            verified, _, _, _, _ = scheduler.submit("src", "tgt", ["easy", "hard"]).result(timeout=5)
+
+            assert verified is True
+            assert sorted((c.args[2], c.kwargs['timeout']) for c in mock_run.call_args_list) == [
+                ("easy", 1), ("hard", 1), ("hard", 10)
+            ]
+            assert scheduler.stats['escalated'] == 1
+
+    def test_escalation_timeout_per_pair(self, scheduler_factory):
+
+        with patch.object(llvm_ir_alive2_scheduler, 'run_alive_tv', return_value=(UNDECIDED, "ERROR: Timeout", "")) as mock_run:
+            scheduler = scheduler_factory()
+            verified, _, _, _, status = scheduler.submit("src", "tgt", ["f"], escalation_timeout=4).result(timeout=5)
+
+            assert [c.kwargs['timeout'] for c in mock_run.call_args_list] == [1, 4]
+            assert (verified, status) == (False, UNDECIDED)
+
+    def test_results_cached_by_pair_and_version(self, scheduler_factory, tmp_path):
+
+        cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+        with patch.object(llvm_ir_alive2_scheduler, 'run_alive_tv', return_value=(CORRECT, "ok", "")) as mock_run:
+            first = scheduler_factory(cache=cache).submit("src", "tgt", ["f"]).result(timeout=5)
+            scheduler = scheduler_factory(cache=cache)
+            second = scheduler.submit("src", "tgt", ["f"]).result(timeout=5)
+
+            assert first[:3] == second[:3]
+            assert first[3] is not None and second[3] is None
+            assert mock_run.call_count == 1
+            assert scheduler.stats['cached'] == 1
+
+            scheduler.submit("src", "tgt2", ["f"]).result(timeout=5)
+            assert mock_run.call_count == 2
+        cache.close()
+
+    @pytest.mark.parametrize("outcome", [(ERROR, "", "boom"), (UNDECIDED, "ERROR: Timeout", "")])
+    def test_errors_and_undecided_not_cached(self, scheduler_factory, tmp_path, outcome):
+
+        cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+        with patch.object(llvm_ir_alive2_scheduler, 'run_alive_tv', return_value=outcome) as mock_run:
+            scheduler_factory(cache=cache).submit("src", "tgt", ["f"]).result(timeout=5)
+            first_calls = mock_run.call_count
+            scheduler_factory(cache=cache).submit("src", "tgt", ["f"]).result(timeout=5)
+            assert mock_run.call_count == 2 * first_calls
+        cache.close()
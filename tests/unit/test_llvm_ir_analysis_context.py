@@ -0,0 +1,66 @@
+import os
+import sys
+import pickle
+import pytest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from static_analysis.structural_analysis import llvm_ir_analysis_context
+from static_analysis.structural_analysis.llvm_ir_analysis_context import IRAnalysisContext
+from static_analysis.structural_analysis.llvm_ir_function_analysis import functions_count, compare_function_info
+
+IR = """
+define i32 @add(i32 %a, i32 %b) {
+  %result = add i32 %a, %b
+  ret i32 %result
+}
+
+declare void @exit(i32)
+"""
+
+class TestIRAnalysisContext:
+
+    def test_module_parsed_once(self):
+        context = IRAnalysisContext(IR)
+
+        with patch.object(llvm_ir_analysis_context.llvm, 'parse_assembly',
+                          wraps=llvm_ir_analysis_context.llvm.parse_assembly) as mock_parse:
+            context.functions
+            context.signatures
+            context.module
+            mock_parse.assert_called_once()
+
+    def test_signatures(self):
+        assert IRAnalysisContext(IR).signatures == {"i32 add(i32, i32)", "void exit(i32)"}
+
+    def test_matches_text_based_function_analysis(self):
+        expected = functions_count(IR, IR)
+        assert compare_function_info(IRAnalysisContext(IR).functions, IRAnalysisContext(IR).functions) == expected
+
+    def test_unparsable_ir_has_no_functions(self):
+        assert IRAnalysisContext("garbage").functions == []
+
+    def test_cfgs_built_once(self):
+        with patch.object(llvm_ir_analysis_context, 'module_cfgs', return_value={"add": None}) as mock_cfgs:
+            context = IRAnalysisContext(IR).preload()
+            assert context.cfgs == {"add": None}
+            mock_cfgs.assert_called_once_with(context.module)
+
+    def test_cfg_failure_cached(self):
+        with patch.object(llvm_ir_analysis_context, 'module_cfgs', side_effect=OSError("opt not found")) as mock_cfgs:
+            context = IRAnalysisContext(IR).preload()
+
+            with pytest.raises(RuntimeError, match="opt not found"):
+                context.cfgs
+            mock_cfgs.assert_called_once()
+
+    def test_pickle_drops_module(self):
+        context = IRAnalysisContext(IR)
+        context.functions
+
+        restored = pickle.loads(pickle.dumps(context))
+
+        assert restored._module is None
+        assert restored.functions == context.functions
+        assert restored.llvm_ir == IR
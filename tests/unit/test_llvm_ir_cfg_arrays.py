@@ -0,0 +1,157 @@
+import os
+import sys
+import random
+import pytest
+import networkx as nx
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from static_analysis.structural_analysis.llvm_ir_cfg_arrays import (
+    CompactCFG,
+    dominator_forests_isomorphic,
+    invariants_match,
+    wl_equivalent,
+)
+from static_analysis.structural_analysis.llvm_ir_cfg_comparison import (
+    cfg_features,
+    networkx_cfg_features,
+    similarity_from_features,
+    compute_cfg_similarity_score,
+    dominator_tree_isomorphic,
+    cfg_isomorphism,
+    compare_cfgs,
+    DeadlineDiGraphMatcher,
+)
+
+def random_cfg(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 40)
+    G = nx.gnp_random_graph(n, rng.uniform(0.02, 0.2), seed=seed, directed=True)
+    for u in rng.sample(range(n), k=min(n, 2)):
+        if rng.random() < 0.3:
+            G.add_edge(u, u)
+    # Relabel so node ids are not the CSR indices
+    return nx.relabel_nodes(G, {u: f"Node0x{u * 7919:x}" for u in G})
+
+def dominator_variants(seed):
+    rng = random.Random(seed)
+    n = rng.randint(2, 12)
+    G = nx.DiGraph()
+    G.add_nodes_from(range(n))
+    for v in range(1, n):
+        G.add_edge(rng.randrange(v), v)
+    for _ in range(rng.randint(0, n)):
+        G.add_edge(rng.randrange(n), rng.randrange(n))
+    shuffled = list(range(n))
+    rng.shuffle(shuffled)
+    return G, nx.relabel_nodes(G, dict(zip(range(n), shuffled)))
+
+class TestCompactCFG:
+
+    def test_csr_layout(self):
+        c = CompactCFG(3, [2, 0, 0], [0, 2, 1])
+        assert c.indptr.tolist() == [0, 2, 2, 3]
+        assert c.successors(0).tolist() == [1, 2]
+
+    def test_empty_graph(self):
+        c = CompactCFG.from_graph(nx.DiGraph())
+        assert c.degree_histograms() == ([], [])
+        assert c.cyclomatic_complexity() == 0
+        assert c.loop_scc_count() == 0
+        assert c.condensation_features()["cond_longest_path"] == 0
+
+    def test_self_loop_counts_as_loop(self):
+        G = nx.DiGraph([(0, 1), (1, 1), (1, 2)])
+        assert CompactCFG.from_graph(G).loop_scc_count() == 1
+
+    def test_scc_labels_in_reverse_topological_order(self):
+        G = nx.DiGraph([(0, 1), (1, 2), (2, 1), (2, 3)])
+        num_comps, comp = CompactCFG.from_graph(G).scc_labels()
+        assert num_comps == 3
+        assert comp[3] < comp[1] == comp[2] < comp[0]
+
+    @pytest.mark.parametrize("seed", range(60))
+    def test_features_match_networkx(self, seed):
+        G = random_cfg(seed)
+        assert cfg_features(CompactCFG.from_graph(G)) == networkx_cfg_features(G)
+
+    @pytest.mark.parametrize("seed", range(60))
+    def test_dominator_match_agrees_with_networkx(self, seed):
+        G1 = random_cfg(seed)
+        G2 = random_cfg(seed + 1000)
+        expected = dominator_tree_isomorphic(G1, G2)
+        assert dominator_forests_isomorphic(CompactCFG.from_graph(G1), CompactCFG.from_graph(G2)) == expected
+
+    @pytest.mark.parametrize("seed", range(30))
+    def test_relabelled_dominator_trees_isomorphic(self, seed):
+        G1, G2 = dominator_variants(seed)
+        assert dominator_tree_isomorphic(G1, G2) is True
+        assert dominator_forests_isomorphic(CompactCFG.from_graph(G1), CompactCFG.from_graph(G2)) is True
+
+    @pytest.mark.parametrize("seed", range(30))
+    def test_similarity_score_matches_networkx(self, seed):
+        G1 = random_cfg(seed)
+        G2 = random_cfg(seed + 500)
+        dom = dominator_tree_isomorphic(G1, G2)
+
+        expected = similarity_from_features(networkx_cfg_features(G1), networkx_cfg_features(G2), dom)
+        actual = compute_cfg_similarity_score(G1, G2, dominator_tree_match=dom)
+
+        assert actual["score"] == pytest.approx(expected["score"], abs=1e-9)
+
+class TestIsomorphismPrechecks:
+
+    @pytest.mark.parametrize("seed", range(40))
+    def test_wl_never_rejects_isomorphic_graphs(self, seed):
+        G1 = random_cfg(seed)
+        mapping = list(G1)
+        random.Random(seed).shuffle(mapping)
+        G2 = nx.relabel_nodes(G1, dict(zip(G1, mapping)))
+
+        c1, c2 = CompactCFG.from_graph(G1), CompactCFG.from_graph(G2)
+        assert invariants_match(c1, c2)
+        assert wl_equivalent(c1, c2)
+
+    def test_wl_rejects_equal_degree_sequences(self):
+        # Diamond against a chain with a shortcut: identical degree pairs
+        G1 = nx.DiGraph([(0, 1), (0, 2), (1, 3), (2, 3)])
+        G2 = nx.DiGraph([(0, 1), (0, 3), (1, 2), (2, 3)])
+        c1, c2 = CompactCFG.from_graph(G1), CompactCFG.from_graph(G2)
+
+        assert invariants_match(c1, c2)
+        assert not wl_equivalent(c1, c2)
+
+    def test_vf2_decides_what_wl_cannot(self):
+        # One 6-cycle against two 3-cycles: colour refinement cannot tell
+        # regular graphs apart
+        G1 = nx.DiGraph([(i, (i + 1) % 6) for i in range(6)])
+        G2 = nx.DiGraph([(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3)])
+        c1, c2 = CompactCFG.from_graph(G1), CompactCFG.from_graph(G2)
+
+        assert wl_equivalent(c1, c2)
+        assert cfg_isomorphism(G1, G2, c1, c2) is False
+
+    @pytest.mark.parametrize("seed", range(40))
+    def test_agrees_with_vf2(self, seed):
+        G1 = random_cfg(seed)
+        G2 = random_cfg(seed + 1) if seed % 2 else nx.relabel_nodes(G1, {u: f"b{u}" for u in G1})
+        result = cfg_isomorphism(G1, G2, CompactCFG.from_graph(G1), CompactCFG.from_graph(G2))
+        assert result == nx.is_isomorphic(G1, G2)
+
+    def test_vf2_skipped_when_hashes_differ(self):
+        G1 = nx.DiGraph([(0, 1), (0, 2), (1, 3), (2, 3)])
+        G2 = nx.DiGraph([(0, 1), (0, 3), (1, 2), (2, 3)])
+        with patch.object(DeadlineDiGraphMatcher, 'is_isomorphic') as mock_vf2:
+            assert cfg_isomorphism(G1, G2, CompactCFG.from_graph(G1), CompactCFG.from_graph(G2)) is False
+            mock_vf2.assert_not_called()
+
+    def test_exhausted_budget_is_undecided(self):
+        G = nx.DiGraph([(i, (i + 1) % 6) for i in range(6)])
+        compact = CompactCFG.from_graph(G)
+
+        assert cfg_isomorphism(G, G, compact, compact, time_budget=-1.0) is None
+
+        result = compare_cfgs(G, G, time_budget=-1.0)
+        assert result['is_isomorphic'] is None
+        assert result['definitive_match'] is False
@@ -0,0 +1,109 @@
+import os
+import re
+import sys
+import shutil
+import pytest
+import networkx as nx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from static_analysis.structural_analysis.llvm_ir_cfg_comparison import (
+    function_cfgs,
+    generate_cfg,
+    parse_dot_to_graph,
+)
+
+LOOP_IR = """
+define i32 @sum(i32 %n) {
+entry:
+  br label %cond
+
+cond:
+  %i = phi i32 [ 0, %entry ], [ %next, %body ]
+  %c = icmp slt i32 %i, %n
+  br i1 %c, label %body, label %exit
+
+body:
+  %next = add i32 %i, 1
+  br label %cond
+
+exit:
+  ret i32 %i
+}
+
+declare void @exit(i32)
+"""
+
+UNNAMED_IR = """
+define i32 @pick(i32 %0) {
+  switch i32 %0, label %4 [
+    i32 0, label %2
+    i32 1, label %3
+    i32 2, label %3
+  ]
+
+2:
+  ret i32 10
+
+3:
+  ret i32 20
+
+4:
+  unreachable
+}
+"""
+
+QUOTED_IR = """
+define void @spin(i1 %c) {
+"entry block":
+  br i1 %c, label %"loop.body", label %"exit here"
+
+"loop.body":
+  br label %"loop.body"
+
+"exit here":
+  ret void
+}
+"""
+
+class TestFunctionCfgs:
+
+    def test_keyed_by_function_name_without_declarations(self):
+        assert list(function_cfgs(LOOP_IR)) == ["sum"]
+
+    def test_loop_edges(self):
+        G = function_cfgs(LOOP_IR)["sum"]
+
+        names = nx.get_node_attributes(G, 'block_name')
+        edges = {(names[u], names[v]) for u, v in G.edges()}
+        assert edges == {("entry", "cond"), ("cond", "body"), ("cond", "exit"), ("body", "cond")}
+
+    def test_unnamed_blocks_and_switch(self):
+        G = function_cfgs(UNNAMED_IR)["pick"]
+
+        assert G.number_of_nodes() == 4
+        assert sorted(G.successors(0)) == [1, 2, 3]
+        assert G.out_degree(3) == 0
+
+    def test_quoted_block_names(self):
+        G = function_cfgs(QUOTED_IR)["spin"]
+
+        assert set(G.edges()) == {(0, 1), (0, 2), (1, 1)}
+
+    def test_invalid_ir_raises(self):
+        with pytest.raises(RuntimeError):
+            function_cfgs("garbage")
+
+    @pytest.mark.skipif(shutil.which('opt') is None, reason="opt not available")
+    def test_matches_dot_cfg(self):
+        for ir in (LOOP_IR, UNNAMED_IR):
+            cfg_data, tmp_dir = generate_cfg(ir)
+            shutil.rmtree(tmp_dir)
+            dot_graphs = {re.sub(r'^\.|\.dot$', '', name): parse_dot_to_graph(dot) for name, dot in cfg_data.items()}
+
+            native = function_cfgs(ir)
+
+            assert native.keys() == dot_graphs.keys()
+            for name, G in native.items():
+                assert G.number_of_edges() == dot_graphs[name].number_of_edges()
+                assert nx.is_isomorphic(G, dot_graphs[name])
@@ -0,0 +1,64 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from functional_and_behavioural_analysis.llvm_ir_compilation_check import (
+    build_directory,
+    compilation_check,
+    with_output,
+)
+
+@pytest.fixture
+def compiler(tmp_path):
+    # Copies its input (the last argument) to the path after -o.
+    path = tmp_path / "cc"
+    path.write_text('#!/bin/sh\nwhile [ "$1" != "-o" ]; do shift; done\nout="$2"; shift 2\ncp "$1" "$out"\n')
+    path.chmod(0o755)
+    return str(path)
+
+class TestWithOutput:
+
+    def test_replaces_separate_output_argument(self):
+
+        assert with_output(["clang", "-o", "a.out", "in.ll"], "/b/ref") == ["clang", "-o", "/b/ref", "in.ll"]
+
+    def test_replaces_joined_output_argument(self):
+
+        assert with_output(["clang", "-oa.out", "in.ll"], "/b/ref") == ["clang", "-o/b/ref", "in.ll"]
+
+    def test_adds_output_before_input(self):
+
+        assert with_output(["clang", "-O2", "in.ll"], "/b/ref") == ["clang", "-O2", "-o", "/b/ref", "in.ll"]
+
+class TestCompilationCheck:
+
+    def test_build_dirs_are_private_and_removed(self, compiler):
+
+        with build_directory() as first, build_directory() as second:
+            assert first != second
+            assert compilation_check("ir 1", [compiler, "-o", "a.out", "x"], "ref_a.out", None, build_dir=first)
+            assert compilation_check("ir 2", [compiler, "-o", "a.out", "x"], "ref_a.out", None, build_dir=second)
+
+            with open(os.path.join(first, "ref_a.out")) as f:
+                assert f.read() == "ir 1"
+            with open(os.path.join(second, "ref_a.out")) as f:
+                assert f.read() == "ir 2"
+            # The IR is passed through the scratch pool, not the build directory
+            assert os.listdir(first) == ["ref_a.out"]
+
+        assert not os.path.exists(first)
+        assert not os.path.exists(second)
+
+    def test_without_build_dir_output_in_src_directory(self, compiler, tmp_path):
+
+        src = tmp_path / "src"
+        src.mkdir()
+
+        assert compilation_check("ir", [compiler, "-o", "out", "x"], "out", str(src))
+        assert (src / "out").read_text() == "ir"
+
+    def test_failed_compilation(self, tmp_path):
+
+        assert compilation_check("ir", ["false", "x"], "out", None, build_dir=str(tmp_path)) is False
@@ -0,0 +1,165 @@
+import os
+import shutil
+import sys
+import pytest
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from functional_and_behavioural_analysis import llvm_ir_incremental_build
+from functional_and_behavioural_analysis.llvm_ir_incremental_build import (
+    changed_functions,
+    codegen_commands,
+    compile_object,
+    incremental_compilation_check,
+    link_command,
+    shared_object,
+    split_pair,
+)
+
+MODULE = """@g = internal global i32 7
+
+define internal i32 @helper() {
+  %v = load i32, i32* @g
+  ret i32 %v
+}
+
+define i32 @f(i32 %x) {
+  %h = call i32 @helper()
+  %r = add i32 %x, {}
+  ret i32 %r
+}
+"""
+
+class TestChangedFunctions:
+
+    def test_only_differing_function(self):
+
+        assert changed_functions(MODULE.replace("{}", "1"), MODULE.replace("{}", "2")) == ["f"]
+
+    def test_identical_modules(self):
+
+        assert changed_functions(MODULE.replace("{}", "1"), MODULE.replace("{}", "1")) == []
+
+    def test_function_defined_on_one_side(self):
+
+        extra = MODULE.replace("{}", "1") + "\ndefine void @extra() {\n  ret void\n}\n"
+
+        assert changed_functions(MODULE.replace("{}", "1"), extra) == ["extra"]
+
+    def test_unparseable(self):
+
+        assert changed_functions("not ir", MODULE.replace("{}", "1")) is None
+
+class TestLinkCommand:
+
+    def test_objects_replace_ir_argument(self):
+
+        command = link_command(["clang", "main.c", "-o", "a.out", "x.ll"], ["rest.o", "f.o"], "/b/ref")
+
+        assert command == ["clang", "main.c", "-o", "/b/ref", "rest.o", "f.o"]
+
+class TestCodegenCommands:
+
+    def test_codegen_flags_passed_through(self):
+
+        opt, llc = codegen_commands(["clang", "-O2", "-march=znver3", "-fno-pic", "main.c", "-o", "a.out", "x.ll"])
+
+        assert opt == ["opt", "-S", "-O2", "-mcpu=znver3"]
+        assert llc == ["llc", "-filetype=obj", "-O2", "-relocation-model=static", "-mcpu=znver3"]
+
+    def test_defaults_match_the_driver(self):
+
+        opt, llc = codegen_commands(["clang", "-Wall", "-g", "-Iinclude", "main.c", "-lm", "-o", "a.out", "x.ll"])
+
+        assert opt is None
+        assert llc == ["llc", "-filetype=obj", "-O0", "-relocation-model=pic"]
+
+    def test_size_levels_optimized_for_size(self):
+
+        opt, llc = codegen_commands(["clang", "-Os", "x.ll"])
+
+        assert opt[-1] == "-Os" and llc[2] == "-O2"
+
+    @pytest.mark.parametrize("flag", ["-ffast-math", "-Ofast", "-flto", "-mavx2"])
+    def test_unmapped_flags_need_full_compile(self, flag):
+
+        assert codegen_commands(["clang", flag, "main.c", "x.ll"]) is None
+        assert incremental_compilation_check("a", "b", ["clang", flag, "x.ll"], "ref", "tgt", None, "/b", "/o") is None
+
+class TestIncrementalCompilationCheck:
+
+    def test_falls_back_without_changes(self, tmp_path):
+
+        ir = MODULE.replace("{}", "1")
+
+        assert incremental_compilation_check(ir, ir, ["clang", "x"], "ref", "tgt", None, str(tmp_path), str(tmp_path)) is None
+
+    def test_falls_back_when_rest_differs(self):
+
+        with patch.object(llvm_ir_incremental_build, 'changed_functions', return_value=["f"]), \
+            patch.object(llvm_ir_incremental_build, 'extract', side_effect=["rest a", "rest b"]):
+            assert split_pair("ref", "tgt") is None
+
+    @pytest.mark.parametrize("failing", ["ref f", "tgt f"])
+    def test_failed_half_leaves_both_to_full_compile(self, tmp_path, failing):
+
+        def fake_compile(ir, path, codegen):
+            return ir != failing
+
+        with patch.object(llvm_ir_incremental_build, 'split_pair', return_value=("rest", "ref f", "tgt f")), \
+            patch.object(llvm_ir_incremental_build, 'shared_object', return_value="rest.o"), \
+            patch.object(llvm_ir_incremental_build, 'compile_object', side_effect=fake_compile), \
+            patch.object(llvm_ir_incremental_build, 'link', return_value=True):
+            assert incremental_compilation_check("a", "b", ["clang", "x"], "ref", "tgt", None,
+                                                 str(tmp_path), str(tmp_path)) is None
+
+    def test_optimized_before_codegen(self, tmp_path):
+
+        output = tmp_path / "f.o"
+
+        def fake_tool(command, input=None, **kwargs):
+            if command[0] == "llc":
+                output.write_text(input)
+            return Mock(returncode=0, stdout=f"optimized {input}")
+
+        with patch.object(llvm_ir_incremental_build, 'run_tool', side_effect=fake_tool) as mock_tool:
+            assert compile_object("ir", str(output), codegen_commands(["clang", "-O3", "x.ll"]))
+
+        assert [c.args[0][:3] for c in mock_tool.call_args_list] == [["opt", "-S", "-O3"], ["llc", "-filetype=obj", "-O3"]]
+        assert output.read_text() == "optimized ir"
+
+    def test_shared_object_built_once(self, tmp_path):
+
+        def fake_compile(ir, path, codegen):
+            open(path, "w").close()
+            return True
+
+        with patch.object(llvm_ir_incremental_build, 'compile_object', side_effect=fake_compile) as mock_compile:
+            first = shared_object("rest", str(tmp_path))
+            second = shared_object("rest", str(tmp_path))
+            other_flags = shared_object("rest", str(tmp_path), codegen_commands(["clang", "-O2", "x.ll"]))
+
+        assert first == second != other_flags
+        assert mock_compile.call_count == 2
+        assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(first), os.path.basename(other_flags)])
+
+    @pytest.mark.skipif(not (shutil.which('llvm-extract') and shutil.which('llc') and shutil.which('cc')),
+                        reason="needs llvm-extract, llc and a C compiler")
+    def test_links_changed_function_against_shared_rest(self, tmp_path):
+
+        main = tmp_path / "main.c"
+        main.write_text("int f(int);\nint main(void) { return f(1); }\n")
+        build_dir = tmp_path / "build"
+        object_dir = tmp_path / "objects"
+        build_dir.mkdir()
+        object_dir.mkdir()
+
+        ref = MODULE.replace("{}", "1")
+        tgt = MODULE.replace("{}", "2")
+        result = incremental_compilation_check(ref, tgt, ["cc", "main.c", "-o", "a.out", "x.ll"], "ref", "tgt",
+                                               str(tmp_path), str(build_dir), str(object_dir))
+
+        assert result == (True, True)
+        assert sorted(os.listdir(build_dir)) == ["ref", "tgt"]
+        assert len(os.listdir(object_dir)) == 1
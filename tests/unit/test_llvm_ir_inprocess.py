@@ -0,0 +1,127 @@
+import os
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from static_analysis.structural_analysis import llvm_ir_inprocess
+from static_analysis.structural_analysis.llvm_ir_inprocess import (
+    InProcessUnsupported,
+    parse_ir,
+    use_inprocess,
+    verify_ir_inprocess,
+    canonicalize_ir_inprocess,
+    verify_and_canonicalize_inprocess,
+)
+from static_analysis.structural_analysis.llvm_ir_verification import verify_ir
+from static_analysis.structural_analysis.llvm_ir_canonicalization_and_normalization import (
+    canonicalize_and_normalize_ir,
+    verify_and_canonicalize_ir,
+)
+
+ALLOCA_IR = """
+define i32 @add(i32 %a, i32 %b) {
+  %temp = alloca i32
+  store i32 %a, i32* %temp
+  %loaded = load i32, i32* %temp
+  %result = add i32 %loaded, %b
+  ret i32 %result
+}
+
+!llvm.ident = !{!0}
+!0 = !{!"clang version 14.0.6"}
+"""
+
+INVALID_IR = """
+define i32 @f() {
+entry:
+  %x = add i32 %y, 1
+  %y = add i32 %x, 1
+  ret i32 %x
+}
+"""
+
+class TestParseIr:
+
+    def test_debug_info_is_unsupported(self):
+        with pytest.raises(InProcessUnsupported):
+            parse_ir("define void @f() !dbg !3 {\n  ret void\n}\n")
+
+    def test_parse_error_is_unsupported(self):
+        with pytest.raises(InProcessUnsupported):
+            parse_ir("garbage")
+
+class TestInProcessEngine:
+
+    def test_verify_valid_ir(self):
+        assert verify_ir_inprocess(ALLOCA_IR) == (True, "IR verification passed")
+
+    def test_verify_invalid_ir(self):
+        verified, message = verify_ir_inprocess(INVALID_IR)
+        assert verified is False
+        assert message
+
+    def test_canonicalization_promotes_allocas_and_strips_named_metadata(self):
+        success, canonical_ir, error = canonicalize_ir_inprocess(ALLOCA_IR)
+
+        assert success is True
+        assert error == ""
+        assert "alloca" not in canonical_ir
+        assert "llvm.ident" not in canonical_ir
+
+    def test_verify_and_canonicalize_parses_once(self):
+        with patch.object(llvm_ir_inprocess, 'parse_ir', wraps=parse_ir) as mock_parse:
+            verified, _, success, canonical_ir, _ = verify_and_canonicalize_inprocess(ALLOCA_IR)
+
+            assert verified and success
+            assert "define i32 @add" in canonical_ir
+            mock_parse.assert_called_once()
+
+    def test_verify_failure_skips_canonicalization(self):
+        verified, _, success, canonical_ir, error = verify_and_canonicalize_inprocess(INVALID_IR)
+        assert (verified, success, canonical_ir, error) == (False, False, "", "VERIFY FAILED")
+
+class TestEngineSelection:
+
+    def test_opt_engine_never_in_process(self):
+        assert use_inprocess('opt') is False
+
+    def test_forced_llvmlite_engine(self):
+        assert use_inprocess('llvmlite') is True
+
+    def test_auto_requires_matching_llvm_versions(self):
+        major = llvm_ir_inprocess.llvm.llvm_version_info[0]
+        with patch.object(llvm_ir_inprocess, 'opt_major_version', return_value=major):
+            assert use_inprocess('auto') is True
+        with patch.object(llvm_ir_inprocess, 'opt_major_version', return_value=major - 1):
+            assert use_inprocess('auto') is False
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            use_inprocess('gcc')
+
+class TestOptFallback:
+
+    def test_verify_falls_back_to_opt_on_unsupported_input(self):
+        with patch('static_analysis.structural_analysis.llvm_ir_verification.run_tool') as mock_run:
+            mock_run.return_value = MagicMock(returncode=0, stderr="")
+
+            verified, _ = verify_ir("define void @f() !dbg !3 {\n  ret void\n}\n", engine='llvmlite')
+
+            assert verified is True
+            assert mock_run.call_args[0][0][0] == 'opt'
+
+    def test_canonicalize_in_process_makes_no_subprocess_calls(self):
+        with patch('subprocess.Popen') as mock_run:
+            success, canonical_ir, _ = canonicalize_and_normalize_ir(ALLOCA_IR, engine='llvmlite')
+
+            assert success is True
+            assert "ModuleID" not in canonical_ir
+            assert "source_filename" not in canonical_ir
+            mock_run.assert_not_called()
+
+    def test_verify_and_canonicalize_reports_engine(self):
+        result = verify_and_canonicalize_ir(ALLOCA_IR, engine='llvmlite')
+        assert result[0] is True
+        assert result[-1] == 'llvmlite'
@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from unittest.mock import patch
+
+from functional_and_behavioural_analysis import llvm_ir_io_test
+from functional_and_behavioural_analysis.llvm_ir_io_test import io_test, run_executable, run_vector, SLOW, TIMEOUT, OUTPUT_LIMIT
+
+@pytest.fixture
+def script(tmp_path):
+
+    def make(name, body):
+        path = tmp_path / name
+        path.write_text("#!/bin/sh\n" + body + "\n")
+        path.chmod(0o755)
+        return str(path)
+
+    return make
+
+class TestIOTest:
+
+    def test_matching_programs(self, script):
+
+        ref = script("ref", 'echo hello')
+        tgt = script("tgt", 'echo hello')
+
+        result = io_test(ref, tgt, 5)
+
+        assert result['match'] is True
+        assert result['reference_output']['stdout'] == "hello\n"
+
+    def test_vectors_feed_stdin_and_argv(self, script):
+
+        ref = script("ref", 'cat; echo "$1"')
+        tgt = script("tgt", 'cat; echo "$1"')
+        vectors = [{'stdin': "a\n", 'argv': ["x"]}, {'stdin': "b\n", 'argv': [2]}]
+
+        result = io_test(ref, tgt, 5, vectors=vectors)
+
+        assert result['match'] is True
+        assert [v['target_output']['stdout'] for v in result['vectors']] == ["a\nx\n", "b\n2\n"]
+
+    def test_one_differing_vector_fails_the_pair(self, script):
+
+        ref = script("ref", 'echo "$1"')
+        tgt = script("tgt", 'if [ "$1" = 2 ]; then echo other; else echo "$1"; fi')
+
+        result = io_test(ref, tgt, 5, vectors=[{'argv': ["1"]}, {'argv': ["2"]}])
+
+        assert result['both_executed'] is True
+        assert result['match'] is False
+        assert [v['match'] for v in result['vectors']] == [True, False]
+
+    def test_returncode_mismatch(self, script):
+
+        result = io_test(script("ref", 'exit 0'), script("tgt", 'exit 3'), 5)
+
+        assert result['returncode_match'] is False
+        assert result['match'] is False
+
+    def test_slow_target_killed_after_reference(self, script):
+
+        ref = script("ref", 'echo done')
+        tgt = script("tgt", 'exec sleep 30')
+
+        start = time.monotonic()
+        ref_out, tgt_out = run_vector(ref, tgt, {}, 30, limits={'slowdown': 2})
+
+        assert time.monotonic() - start < 10
+        assert ref_out['success'] is True
+        assert tgt_out['status'] == SLOW
+
+    def test_both_time_out(self, script):
+
+        ref_out, tgt_out = run_vector(script("ref", 'exec sleep 30'), script("tgt", 'exec sleep 30'), {}, 0.5)
+
+        assert ref_out['status'] == TIMEOUT
+        assert tgt_out['status'] == TIMEOUT
+
+    def test_output_limit(self, script):
+
+        ref = script("ref", 'exec yes')
+        tgt = script("tgt", 'echo ok')
+
+        ref_out, tgt_out = run_vector(ref, tgt, {}, 10, limits={'output_bytes': 4096})
+
+        assert ref_out['status'] == OUTPUT_LIMIT
+        assert ref_out['stdout'] is None
+
+    def test_missing_executable(self, script, tmp_path):
+
+        result = io_test(str(tmp_path / "missing"), script("tgt", 'echo hi'), 5)
+
+        assert result['both_executed'] is False
+        assert result['reference_output']['success'] is False
+
+class TestRunExecutable:
+
+    def test_run_executable(self, script):
+
+        success, stdout, stderr, returncode = run_executable(script("p", 'echo out; echo err >&2; exit 1'), 5)
+
+        assert (success, stdout, stderr, returncode) == (True, "out\n", "err\n", 1)
+
+    def test_run_executable_timeout(self, script):
+
+        success, stdout, stderr, returncode = run_executable(script("p", 'exec sleep 30'), 0.5)
+
+        assert success is False
+        assert stderr == "Execution timed out"
+
+    @pytest.mark.parametrize("prlimit", [True, False])
+    def test_limits_applied_without_preexec_fn(self, script, prlimit):
+
+        which = llvm_ir_io_test.shutil.which if prlimit else (lambda name: None)
+        with patch.object(llvm_ir_io_test.shutil, 'which', side_effect=which), \
+                patch.object(llvm_ir_io_test.subprocess, 'Popen', wraps=llvm_ir_io_test.subprocess.Popen) as mock_popen:
+            # Without prlimit(1) the limits land just after the spawn.
+            success, stdout, _, _ = run_executable(script("p", 'sleep 0.2; ulimit -c; ulimit -f'), 5,
+                                                   limits={'output_bytes': 1024 * 1024})
+
+        assert 'preexec_fn' not in mock_popen.call_args.kwargs
+        assert success is True
+        # ulimit -f counts 512-byte blocks
+        assert stdout.split() == ["0", "2048"]
@@ -0,0 +1,194 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+import llvm_tools
+from llvm_tools import ScratchPool, ToolMetrics, ir_inputs, run_tool, scratch_root, spool_metrics, collect_metrics
+
+class TestScratchRoot:
+
+    def test_missing_root_falls_back_to_tempdir(self, tmp_path):
+
+        assert scratch_root(str(tmp_path / "missing")) == tempfile.gettempdir()
+
+    def test_noexec_root_falls_back_to_tempdir(self, tmp_path):
+
+        class NoExec:
+            f_flag = os.ST_NOEXEC
+
+        with patch.object(llvm_tools.os, 'statvfs', return_value=NoExec()):
+            assert scratch_root(str(tmp_path)) == tempfile.gettempdir()
+
+    def test_usable_root(self, tmp_path):
+
+        assert scratch_root(str(tmp_path)) == str(tmp_path)
+
+class TestScratchPool:
+
+    def test_released_files_reused(self, tmp_path):
+
+        pool = ScratchPool(root=str(tmp_path))
+
+        with pool.file("first") as first:
+            with pool.file("second") as second:
+                assert first != second
+        with pool.file("third") as third:
+            with open(third) as f:
+                assert f.read() == "third"
+
+        assert third in (first, second)
+        assert pool.created == 2
+
+    def test_slots_keyed_by_suffix(self, tmp_path):
+
+        pool = ScratchPool(root=str(tmp_path))
+
+        with pool.file("a", suffix='.ll') as ll:
+            pass
+        with pool.file("b", suffix='.bc') as bc:
+            pass
+
+        assert ll.endswith('.ll') and bc.endswith('.bc')
+
+class TestIRInputs:
+
+    @pytest.mark.skipif(not llvm_tools.MEMFD_SUPPORTED, reason="needs memfd_create")
+    def test_memfd_paths_readable_by_child(self):
+
+        with ir_inputs("one", "two") as (paths, fds):
+            assert all(p.startswith("/proc/self/fd/") for p in paths)
+            result = run_tool(['cat'] + paths, pass_fds=fds)
+
+        assert result.stdout == "onetwo"
+
+    def test_named_inputs_are_files_with_suffix(self):
+
+        with ir_inputs("define void @f() {\n  ret void\n}\n", named=True) as (paths, fds):
+            assert fds == ()
+            assert paths[0].endswith('.ll')
+            with open(paths[0]) as f:
+                assert f.read().startswith("define void @f()")
+
+    def test_falls_back_to_pool_without_memfd(self):
+
+        with patch.object(llvm_tools, 'MEMFD_SUPPORTED', False):
+            with ir_inputs("x", "y") as (paths, fds):
+                assert fds == ()
+                assert [open(p).read() for p in paths] == ["x", "y"]
+
+class TestRunTool:
+
+    def test_stdin_to_stdout(self):
+
+        result = run_tool(['cat'], input="ir")
+
+        assert (result.returncode, result.stdout) == (0, "ir")
+
+    def test_invocations_recorded_by_tool_and_stage(self):
+
+        llvm_tools.tool_metrics.drain()
+
+        run_tool(['true'], stage='verify')
+        run_tool(['/bin/false'], stage='verify')
+        with pytest.raises(subprocess.TimeoutExpired):
+            run_tool(['sleep', '5'], timeout=0.1, stage='alive2')
+
+        series = {(s['tool'], s['stage']): s for s in llvm_tools.tool_metrics.drain()}
+        assert series[('true', 'verify')]['status'] == {'ok': 1}
+        assert series[('false', 'verify')]['status'] == {'failed': 1}
+        assert series[('sleep', 'alive2')]['status'] == {'timeout': 1}
+        assert series[('sleep', 'alive2')]['wall_seconds']['sum'] >= 0.1
+        assert series[('true', 'verify')]['max_rss_bytes']['count'] == 1
+
+    def test_rusage_is_the_tools_own(self):
+
+        llvm_tools.tool_metrics.drain()
+
+        run_tool([sys.executable, '-c', 'b = bytearray(256 * 1024 * 1024)'], stage='probe')
+        run_tool(['true'], stage='verify')
+
+        series = {(s['tool'], s['stage']): s for s in llvm_tools.tool_metrics.drain()}
+        python_rss = series[(os.path.basename(sys.executable), 'probe')]['max_rss_bytes']['sum']
+        assert python_rss >= 256 * 1024 * 1024
+        assert series[('true', 'verify')]['max_rss_bytes']['sum'] < python_rss
+
+    def test_check_raises_with_output(self):
+
+        with pytest.raises(subprocess.CalledProcessError) as excinfo:
+            run_tool(['sh', '-c', 'echo out; exit 3'], check=True)
+
+        assert (excinfo.value.returncode, excinfo.value.stdout) == (3, "out\n")
+
+def _run_true(_):
+    run_tool(['true'], stage='compile')
+    return os.getpid()
+
+class TestToolMetrics:
+
+    def test_histogram_buckets(self):
+
+        metrics = ToolMetrics()
+        metrics.record('opt', 'verify', 'ok', 0.02, 0.01, 20 * 1024 * 1024)
+        metrics.record('opt', 'verify', 'failed', 700, 0.5, 1)
+
+        series = metrics.snapshot()[0]
+        wall = series['wall_seconds']
+        assert wall['counts'][1] == 1 and wall['counts'][-1] == 1
+        assert wall['count'] == 2 and wall['sum'] == 700.02
+        assert series['status'] == {'ok': 1, 'failed': 1}
+
+    def test_merge_adds_counts(self):
+
+        first, second = ToolMetrics(), ToolMetrics()
+        first.record('opt', 'verify', 'ok', 0.2, 0.1, 1)
+        second.record('opt', 'verify', 'ok', 0.3, 0.1, 1)
+        second.record('llvm-diff', 'diff', 'failed', 0.3, 0.1, 1)
+
+        first.merge(second.snapshot())
+
+        series = {(s['tool'], s['stage']): s for s in first.snapshot()}
+        assert series[('opt', 'verify')]['wall_seconds']['count'] == 2
+        assert series[('opt', 'verify')]['status'] == {'ok': 2}
+        assert series[('llvm-diff', 'diff')]['status'] == {'failed': 1}
+
+    def test_prometheus_buckets_cumulative(self):
+
+        metrics = ToolMetrics()
+        metrics.record('opt', 'verify', 'ok', 0.02, 0.01, 1)
+        metrics.record('opt', 'verify', 'ok', 3, 0.01, 1)
+
+        text = metrics.to_prometheus()
+
+        assert 'llvm_tool_invocations_total{tool="opt",stage="verify",status="ok"} 2' in text
+        assert 'llvm_tool_wall_seconds_bucket{tool="opt",stage="verify",le="0.05"} 1' in text
+        assert 'llvm_tool_wall_seconds_bucket{tool="opt",stage="verify",le="+Inf"} 2' in text
+        assert 'llvm_tool_wall_seconds_count{tool="opt",stage="verify"} 2' in text
+
+    def test_write_picks_format_from_extension(self, tmp_path):
+
+        metrics = ToolMetrics()
+        metrics.record('opt', 'verify', 'ok', 0.02, 0.01, 1)
+
+        metrics.write(str(tmp_path / "m.prom"))
+        metrics.write(str(tmp_path / "m.json"))
+
+        assert (tmp_path / "m.prom").read_text().startswith("# TYPE")
+        assert json.loads((tmp_path / "m.json").read_text())[0]['tool'] == 'opt'
+
+    def test_pool_workers_spool_metrics(self, tmp_path):
+
+        llvm_tools.tool_metrics.drain()
+
+        with ProcessPoolExecutor(max_workers=2, initializer=spool_metrics, initargs=(str(tmp_path),)) as pool:
+            list(pool.map(_run_true, range(4)))
+        collect_metrics(str(tmp_path))
+
+        series = {(s['tool'], s['stage']): s for s in llvm_tools.tool_metrics.drain()}
+        assert series[('true', 'compile')]['status'] == {'ok': 4}
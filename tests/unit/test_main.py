@@ -3,11 +3,17 @@ import sys
 import pytest
 from unittest.mock import Mock, patch, mock_open
 import orjson
+import subprocess
 import tempfile
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'package_builder'))
 
-from datasets.helper_scripts.package_builder.main import process_package
+from datasets.helper_scripts.package_builder.main import process_package, traverse_dir
+from build_history import BuildHistory, HISTORY_DB
+from worker_pool import LocalRuntime, WorkerError
+from apt_cache import AptCache
+import manifest
 
 class TestProcessPackage:
 
@@ -72,58 +78,63 @@ class TestProcessPackage:
             sample_compilation_data  # compilation_data
         ]).decode()
 
-    @patch('datasets.helper_scripts.package_builder.main.subprocess.run')
+    @staticmethod
+    def pool(output):
+
+        pool = Mock()
+        pool.run.return_value = orjson.loads(output)
+        return pool
+
     @patch('datasets.helper_scripts.package_builder.main.os.makedirs')
-    def test_successful_processing(self, mock_makedirs, mock_subprocess, mock_dirs, sample_docker_output):
+    def test_successful_processing(self, mock_makedirs, mock_dirs, sample_docker_output):
 
         package_dir, sub_dir = mock_dirs
-
-        mock_result = Mock()
-        mock_result.stdout = sample_docker_output
-        mock_subprocess.return_value = mock_result
+        pool = self.pool(sample_docker_output)
 
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('builtins.open', mock_open()) as mock_file:
-                result = process_package(package_dir, sub_dir, temp_dir)
+                result = process_package(package_dir, sub_dir, temp_dir, "0,1", pool)
 
-                assert result is True
-                mock_subprocess.assert_called_once()
+                assert result == (True, "package")
+                pool.run.assert_called_once_with("/test/package", "/test/subdir", "0,1")
                 mock_makedirs.assert_called_once()
                 mock_file.assert_called_once()
 
-    @patch('datasets.helper_scripts.package_builder.main.subprocess.run')
-    def test_json_decode_error(self, mock_subprocess, mock_dirs):
+    def test_worker_error(self, mock_dirs):
 
         package_dir, sub_dir = mock_dirs
+        pool = Mock()
+        pool.run.side_effect = WorkerError("worker exited without a result")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = process_package(package_dir, sub_dir, temp_dir, "0,1", pool)
 
-        mock_result = Mock()
-        mock_result.stdout = "invalid json"
-        mock_subprocess.return_value = mock_result
+            assert result == (False, "package")
+
+    def test_worker_timeout(self, mock_dirs):
+
+        package_dir, sub_dir = mock_dirs
+        pool = Mock()
+        pool.run.side_effect = subprocess.TimeoutExpired("worker-1", 3600)
 
         with tempfile.TemporaryDirectory() as temp_dir:
-            result = process_package(package_dir, sub_dir, temp_dir)
+            result = process_package(package_dir, sub_dir, temp_dir, "0,1", pool)
 
-            assert result is False
+            assert result == (False, "package")
 
-    @patch('datasets.helper_scripts.package_builder.main.subprocess.run')
     @patch('datasets.helper_scripts.package_builder.main.os.makedirs')
-    def test_output_file_creation(self, mock_makedirs, mock_subprocess, mock_dirs, sample_docker_output):
+    def test_output_file_creation(self, mock_makedirs, mock_dirs, sample_docker_output):
 
         package_dir, sub_dir = mock_dirs
 
-        mock_result = Mock()
-        mock_result.stdout = sample_docker_output
-        mock_subprocess.return_value = mock_result
-
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('builtins.open', mock_open()) as mock_file:
-                process_package(package_dir, sub_dir, temp_dir)
+                process_package(package_dir, sub_dir, temp_dir, "0,1", self.pool(sample_docker_output))
 
                 expected_path = os.path.join(temp_dir, "package.json")
                 mock_file.assert_called_with(expected_path, 'wb')
 
-    @patch('datasets.helper_scripts.package_builder.main.subprocess.run')
-    def test_empty_compilation_data(self, mock_subprocess, mock_dirs):
+    def test_empty_compilation_data(self, mock_dirs):
 
         package_dir, sub_dir = mock_dirs
 
@@ -135,28 +146,108 @@ class TestProcessPackage:
             []
         ]).decode()
 
-        mock_result = Mock()
-        mock_result.stdout = empty_output
-        mock_subprocess.return_value = mock_result
-
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('builtins.open', mock_open()):
-                result = process_package(package_dir, sub_dir, temp_dir)
+                result = process_package(package_dir, sub_dir, temp_dir, "0,1", self.pool(empty_output))
 
-                assert result is True
+                assert result == (True, "package")
 
-    @patch('datasets.helper_scripts.package_builder.main.subprocess.run')
-    def test_malformed_docker_output(self, mock_subprocess, mock_dirs):
-        """Test handling of malformed Docker output structure."""
+    def test_malformed_worker_output(self, mock_dirs):
+        """Test handling of a malformed worker result."""
         package_dir, sub_dir = mock_dirs
 
         malformed_output = orjson.dumps(["cmake", "config"]).decode()
 
-        mock_result = Mock()
-        mock_result.stdout = malformed_output
-        mock_subprocess.return_value = mock_result
-
         with tempfile.TemporaryDirectory() as temp_dir:
-            result = process_package(package_dir, sub_dir, temp_dir)
+            result = process_package(package_dir, sub_dir, temp_dir, "0,1", self.pool(malformed_output))
+
+            assert result == (False, "package")
+
+
+class TestTraverseDir:
 
-            assert result is False
\ No newline at end of file
+    @pytest.fixture
+    def packages_root(self, tmp_path):
+
+        root = tmp_path / "packages"
+        for name, size in (("small-a", 10), ("huge", 10 * 1024 * 1024), ("small-b", 20)):
+            source = root / name / f"{name}-1.0"
+            (source / "debian").mkdir(parents=True)
+            (source / "debian" / "changelog").write_text(f"{name} (1.0-1) unstable; urgency=medium\n")
+            (source / "main.c").write_bytes(b"x" * size)
+        return root
+
+    @pytest.fixture
+    def run(self, packages_root, tmp_path):
+
+        log = tmp_path / "jobs.log"
+        worker = tmp_path / "worker.py"
+        worker.write_text(
+            "import json, os, sys\n"
+            "for line in sys.stdin:\n"
+            "    job = json.loads(line)\n"
+            f"    with open({str(log)!r}, 'a') as f:\n"
+            "        f.write(f\"{os.path.basename(job['package_dir'])} {job['cores']}\\n\")\n"
+            # Builds write into debian/ and the pipeline edits debian/rules.
+            "    with open(os.path.join(job['sub_dir'], 'debian', 'rules'), 'a') as f:\n"
+            "        f.write('override_dh_dwz:\\n')\n"
+            "    open(os.path.join(job['sub_dir'], 'debian', 'files'), 'w').close()\n"
+            "    phases = [{'phase': 'build', 'wall_seconds': 1.5, 'cpu_seconds': 2.0, 'max_rss_bytes': 1024, 'returncode': 0}]\n"
+            "    result = ['make', '', '', '', '', 0, '', '', 3, 0, '', '', '', 0, '', 3, '', 3, '', '', 0, [], phases]\n"
+            "    print(json.dumps({'result': result, 'dirty': False}), flush=True)\n")
+        output_dir = tmp_path / "out"
+
+        def run(toolchain="sha256:builder"):
+            if log.exists():
+                log.unlink()
+            with patch('datasets.helper_scripts.package_builder.main.DockerRuntime',
+                       side_effect=lambda root, **kwargs: LocalRuntime([sys.executable, str(worker)])), \
+                    patch('datasets.helper_scripts.package_builder.main.AptCache',
+                          side_effect=lambda root, image: AptCache(root, image, update_command=[sys.executable, "-c", ""])), \
+                    patch('datasets.helper_scripts.package_builder.main.toolchain_version', return_value=toolchain), \
+                    patch('datasets.helper_scripts.package_builder.main.multiprocessing.cpu_count', return_value=12):
+                traverse_dir(str(packages_root), str(output_dir))
+            return [line.split() for line in log.read_text().splitlines()] if log.exists() else []
+
+        return run
+
+    def test_longest_first_on_wider_slice(self, run, tmp_path):
+
+        started = run()
+
+        output_dir = tmp_path / "out"
+        assert started[0][0] == "huge" and int(started[0][1]) > 2
+        assert {name for name, _ in started} == {"huge", "small-a", "small-b"}
+        history = BuildHistory(str(output_dir / HISTORY_DB))
+        assert set(history.durations()) == {"huge", "small-a", "small-b"}
+        assert history.phase_totals()[0][:2] == ("build", 3)
+        assert len(manifest.Manifest(str(output_dir / manifest.MANIFEST_DB))) == 3
+        assert not (output_dir / ".checkpoint.txt").exists()
+        assert (output_dir / ".apt_cache" / "lists" / ".epoch").exists()
+
+    def test_rerun_builds_only_changed_packages(self, run, packages_root):
+
+        run()
+        assert run() == []
+
+        (packages_root / "small-a" / "small-a-1.0" / "debian" / "changelog").write_text(
+            "small-a (1.0-2) unstable; urgency=medium\n")
+        assert [name for name, _ in run()] == ["small-a"]
+
+    def test_toolchain_or_pipeline_change_rebuilds_all(self, run):
+
+        run()
+
+        assert len(run(toolchain="sha256:new-builder")) == 3
+        with patch('datasets.helper_scripts.package_builder.main.Manifest',
+                   side_effect=lambda path, toolchain: manifest.Manifest(path, toolchain, "2")):
+            assert len(run(toolchain="sha256:new-builder")) == 3
+
+    def test_outputs_from_before_the_manifest_adopted(self, run, tmp_path):
+
+        output_dir = tmp_path / "out"
+        output_dir.mkdir()
+        (output_dir / "huge.json").write_bytes(orjson.dumps({"name": "huge", "source_files": [{}, {}]}))
+
+        assert {name for name, _ in run()} == {"small-a", "small-b"}
+        assert manifest.Manifest(str(output_dir / manifest.MANIFEST_DB)).entry("huge")["source_files"] == 2
@@ -0,0 +1,96 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'package_builder'))
+
+from manifest import Manifest, source_fingerprint
+
+@pytest.fixture
+def package(tmp_path):
+
+    package_path = tmp_path / "zlib"
+    source = package_path / "zlib-1.3"
+    (source / "debian").mkdir(parents=True)
+    (source / "debian" / "rules").write_text("#!/usr/bin/make -f\n")
+    (source / "zlib.c").write_text("int f(void) { return 0; }\n")
+    return package_path, source
+
+class TestSourceFingerprint:
+
+    def test_packaging_inputs_only(self, package):
+
+        package_path, source = package
+        (source / "debian" / "changelog").write_text("zlib (1:1.3-1) unstable; urgency=medium\n")
+        before = source_fingerprint(str(package_path), str(source))
+
+        # What builds write into the tree.
+        (source / "zlib.o").write_bytes(b"\x7fELF")
+        (source / "zlib.c").write_text("int f(void) { return 1; }\n")
+        (source / "debian" / "files").write_text("zlib1g_1.3-1_amd64.deb libs optional\n")
+        (source / "debian" / "tmp").mkdir()
+        (source / "debian" / "tmp" / "libz.so").write_bytes(b"\x7fELF")
+        (source / "debian" / "rules").write_text("#!/usr/bin/make -f\noverride_dh_dwz:\n")
+        assert source_fingerprint(str(package_path), str(source)) == before
+
+        (source / "debian" / "changelog").write_text("zlib (1:1.3-2) unstable; urgency=medium\n")
+        assert source_fingerprint(str(package_path), str(source)) != before
+
+    def test_new_patch_changes_fingerprint(self, package):
+
+        package_path, source = package
+        patches = source / "debian" / "patches"
+        patches.mkdir()
+        (patches / "series").write_text("fix.patch\n")
+        (patches / "fix.patch").write_text("--- a/zlib.c\n")
+        before = source_fingerprint(str(package_path), str(source))
+
+        os.rename(patches / "fix.patch", patches / "other.patch")
+
+        assert source_fingerprint(str(package_path), str(source)) != before
+        assert before.startswith("debian:")
+
+    def test_dsc_fingerprint_ignores_tree(self, package):
+
+        package_path, source = package
+        (package_path / "zlib_1.3.dsc").write_text("Checksums-Sha256:\n abc 10 zlib_1.3.orig.tar.gz\n")
+        before = source_fingerprint(str(package_path), str(source))
+
+        (source / "zlib.c").write_text("modified by the build\n")
+        assert source_fingerprint(str(package_path), str(source)) == before
+        assert before.startswith("dsc:")
+
+        (package_path / "zlib_1.3.dsc").write_text("Checksums-Sha256:\n def 11 zlib_1.3.orig.tar.gz\n")
+        assert source_fingerprint(str(package_path), str(source)) != before
+
+class TestManifest:
+
+    @pytest.fixture
+    def output(self, tmp_path):
+
+        output = tmp_path / "zlib.json"
+        output.write_text('{"name": "zlib", "source_files": []}')
+        return output
+
+    def test_up_to_date_after_record(self, tmp_path, output):
+
+        manifest = Manifest(str(tmp_path / "m.sqlite"), toolchain="sha256:a")
+        manifest.record("zlib", "tree:1", str(output), 4)
+
+        assert manifest.up_to_date("zlib", "tree:1")
+        assert not manifest.up_to_date("zlib", "tree:2")
+        assert not manifest.up_to_date("bash", "tree:1")
+        assert manifest.entry("zlib")["source_files"] == 4
+        assert len(manifest) == 1
+
+    def test_stale_on_toolchain_pipeline_or_missing_output(self, tmp_path, output):
+
+        path = str(tmp_path / "m.sqlite")
+        Manifest(path, toolchain="sha256:a").record("zlib", "tree:1", str(output), 4)
+
+        assert not Manifest(path, toolchain="sha256:b").up_to_date("zlib", "tree:1")
+        assert not Manifest(path, toolchain="sha256:a", pipeline_version="next").up_to_date("zlib", "tree:1")
+        assert Manifest(path, toolchain=None).up_to_date("zlib", "tree:1")
+
+        output.unlink()
+        assert not Manifest(path, toolchain="sha256:a").up_to_date("zlib", "tree:1")
@@ -0,0 +1,133 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from metrics_summary import (
+    MetricsAggregator,
+    add_result,
+    empty_summary,
+    load_summary,
+    merge_summaries,
+    resumed_summary,
+    summarize_results,
+    summary_path,
+)
+from result_record import PairResult
+from result_sink import open_result_sink
+
+def result(key, passed=True, score=1.0, skipped=None):
+    return dict(PairResult(
+        id=0,
+        key=key,
+        ref_ir_verification=True,
+        tgt_ir_verification=passed,
+        ref_canonicalization=passed,
+        tgt_canonicalization=passed,
+        identical=passed,
+        cfg_similarity_score=score,
+        cfg_definitive_match=passed,
+        io_match=passed,
+        io_reference_seconds=0.25 if passed else None,
+        skipped_stages=skipped or {},
+    ).as_dict())
+
+class TestSummary:
+
+    def test_rates_and_skips(self):
+
+        summary = empty_summary()
+        add_result(summary, result("0"))
+        add_result(summary, result("1", passed=False, skipped={'alive2': 'verify_failed', 'cfg': 'verify_failed'}))
+
+        assert summary['samples'] == 2
+        assert summary['rates']['verification'] == {'passed': 1, 'total': 2}
+        assert summary['rates']['io_match'] == {'passed': 1, 'total': 2}
+        assert summary['skipped_stages']['alive2'] == {'verify_failed': 1}
+
+    def test_skipped_scores_not_observed(self):
+
+        summary = empty_summary()
+        add_result(summary, result("0", score=0.45))
+        add_result(summary, result("1", score=0.0, skipped={'cfg': 'verify_failed'}))
+
+        hist = summary['histograms']['cfg_similarity_score']
+        assert hist['count'] == 1
+        assert hist['counts'][4] == 1
+
+    def test_merge_equals_single_pass(self):
+
+        rows = [result(str(i), passed=i % 3 != 0, score=i / 8) for i in range(9)]
+        whole, first, second = empty_summary(), empty_summary(), empty_summary()
+        for i, row in enumerate(rows):
+            add_result(whole, row)
+            add_result(first if i < 4 else second, row)
+
+        assert merge_summaries(first, second) == whole
+
+class TestAggregator:
+
+    def test_flushes_periodically(self, tmp_path):
+
+        path = str(tmp_path / "summary.json")
+        aggregator = MetricsAggregator(path, flush_samples=2)
+
+        aggregator.add(result("0"))
+        assert not os.path.exists(path)
+        aggregator.add(result("1"))
+        assert load_summary(path)['samples'] == 2
+        aggregator.add(result("2"))
+        aggregator.close()
+        assert load_summary(path)['samples'] == 3
+
+    def test_summary_path(self):
+
+        assert summary_path("/r/results.jsonl") == "/r/results.summary.json"
+        assert summary_path("/r/results/") == "/r/results.summary.json"
+
+class TestResume:
+
+    @pytest.fixture
+    def sink_path(self, tmp_path):
+        path = str(tmp_path / "results.jsonl")
+        sink = open_result_sink(path)
+        for i in range(3):
+            sink.write(result(str(i), passed=i != 1))
+        sink.close()
+        return path
+
+    def test_consistent_summary_reused(self, sink_path, tmp_path):
+
+        path = str(tmp_path / "summary.json")
+        aggregator = MetricsAggregator(path)
+        aggregator.summary['samples'] = 3
+        aggregator.close()
+
+        assert resumed_summary(path, sink_path, 3)['rates']['verification']['total'] == 0
+
+    def test_lagging_summary_rebuilt_from_results(self, sink_path, tmp_path):
+
+        path = str(tmp_path / "summary.json")
+        aggregator = MetricsAggregator(path)
+        aggregator.add(result("0"))
+        aggregator.close()
+
+        summary = resumed_summary(path, sink_path, 3)
+
+        assert summary == summarize_results(sink_path)
+        assert summary['rates']['verification'] == {'passed': 2, 'total': 3}
+
+    def test_parquet_results_rebuilt(self, tmp_path):
+
+        path = str(tmp_path / "results")
+        sink = open_result_sink(path, flush_rows=2)
+        for i in range(5):
+            sink.write(result(str(i), skipped={'io': 'disabled'}))
+        sink.close()
+
+        summary = summarize_results(path)
+
+        assert summary['samples'] == 5
+        assert summary['skipped_stages']['io'] == {'disabled': 5}
+        assert summary['histograms']['io_reference_seconds']['count'] == 0
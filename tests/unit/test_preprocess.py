@@ -0,0 +1,35 @@
+import os
+import sys
+import subprocess
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from training.preprocessing import preprocess
+from training.preprocessing.preprocess import preprocess_llvm_ir
+
+STRIPPED = """; ModuleID = '<stdin>'
+source_filename = "main.c"
+target datalayout = "e-m:e-i64:64"
+target triple = "x86_64-pc-linux-gnu"
+
+define i32 @main() {
+  ret i32 0
+}
+"""
+
+class TestPreprocessLlvmIr:
+
+    def test_headers_removed_after_opt(self):
+
+        with patch.object(preprocess, 'run_tool',
+                          return_value=subprocess.CompletedProcess([], 0, STRIPPED, "")) as mock_tool:
+            result = preprocess_llvm_ir("ir with debug info")
+
+        assert mock_tool.call_args.kwargs == {'input': "ir with debug info", 'stage': 'preprocess'}
+        assert result == "\ndefine i32 @main() {\n  ret i32 0\n}\n"
+
+    def test_opt_failure(self):
+
+        with patch.object(preprocess, 'run_tool', return_value=subprocess.CompletedProcess([], 1, "", "error")):
+            assert preprocess_llvm_ir("garbage") is False
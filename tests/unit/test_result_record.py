@@ -0,0 +1,63 @@
+import os
+import sys
+import pytest
+import polars as pl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from result_record import PairResult, FIELDS, TEXT_FIELDS, RESULT_SCHEMA, to_row
+from stages import STAGES, skip_all
+
+def side(verification=True, canonicalization=True, error=""):
+    return {'verification': verification, 'verification_message': "msg",
+            'canonicalization': canonicalization, 'canonicalization_error': error}
+
+class TestPairResult:
+
+    def test_slots(self):
+
+        with pytest.raises(AttributeError):
+            PairResult(id=0).extra = 1
+
+    def test_defaults_describe_stages_that_did_not_run(self):
+
+        result = PairResult(id=3).as_dict()
+
+        assert list(result) == list(FIELDS)
+        assert result['io_reference_seconds'] is None
+        assert result['cfg_similarity_score'] == 0.0
+        assert result['skipped_stages'] == {}
+
+    def test_verify_failure(self):
+
+        result = PairResult.failed(0, side(verification=False), side(), "VERIFY FAILED", skip_all('verify_failed'))
+
+        assert result.ref_canonicalization is False and result.tgt_canonicalization is False
+        assert result.tgt_canonicalization_error == "VERIFY FAILED"
+        assert result.alive2_stdout == "VERIFY FAILED"
+        assert result.skipped_stages['alive2'] == 'verify_failed'
+
+    def test_canonicalization_failure_keeps_side_errors(self):
+
+        result = PairResult.failed(0, side(), side(canonicalization=False, error="opt crashed"),
+                                   "CANONICALIZATION FAILED", skip_all('canonicalization_failed'))
+
+        assert result.ref_canonicalization is True
+        assert result.tgt_canonicalization_error == "opt crashed"
+        assert result.diff_stdout == "CANONICALIZATION FAILED"
+
+class TestSchema:
+
+    def test_schema_covers_every_field(self):
+
+        assert list(RESULT_SCHEMA) == list(FIELDS)
+        assert RESULT_SCHEMA['io_reference_seconds'] == pl.Float64
+        assert RESULT_SCHEMA['cfg_isomorphic_match'] == pl.Boolean
+        assert 'diff_stdout' in TEXT_FIELDS and 'identical' not in TEXT_FIELDS
+
+    def test_to_row_fills_every_stage(self):
+
+        row = to_row({'key': "0", 'skipped_stages': {'io': 'disabled'}, 'unknown': 1})
+
+        assert set(row) == set(FIELDS)
+        assert row['skipped_stages'] == {stage: ('disabled' if stage == 'io' else None) for stage in STAGES}
@@ -0,0 +1,119 @@
+import os
+import sys
+import orjson
+import polars as pl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from result_sink import sample_key, open_result_sink, result_sink_exists, scan_results, JsonlResultSink, ParquetResultSink
+
+class TestSampleKey:
+
+    def test_uses_dataset_id(self):
+        assert sample_key({"id": 17}, 3) == "17"
+
+    def test_falls_back_to_line_index(self):
+        assert sample_key({"src": ""}, 3) == "3"
+
+class TestJsonlResultSink:
+
+    def test_write_and_resume_keys(self, tmp_path):
+
+        path = str(tmp_path / "results.jsonl")
+        sink = open_result_sink(path)
+        assert isinstance(sink, JsonlResultSink)
+
+        sink.write({"key": "0", "identical": True})
+        sink.write({"key": "1", "identical": False})
+        sink.close()
+
+        assert result_sink_exists(path)
+        assert open_result_sink(path).existing_keys() == {"0", "1"}
+
+    def test_partial_last_line_is_dropped(self, tmp_path):
+
+        path = tmp_path / "results.jsonl"
+        path.write_bytes(orjson.dumps({"key": "0"}) + b"\n" + b'{"key": "1", "ident')
+
+        sink = open_result_sink(str(path))
+        sink.write({"key": "2"})
+        sink.close()
+
+        lines = path.read_bytes().splitlines()
+        assert [orjson.loads(line)["key"] for line in lines] == ["0", "2"]
+
+    def test_scan_results(self, tmp_path):
+
+        path = str(tmp_path / "results.jsonl")
+        sink = open_result_sink(path)
+        sink.write({"key": "0", "identical": True, "skipped_stages": {"alive2": "identical"}})
+        sink.write({"key": "1", "identical": False, "skipped_stages": {}})
+        sink.close()
+
+        frame = scan_results(path).select("key", "identical").collect()
+
+        assert frame["identical"].to_list() == [True, False]
+
+class TestParquetResultSink:
+
+    def test_rows_flushed_as_parts(self, tmp_path):
+
+        path = str(tmp_path / "results")
+        sink = open_result_sink(path, flush_rows=2)
+        assert isinstance(sink, ParquetResultSink)
+
+        for i in range(5):
+            sink.write({"key": str(i), "cfg_similarity_score": 0.5})
+
+        assert len(os.listdir(path)) == 2
+        sink.close()
+
+        # Closing compacts the parts of the run into one
+        assert os.listdir(path) == ["part-00000.parquet"]
+        assert open_result_sink(path).existing_keys() == {str(i) for i in range(5)}
+
+    def test_resumed_sink_appends_new_parts(self, tmp_path):
+
+        path = str(tmp_path / "results")
+        sink = open_result_sink(path, flush_rows=10)
+        sink.write({"key": "0", "cfg_similarity_score": 0.5})
+        sink.close()
+
+        sink = open_result_sink(path, flush_rows=10)
+        sink.write({"key": "1", "cfg_similarity_score": 1.0})
+        sink.close()
+
+        assert sorted(os.listdir(path)) == ["part-00000.parquet", "part-00001.parquet"]
+        assert sink.existing_keys() == {"0", "1"}
+
+    def test_parts_share_typed_schema(self, tmp_path):
+
+        path = str(tmp_path / "results")
+        sink = open_result_sink(path, flush_rows=1)
+        # A part whose optional columns are all null still has their types
+        sink.write({"key": "0", "io_reference_seconds": None, "skipped_stages": {"io": "disabled"}})
+        sink.write({"key": "1", "io_reference_seconds": 0.5, "diff_stdout": "x" * 1000, "skipped_stages": {}})
+        sink.flush()
+
+        frame = scan_results(path).select("key", "io_reference_seconds", "skipped_stages").collect()
+
+        assert frame.schema["io_reference_seconds"] == pl.Float64
+        assert frame["skipped_stages"].struct.field("io").to_list() == ["disabled", None]
+        sink.close()
+
+    def test_compaction_writes_row_groups(self, tmp_path):
+
+        path = str(tmp_path / "results")
+        sink = ParquetResultSink(path, flush_rows=2, row_group_rows=4)
+        for i in range(10):
+            sink.write({"key": str(i), "identical": i % 2 == 0})
+        sink.close()
+
+        part = os.path.join(path, "part-00000.parquet")
+        assert os.listdir(path) == ["part-00000.parquet"]
+        assert pl.read_parquet(part)["key"].to_list() == [str(i) for i in range(10)]
+        assert scan_results(path).select(pl.col("identical").sum()).collect().item() == 5
+
+    def test_missing_sink_does_not_exist(self, tmp_path):
+        assert not result_sink_exists(str(tmp_path / "results"))
+        assert not result_sink_exists(str(tmp_path / "results.jsonl"))
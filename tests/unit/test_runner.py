@@ -0,0 +1,330 @@
+import os
+import sys
+import pytest
+import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+import runner
+from static_analysis.structural_analysis import llvm_ir_analysis_context
+from runner import process_batch
+from static_analysis.structural_analysis.llvm_ir_cfg_comparison import compare_function_cfgs
+
+class TestProcessBatch:
+
+    @pytest.fixture
+    def batch(self):
+
+        return [
+            {"src": "", "ref_ir": "ref0", "tgt_ir": "tgt0"},
+            {"src": "", "ref_ir": "ref1", "tgt_ir": "bad"},
+            {"src": "", "ref_ir": "ref2", "tgt_ir": "tgt2"},
+        ]
+
+    @pytest.fixture
+    def mock_analyses(self):
+
+        def fake_verify_and_canonicalize(ir, engine='auto'):
+            if ir == "bad":
+                return False, "invalid IR", False, "", "VERIFY FAILED", 'opt'
+            return True, "IR verification passed", True, f"define void @{ir}() {{\n  ret void\n}}\n", "", 'opt'
+
+        with patch.object(runner, 'verify_and_canonicalize_ir', side_effect=fake_verify_and_canonicalize), \
+            patch.object(llvm_ir_analysis_context, 'module_cfgs', return_value={}) as mock_cfgs, \
+            patch.object(runner, 'compare_function_info', return_value={'count_match': True, 'signature_match': True}), \
+            patch.object(runner, 'diff_llvm_ir', return_value=(True, "", "")), \
+            patch.object(runner, 'compare_function_cfgs', return_value={'comparisons': {}}), \
+            patch.object(runner, 'verify_with_alive2', return_value=(True, "correct", "")):
+            yield mock_cfgs
+
+    def test_sequential_results(self, batch, mock_analyses):
+
+        results = process_batch(batch)
+
+        assert [r['id'] for r in results] == [0, 1, 2]
+        assert results[0]['identical'] is True
+        assert results[1]['tgt_ir_verification'] is False
+        assert results[1]['ref_canonicalization_error'] == "VERIFY FAILED"
+
+    def test_executor_preserves_order(self, batch, mock_analyses):
+
+        sequential = process_batch(batch)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            parallel = process_batch(batch, executor=executor)
+
+        assert parallel == sequential
+
+    def test_worker_stats_recorded(self, batch, mock_analyses):
+
+        worker_stats = {}
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            process_batch(batch, executor=executor, worker_stats=worker_stats)
+
+        assert sum(s['samples'] for s in worker_stats.values()) == len(batch)
+        # Two halves plus one analysis per sample
+        assert sum(s['tasks'] for s in worker_stats.values()) == 3 * len(batch)
+
+    def test_compilation_skipped_without_command(self, batch, mock_analyses):
+
+        with patch.object(runner, 'compilation_check') as mock_compile:
+            results = process_batch(batch)
+
+            mock_compile.assert_not_called()
+            assert all(r['ref_compilation_success'] is False for r in results)
+
+    def test_results_streamed_with_keys(self, batch, mock_analyses):
+
+        streamed = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = process_batch(batch, executor=executor, keys=["a", "b", "c"], on_result=streamed.append)
+
+        assert [r['key'] for r in results] == ["a", "b", "c"]
+        assert [r['key'] for r in streamed] == ["a", "b", "c"]
+
+    def test_results_streamed_in_dataset_order(self, batch, mock_analyses):
+
+        from concurrent.futures import Future
+
+        # The middle item fails verification and finishes first; the others
+        # wait on Alive2.
+        class FakeScheduler:
+            escalation_timeout = 600
+
+            def submit(self, src, tgt, functions=None, escalation_timeout=None):
+                future = Future()
+                future.set_result((True, "scheduled", "", 0.5, "correct"))
+                return future
+
+        streamed = []
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            process_batch(batch, executor=executor, alive2=FakeScheduler(), on_result=streamed.append)
+
+        assert [r['id'] for r in streamed] == [0, 1, 2]
+
+    def test_engine_mismatch_redone_with_opt(self, batch, mock_analyses):
+
+        calls = []
+
+        def fake_verify_and_canonicalize(ir, engine='auto'):
+            calls.append((ir, engine))
+            used = 'opt' if ir == "tgt0" or engine == 'opt' else 'llvmlite'
+            return True, "IR verification passed", True, f"{used}({ir})", "", used
+
+        with patch.object(runner, 'verify_and_canonicalize_ir', side_effect=fake_verify_and_canonicalize), \
+            patch.object(runner, 'diff_llvm_ir', return_value=(True, "", "")) as mock_diff:
+            process_batch(batch[:1])
+
+        assert ("ref0", 'opt') in calls
+        mock_diff.assert_called_once_with("opt(ref0)", "opt(tgt0)")
+
+    def test_cfgs_built_once_per_canonical_half(self, batch, mock_analyses):
+
+        process_batch(batch)
+
+        # Item 1 has an invalid tgt, so only its ref half is canonicalized
+        assert mock_analyses.call_count == 5
+
+    def test_prepared_halves_served_from_cache(self, batch, mock_analyses, tmp_path):
+
+        with patch.object(runner, 'analysis_cache', runner.AnalysisCache(str(tmp_path / "cache.sqlite"))):
+            cache_stats = {}
+            first = process_batch(batch, cache_stats=cache_stats)
+
+            with patch.object(runner, 'verify_and_canonicalize_ir') as mock_prepare:
+                second = process_batch(batch, cache_stats=cache_stats)
+                mock_prepare.assert_not_called()
+
+        assert second == first
+        assert cache_stats['canonicalize'] == {'hits': 6, 'misses': 6}
+
+    def test_alive2_scheduler_receives_common_functions(self, batch, mock_analyses):
+
+        from concurrent.futures import Future
+
+        submitted = []
+
+        class FakeScheduler:
+            escalation_timeout = 600
+
+            def submit(self, src, tgt, functions=None, escalation_timeout=None):
+                submitted.append(functions)
+                future = Future()
+                future.set_result((True, "scheduled", "", 0.5, "correct"))
+                return future
+
+        mock_analyses.return_value = {"f": None, "g": None}
+        results = process_batch(batch, alive2=FakeScheduler())
+
+        assert submitted == [["f", "g"], ["f", "g"]]
+        assert runner.verify_with_alive2.call_count == 0
+        assert [r['alive2_stdout'] for r in results] == ["scheduled", "VERIFY FAILED", "scheduled"]
+        assert [r['alive2_status'] for r in results] == ["correct", None, "correct"]
+        assert all(r['key'] == str(i) for i, r in enumerate(results))
+
+    def test_identical_canonical_ir_short_circuits(self, batch, mock_analyses):
+
+        def same_canonical_ir(ir, engine='auto'):
+            return True, "IR verification passed", True, "define void @f() {\n  ret void\n}\n", "", 'opt'
+
+        stage_stats = {}
+        with patch.object(runner, 'verify_and_canonicalize_ir', side_effect=same_canonical_ir):
+            mock_analyses.return_value = {"f": None}
+            results = process_batch(batch, stage_stats=stage_stats)
+
+        runner.diff_llvm_ir.assert_not_called()
+        runner.verify_with_alive2.assert_not_called()
+        assert all(r['identical'] and r['alive2_verified'] and r['cfg_definitive_match'] for r in results)
+        assert results[0]['skipped_stages']['alive2'] == 'identical'
+        assert stage_stats['diff'] == {'executed': 0, 'skipped': 3, 'reasons': {'identical': 3}}
+        assert stage_stats['compile']['reasons'] == {'disabled': 3}
+
+    def test_short_circuit_disabled(self, batch, mock_analyses):
+
+        def same_canonical_ir(ir, engine='auto'):
+            return True, "IR verification passed", True, "define void @f() {\n  ret void\n}\n", "", 'opt'
+
+        with patch.object(runner, 'verify_and_canonicalize_ir', side_effect=same_canonical_ir):
+            process_batch(batch, rules=frozenset())
+
+        assert runner.diff_llvm_ir.call_count == 3
+
+    def test_signature_mismatch_skips_alive2(self, batch, mock_analyses):
+
+        # The fake canonical IR of ref0 defines @ref0, that of tgt0 @tgt0.
+        results = process_batch(batch, rules=frozenset({'signature_mismatch'}))
+
+        runner.verify_with_alive2.assert_not_called()
+        assert results[0]['skipped_stages']['alive2'] == 'signature_mismatch'
+        assert results[0]['alive2_verified'] is False
+        assert results[0]['alive2_status'] is None
+
+    def test_signature_mismatch_off_by_default(self, batch, mock_analyses):
+
+        results = process_batch(batch[:1])
+
+        runner.verify_with_alive2.assert_called_once()
+        assert 'alive2' not in results[0]['skipped_stages']
+
+    def test_differing_declarations_still_verified(self, batch, mock_analyses):
+
+        def canonical_ir(ir, engine='auto'):
+            declaration = "i32 @llvm.smax.i32(i32, i32)" if ir.startswith("tgt") else "i32 @llvm.abs.i32(i32, i1)"
+            return (True, "IR verification passed", True,
+                    f"declare {declaration}\ndefine void @f() {{\n  ret void\n}}\n", "", 'opt')
+
+        with patch.object(runner, 'verify_and_canonicalize_ir', side_effect=canonical_ir):
+            results = process_batch(batch[:1], rules=frozenset({'signature_mismatch'}))
+
+        runner.verify_with_alive2.assert_called_once()
+        assert 'alive2' not in results[0]['skipped_stages']
+
+    def test_alive2_timeout_reported_as_undecided(self, batch, mock_analyses):
+
+        with patch.object(runner, 'verify_with_alive2', return_value=(False, "Verification timed out.", "killed")):
+            results = process_batch(batch[:1])
+
+        assert results[0]['alive2_verified'] is False
+        assert results[0]['alive2_status'] == 'undecided'
+
+    def test_cfg_isomorphism_timeout_left_undecided(self, batch, mock_analyses):
+
+        cycle = nx.DiGraph([(i, (i + 1) % 6) for i in range(6)])
+        chain = nx.DiGraph([(i, i + 1) for i in range(5)])
+
+        def out_of_time(graphs1, graphs2):
+            return compare_function_cfgs(graphs1, graphs2, time_budget=-1.0)
+
+        with patch.object(runner, 'compare_function_cfgs', side_effect=out_of_time):
+            mock_analyses.return_value = {"f": cycle}
+            undecided = process_batch(batch[:1])
+            mock_analyses.side_effect = [{"f": cycle, "g": cycle}, {"f": cycle, "g": chain}]
+            mismatched = process_batch(batch[:1])
+
+        assert undecided[0]['cfg_isomorphic_match'] is None
+        assert undecided[0]['cfg_definitive_match'] is False
+        assert mismatched[0]['cfg_isomorphic_match'] is False
+
+    def test_identical_pair_compiled_once(self):
+
+        with patch.object(runner, 'compilation_check', return_value=True) as mock_compile, \
+            patch.object(runner, 'io_test') as mock_io:
+            fields = runner.execute_pair("ir", "ir", ["clang"], "a.out", None, 5, identical=True)
+
+        mock_compile.assert_called_once()
+        mock_io.assert_not_called()
+        assert fields['tgt_compilation_success'] is True
+        assert fields['io_match'] is True
+
+    def test_io_vectors_passed_to_io_test(self):
+
+        vectors = [{'stdin': "1\n", 'argv': ["-v"]}]
+        with patch.object(runner, 'compilation_check', return_value=True), \
+            patch.object(runner, 'io_test', return_value={'match': True, 'both_executed': True}) as mock_io:
+            fields = runner.execute_pair("ref", "tgt", ["clang"], "a.out", None, 5, io_vectors=vectors,
+                                         io_limits={'slowdown': 3})
+
+        ref_exec, tgt_exec, timeout = mock_io.call_args.args
+        assert (os.path.basename(ref_exec), os.path.basename(tgt_exec), timeout) == ("ref_a.out", "tgt_a.out", 5)
+        assert mock_io.call_args.kwargs == {'vectors': vectors, 'limits': {'slowdown': 3}}
+        assert fields['io_match'] is True
+
+    def test_incremental_failure_compiles_both_halves_in_full(self):
+
+        with patch.object(runner, 'incremental_compilation_check', return_value=None), \
+            patch.object(runner, 'compilation_check', return_value=True) as mock_compile, \
+            patch.object(runner, 'io_test', return_value={'match': True, 'both_executed': True}):
+            fields = runner.execute_pair("ref", "tgt", ["clang", "x.ll"], "a.out", None, 5, link_mode='incremental',
+                                         object_dir="/objects")
+
+        assert [c.args[0] for c in mock_compile.call_args_list] == ["ref", "tgt"]
+        assert fields['ref_compilation_success'] is True
+        assert fields['tgt_compilation_success'] is True
+
+    def test_pairs_built_in_separate_directories_on_pool(self, batch, mock_analyses):
+
+        build_dirs = []
+
+        def fake_compile(ir, command, output, src_directory, build_dir=None):
+            build_dirs.append(build_dir)
+            open(os.path.join(build_dir, output), "w").close()
+            return True
+
+        with patch.object(runner, 'compilation_check', side_effect=fake_compile), \
+            patch.object(runner, 'io_test', return_value={'match': True, 'both_executed': True}):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = process_batch(batch, compilation_command=["clang", "x"], output_file="a.out", executor=executor)
+
+        # Item 1 failed verification and is not built
+        assert len(build_dirs) == 4
+        assert len(set(build_dirs)) == 2
+        assert not any(os.path.exists(d) for d in build_dirs)
+        assert [r['io_match'] for r in results] == [True, False, True]
+
+    def test_timeouts_calibrated_from_runtime_db(self, batch, mock_analyses, tmp_path):
+
+        runtime_db = runner.RuntimeDB(str(tmp_path / "runtimes.sqlite"))
+        key = runner.runtime_key("ref0", ["clang", "x"])
+        runtime_db.record(key, 'io', 0.5)
+
+        def fake_execute_pair(*args, **kwargs):
+            return {'ref_compilation_success': True, 'tgt_compilation_success': True, 'io_match': True,
+                    'io_reference_seconds': 0.25}
+
+        with patch.object(runner, 'execute_pair', side_effect=fake_execute_pair) as mock_execute:
+            process_batch(batch, compilation_command=["clang", "x"], output_file="a.out", io_timeout=60,
+                          runtime_db=runtime_db)
+
+        timeouts = [c.args[5] for c in mock_execute.call_args_list]
+        assert timeouts == [2.5, 60]
+        assert runtime_db.history(key, 'io') == [0.25, 0.5]
+        assert runtime_db.stats['io']['calibrated'] == 1
+
+        # Reversed, ref2 (one 0.25s run) comes first and ref0 keeps its timeout.
+        with patch.object(runner, 'execute_pair', side_effect=fake_execute_pair) as mock_execute:
+            process_batch(batch[::-1], compilation_command=["clang", "x"], output_file="a.out", io_timeout=60,
+                          runtime_db=runtime_db)
+        assert [c.args[5] for c in mock_execute.call_args_list] == [1.25, 2.5]
+        runtime_db.close()
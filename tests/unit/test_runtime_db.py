@@ -0,0 +1,82 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from runtime_db import RuntimeDB, calibrated_timeout, percentile, runtime_key, HISTORY_LIMIT
+
+class TestCalibratedTimeout:
+
+    def test_percentile_nearest_rank(self):
+
+        assert percentile([5, 1, 3, 2, 4], 95) == 5
+        assert percentile(list(range(1, 101)), 95) == 95
+        assert percentile([7], 95) == 7
+
+    def test_no_history_keeps_default(self):
+
+        assert calibrated_timeout([], 60) == 60
+
+    def test_factor_of_p95(self):
+
+        assert calibrated_timeout([1.0, 2.0], 60, factor=5, bounds=(0, 600)) == 10.0
+
+    def test_floor_and_ceiling(self):
+
+        assert calibrated_timeout([0.01], 60, factor=5, bounds=(1, 600)) == 1
+        assert calibrated_timeout([500.0], 60, factor=5, bounds=(1, 600)) == 600
+
+    def test_runtime_key_from_reference_and_command(self):
+
+        key = runtime_key("define i32 @main() {\n  ret i32 0\n}\n", ["clang", "-O2", "x.ll"])
+
+        assert key == runtime_key("define i32 @main() {\n  ret i32 0\n}\n", ["clang", "-O2", "x.ll"])
+        assert key != runtime_key("define i32 @main() {\n  ret i32 1\n}\n", ["clang", "-O2", "x.ll"])
+        assert key != runtime_key("define i32 @main() {\n  ret i32 0\n}\n", ["clang", "-O0", "x.ll"])
+
+class TestRuntimeDB:
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        db = RuntimeDB(str(tmp_path / "runtimes.sqlite"), factor=5, bounds={'io': (1, 600)})
+        yield db
+        db.close()
+
+    def test_history_per_key_and_stage(self, db):
+
+        db.record("a", 'io', 0.5)
+        db.record("a", 'alive2', 40.0)
+        db.record("b", 'io', 2.0)
+        db.record("a", 'io', None)
+
+        assert db.history("a", 'io') == [0.5]
+        assert db.history("a", 'alive2') == [40.0]
+        assert db.history("c", 'io') == []
+
+    def test_history_limited_to_recent_runs(self, db):
+
+        for i in range(HISTORY_LIMIT + 5):
+            db.record("a", 'io', float(i))
+
+        assert len(db.history("a", 'io')) == HISTORY_LIMIT
+        assert min(db.history("a", 'io')) == 5.0
+
+    def test_timeout_and_savings(self, db):
+
+        db.record("fast", 'io', 0.5)
+
+        assert db.timeout("fast", 'io', 60) == 2.5
+        assert db.timeout("new", 'io', 60) == 60
+        assert db.stats['io'] == {'samples': 2, 'calibrated': 1, 'default_seconds': 120.0, 'calibrated_seconds': 62.5}
+
+    def test_persists_across_runs(self, tmp_path):
+
+        path = str(tmp_path / "runtimes.sqlite")
+        first = RuntimeDB(path)
+        first.record("a", 'io', 3.0)
+        first.close()
+
+        second = RuntimeDB(path)
+        assert second.history("a", 'io') == [3.0]
+        second.close()
@@ -0,0 +1,87 @@
+import os
+import sys
+import orjson
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'package_builder'))
+
+from scheduler import (
+    BASE_SECONDS,
+    BYTES_PER_COMMAND,
+    estimate_cost,
+    plan,
+    runtime,
+    seconds_per_byte,
+    source_work,
+    take_slice,
+)
+
+class TestCostModel:
+
+    def test_source_work_counts_sources_and_compile_commands(self, tmp_path):
+
+        (tmp_path / "a.c").write_bytes(b"x" * 100)
+        (tmp_path / "b.cpp").write_bytes(b"x" * 50)
+        (tmp_path / "README").write_bytes(b"x" * 1000)
+        (tmp_path / "compile_commands.json").write_bytes(orjson.dumps([{'file': 'a.c'}, {'file': 'b.cpp'}, {'file': 'c.s'}]))
+
+        assert source_work(str(tmp_path)) == 150 + 2 * BYTES_PER_COMMAND
+
+    def test_history_overrides_estimate(self):
+
+        history = {"gcc": {"seconds": 7200.0, "cores": 2, "work": 10}}
+
+        assert estimate_cost("gcc", 10, history, 1.0, 2) == 7200.0
+        assert estimate_cost("hello", 10, history, 1.0, 2) == BASE_SECONDS + 10
+
+    def test_durations_on_wide_slices_scale_to_base(self):
+
+        history = {"gcc": {"seconds": runtime(1000.0, 8, 2), "cores": 8, "work": 10}}
+
+        assert estimate_cost("gcc", 10, history, 1.0, 2) == pytest.approx(1000.0)
+
+    def test_rate_calibrated_from_history(self):
+
+        history = {
+            "a": {"seconds": BASE_SECONDS + 100.0, "cores": 2, "work": 1000},
+            "b": {"seconds": BASE_SECONDS + 300.0, "cores": 2, "work": 1000},
+        }
+
+        assert seconds_per_byte(history, 2) == pytest.approx(0.2)
+
+class TestPlan:
+
+    def test_longest_expected_first(self):
+
+        order = [i for i, _ in plan([10, 500, 40], 8, 2)]
+
+        assert order == [1, 2, 0]
+
+    def test_dominant_package_gets_wide_slice(self):
+
+        widths = dict(plan([10000] + [100] * 20, 16, 2))
+
+        assert widths[0] > 2
+        assert all(widths[i] == 2 for i in range(1, 21))
+
+    def test_width_capped_by_available_cpus(self):
+
+        widths = dict(plan([10000, 1], 6, 2, max_cores=16))
+
+        assert widths[0] == 6
+
+class TestTakeSlice:
+
+    def test_takes_lowest_free_cores(self):
+
+        free = [6, 7, 0, 1, 2, 3]
+
+        assert take_slice(free, 4, 2) == [0, 1, 2, 3]
+        assert free == [6, 7]
+
+    def test_wide_package_starts_on_what_is_left(self):
+
+        free = [0, 1, 2]
+
+        assert take_slice(free, 8, 2) == [0, 1]
+        assert free == [2]
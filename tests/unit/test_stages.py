@@ -0,0 +1,59 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation'))
+
+from stages import STAGES, StagePlan, check_rules, stage_order, skip_all, record_stage_counts
+
+class TestStageOrder:
+
+    def test_cheapest_first_after_dependencies(self):
+        order = stage_order()
+        assert order[0] == 'functions'
+        assert order[-1] == 'alive2'
+        for stage in order:
+            for dep in STAGES[stage]['deps']:
+                assert order.index(dep) < order.index(stage)
+
+    def test_dependency_overrides_cost(self):
+        stages = {
+            'cheap': {'cost': 1, 'deps': ('expensive',)},
+            'expensive': {'cost': 10, 'deps': ()},
+        }
+        assert stage_order(stages) == ['expensive', 'cheap']
+
+    def test_cycle_rejected(self):
+        stages = {'a': {'cost': 1, 'deps': ('b',)}, 'b': {'cost': 1, 'deps': ('a',)}}
+        with pytest.raises(ValueError):
+            stage_order(stages)
+
+class TestStagePlan:
+
+    def test_skip_propagates_to_dependents(self):
+        plan = StagePlan()
+        plan.skip('compile', 'disabled')
+
+        assert not plan.runs('io')
+        assert plan.reason('io') == 'disabled'
+        assert plan.runs('alive2')
+
+    def test_first_reason_kept(self):
+        plan = StagePlan()
+        plan.skip('alive2', 'identical')
+        plan.skip('alive2', 'signature_mismatch')
+        assert plan.reason('alive2') == 'identical'
+
+    def test_unknown_rule(self):
+        with pytest.raises(ValueError):
+            check_rules(['identical', 'bogus'])
+
+class TestRecordStageCounts:
+
+    def test_counts_and_reasons(self):
+        stage_stats = {}
+        record_stage_counts(stage_stats, {'alive2': 'identical'})
+        record_stage_counts(stage_stats, skip_all('verify_failed'))
+
+        assert stage_stats['diff'] == {'executed': 1, 'skipped': 1, 'reasons': {'verify_failed': 1}}
+        assert stage_stats['alive2']['reasons'] == {'identical': 1, 'verify_failed': 1}
@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import pytest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'datasets', 'helper_scripts', 'package_builder'))
+
+from worker_pool import DockerRuntime, LocalRuntime, WorkerError, WorkerPool
+
+FAKE_WORKER = """
+import json, os, sys, time
+for line in sys.stdin:
+    job = json.loads(line)
+    name = os.path.basename(job['package_dir'])
+    if name == 'crash':
+        sys.exit(1)
+    if name == 'hang':
+        time.sleep(60)
+    print(json.dumps({'result': [name, os.getpid(), job['cores']], 'dirty': name == 'dirty'}), flush=True)
+"""
+
+@pytest.fixture
+def runtime(tmp_path):
+
+    worker = tmp_path / "worker.py"
+    worker.write_text(FAKE_WORKER)
+    return LocalRuntime([sys.executable, str(worker)])
+
+class TestWorkerPool:
+
+    def test_worker_reused_across_jobs(self, runtime):
+
+        with WorkerPool(runtime) as pool:
+            first = pool.run("/pkgs/zlib", "/pkgs/zlib/zlib-1.3", "0,1")
+            second = pool.run("/pkgs/bash", "/pkgs/bash/bash-5.2", "0,1,2,3")
+
+        assert first[0] == "zlib" and second[0] == "bash"
+        assert first[1] == second[1]
+        assert second[2] == 4
+        assert pool.started == 1
+
+    def test_recycled_after_max_jobs(self, runtime):
+
+        with WorkerPool(runtime, max_jobs=2) as pool:
+            pids = [pool.run(f"/pkgs/p{i}", f"/pkgs/p{i}/src", "0,1")[1] for i in range(4)]
+
+        assert pids[0] == pids[1] and pids[2] == pids[3] and pids[1] != pids[2]
+        assert (pool.started, pool.recycled) == (2, 2)
+
+    def test_dirty_worker_recycled(self, runtime):
+
+        with WorkerPool(runtime) as pool:
+            dirty = pool.run("/pkgs/dirty", "/pkgs/dirty/src", "0,1")
+            clean = pool.run("/pkgs/zlib", "/pkgs/zlib/src", "0,1")
+
+        assert dirty[0] == "dirty"
+        assert dirty[1] != clean[1]
+
+    def test_stale_worker_recycled(self, runtime):
+
+        with WorkerPool(runtime) as pool:
+            first = pool.run("/pkgs/zlib", "/pkgs/zlib/src", "0,1")
+            runtime.stale = lambda worker: True
+            second = pool.run("/pkgs/bash", "/pkgs/bash/src", "0,1")
+
+        assert first[1] != second[1]
+        assert (pool.started, pool.recycled) == (2, 1)
+
+    def test_timeout_kills_worker(self, runtime):
+
+        with WorkerPool(runtime, timeout=0.5) as pool:
+            with pytest.raises(subprocess.TimeoutExpired):
+                pool.run("/pkgs/hang", "/pkgs/hang/src", "0,1")
+            assert pool.run("/pkgs/zlib", "/pkgs/zlib/src", "0,1")[0] == "zlib"
+
+        assert pool.started == 2
+
+    def test_crashed_worker_raises_and_is_replaced(self, runtime):
+
+        with WorkerPool(runtime) as pool:
+            with pytest.raises(WorkerError):
+                pool.run("/pkgs/crash", "/pkgs/crash/src", "0,1")
+            assert pool.run("/pkgs/zlib", "/pkgs/zlib/src", "0,1")[0] == "zlib"
+
+    def test_close_stops_idle_workers(self, runtime):
+
+        pool = WorkerPool(runtime)
+        pool.run("/pkgs/zlib", "/pkgs/zlib/src", "0,1")
+        worker = pool._idle[0]
+
+        pool.close()
+
+        assert worker.process.poll() is not None
+
+class TestDockerRuntime:
+
+    def test_paths_under_mounted_root(self, tmp_path):
+
+        runtime = DockerRuntime(str(tmp_path))
+
+        assert runtime.path(str(tmp_path / "zlib" / "zlib-1.3")) == "/packages/zlib/zlib-1.3"
+
+    def test_options_evaluated_at_each_start(self, tmp_path):
+
+        lists = ["/cache/lists-1:/var/lib/apt/lists:ro"]
+        runtime = DockerRuntime(str(tmp_path), volumes=lambda: lists, environment=lambda: {"APT_SHARED_LISTS": "1"})
+
+        with patch('worker_pool.subprocess.Popen') as popen:
+            worker = runtime.start("0,1")
+            assert not runtime.stale(worker)
+            lists = ["/cache/lists-2:/var/lib/apt/lists:ro"]
+            assert runtime.stale(worker)
+            runtime.start("0,1")
+
+        first, second = (call[0][0] for call in popen.call_args_list)
+        assert "/cache/lists-1:/var/lib/apt/lists:ro" in first
+        assert "/cache/lists-2:/var/lib/apt/lists:ro" in second
+        assert "APT_SHARED_LISTS=1" in second
@@ -1,26 +1,15 @@
-import tempfile
-import subprocess
 import re
-import os
+from evaluation.llvm_tools import run_tool
 
 def preprocess_llvm_ir(llvm_ir):
 
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.ll', delete=False) as temp_ir:
-        temp_ir.write(llvm_ir)
-        temp_ir.flush()
-        temp_ir_path = temp_ir.name
-
-    opt_command = ["opt", "--strip-debug", "--strip-named-metadata", "-S", temp_ir_path, "-o", temp_ir_path]
-    debug_stripped = subprocess.run(opt_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    opt_command = ["opt", "--strip-debug", "--strip-named-metadata", "-S", "-", "-o", "-"]
+    debug_stripped = run_tool(opt_command, input=llvm_ir, stage='preprocess')
 
     if debug_stripped.returncode != 0:
-        os.unlink(temp_ir_path)
         return False
 
-    with open(temp_ir_path, 'r') as f:
-        llvm_ir = f.read()
-
-    os.unlink(temp_ir_path)
+    llvm_ir = debug_stripped.stdout
 
     llvm_ir = re.sub(r'^; ModuleID = .*$\n?', '', llvm_ir, flags=re.MULTILINE)
     llvm_ir = re.sub(r'^source_filename = .*$\n?', '', llvm_ir, flags=re.MULTILINE)